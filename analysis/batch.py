@@ -0,0 +1,264 @@
+"""
+Пакетный (неинтерактивный) анализ раскладок
+
+Считает выбранные метрики для всех раскладок по одному корпусу и выдает
+результат в JSON или CSV. Не использует matplotlib и ввод с клавиатуры,
+поэтому подходит для запуска из скриптов и планировщиков.
+"""
+
+import argparse
+import contextlib
+import csv
+import json
+import sys
+from functools import partial
+from typing import Dict, Any, List, Optional, TextIO, Tuple
+
+from analysis.corpus_cache import CorpusCache
+from analysis.evaluation_engine import EvaluationEngine
+from analysis.finger_penalty_calculator import FingerPenaltyCalculator
+from analysis.layout_ranking import rank_layouts, select_layouts_by_language
+from analysis.parallel_corpus import build_corpus_tables
+from analysis.parallel_evaluation import score_layouts_parallel
+from layouts.key_tables import FINGER_ORDER
+from layouts.layout_data import LayoutData, BUILTIN_LAYOUT_LANGUAGES
+from layouts.compiled_layout import CompiledLayout, LazyLayoutMaps
+from layouts.layout_loader import DEFAULT_LAYOUTS_FOLDER, LayoutFileCache, layout_files_in_folder, load_layout_files
+
+
+# Группы метрик: имя группы -> колонки результата
+METRIC_GROUPS = {
+    'comfort': ['comfort_percent', 'partial_percent', 'uncomfortable_percent',
+                'total_comfort', 'total_partial', 'total_uncomfortable'],
+    'penalty': ['finger_penalty'],
+    'finger_load': ['uniformity_score'] + [f'load_{finger}' for finger in FINGER_ORDER],
+    'balance': ['left_percent', 'right_percent', 'balance_score'],
+    'two_char': ['one_hand_total'],
+    'trigram': ['inward_roll_percent', 'outward_roll_percent', 'redirect_percent',
+                'alternation_percent', 'same_finger_skipgram_percent'],
+    'keystroke': ['stream_space_percent', 'stream_same_finger_percent', 'stream_hand_alternation_percent',
+                  'stream_modifier_changes_percent', 'across_space_same_finger_percent',
+                  'across_space_hand_alternation_percent'],
+    'dynamic': ['avg_dynamic_score'],
+    'rating': ['rank', 'comfort_place', 'penalty_place', 'uniformity_place', 'balance_place', 'total_place'],
+}
+
+OUTPUT_FORMATS = ['json', 'csv']
+
+
+def load_layouts(layout_dirs: List[str], include_builtin: bool = True,
+                 layout_cache: LayoutFileCache = None) -> Tuple[Dict[str, str], LazyLayoutMaps]:
+    '''
+    Получает: папки с JSON раскладками, признак добавления встроенных раскладок,
+    кэш разобранных файлов раскладок
+    Возвращает: имя раскладки -> язык и карты раскладок (строятся при первом обращении)
+    Файлы раскладок разбираются параллельно
+    '''
+    languages = {}
+    layout_maps = LazyLayoutMaps()
+
+    if include_builtin:
+        layout_maps = LayoutData().layout_maps
+        for layout_name in layout_maps:
+            languages[layout_name] = BUILTIN_LAYOUT_LANGUAGES.get(layout_name, 'unknown')
+
+    layout_files = [layout_file for layout_dir in layout_dirs for layout_file in layout_files_in_folder(layout_dir)]
+    for _, layout_data, layout_map in load_layout_files(layout_files, layout_cache):
+        languages[layout_data['name']] = layout_data.get('language', 'unknown')
+        layout_maps.set_factory(layout_data['name'], partial(CompiledLayout, layout_map))
+
+    return languages, layout_maps
+
+
+def stats_to_row(layout_name: str, language: str, stats: Dict[str, Any],
+                 ranking: Dict[str, Any], metrics: List[str]) -> Dict[str, Any]:
+    '''
+    Получает: статистику раскладки, ее место в рейтинге и группы метрик
+    Возвращает: плоскую строку результата (только выбранные колонки)
+    '''
+    total_combinations = stats['total_comfort'] + stats['total_partial'] + stats['total_uncomfortable']
+
+    def percent(value: int) -> float:
+        return value / total_combinations * 100 if total_combinations > 0 else 0.0
+
+    values = {
+        'comfort_percent': percent(stats['total_comfort']),
+        'partial_percent': percent(stats['total_partial']),
+        'uncomfortable_percent': percent(stats['total_uncomfortable']),
+        'total_comfort': stats['total_comfort'],
+        'total_partial': stats['total_partial'],
+        'total_uncomfortable': stats['total_uncomfortable'],
+        'finger_penalty': float(stats['finger_penalty']),
+        'uniformity_score': float(ranking['uniformity_score']),
+        'left_percent': stats['hand_balance']['left_percent'],
+        'right_percent': stats['hand_balance']['right_percent'],
+        'balance_score': stats['hand_balance']['balance_score'],
+        'one_hand_total': stats['two_char_analysis']['one_hand_total'],
+        'avg_dynamic_score': float(stats['avg_dynamic_score']),
+    }
+    for finger in FINGER_ORDER:
+        values[f'load_{finger}'] = stats['finger_load'].get(finger, 0)
+    trigram_analysis = stats['trigram_analysis']
+    for field in ('inward_roll', 'outward_roll', 'redirect', 'alternation', 'same_finger_skipgram'):
+        values[f'{field}_percent'] = (
+            trigram_analysis[field] / trigram_analysis['total'] * 100 if trigram_analysis['total'] > 0 else 0.0
+        )
+    for view, fields in (('stream', ('space', 'same_finger', 'hand_alternation', 'modifier_changes')),
+                         ('across_space', ('same_finger', 'hand_alternation'))):
+        pairs = stats['keystroke_analysis'][view]
+        for field in fields:
+            values[f'{view}_{field}_percent'] = pairs[field] / pairs['total'] * 100 if pairs['total'] > 0 else 0.0
+    for field in METRIC_GROUPS['rating']:
+        values[field] = ranking[field]
+
+    row = {'layout': layout_name, 'language': language}
+    for group in metrics:
+        for column in METRIC_GROUPS[group]:
+            row[column] = values[column]
+
+    return row
+
+
+def run_batch(corpus_file: str, layout_dirs: List[str] = None, metrics: List[str] = None,
+              include_builtin: bool = True, match_language: bool = False, workers: int = None,
+              use_cache: bool = True, max_combos_length: int = 4,
+              corpus_workers: int = None, compact_ngrams: bool = False) -> Optional[Dict[str, Any]]:
+    '''
+    Оценивает раскладки по корпусу
+    Возвращает словарь с описанием корпуса и строками результатов по раскладкам
+    (в порядке итогового рейтинга) или None, если корпус не найден
+    '''
+    if layout_dirs is None:
+        layout_dirs = [DEFAULT_LAYOUTS_FOLDER]
+    metrics = metrics or list(METRIC_GROUPS)
+
+    if use_cache:
+        corpus = CorpusCache().load_corpus(corpus_file, min_length=2, max_combos_length=max_combos_length,
+                                           workers=corpus_workers, compact=compact_ngrams)
+    else:
+        corpus = build_corpus_tables(corpus_file, min_length=2, max_combos_length=max_combos_length,
+                                     workers=corpus_workers, compact=compact_ngrams)
+    if corpus is None:
+        return None
+    corpus_stats, tables = corpus
+
+    languages, all_layout_maps = load_layouts(layout_dirs, include_builtin)
+    language_ratio = corpus_stats.language_ratio()
+
+    layout_names = list(languages)
+    if match_language:
+        layout_names = select_layouts_by_language(
+            {layout_name: languages[layout_name] for layout_name in layout_names},
+            language_ratio
+        )
+    # Карты строятся только для выбранных раскладок
+    layout_maps = {layout_name: all_layout_maps[layout_name] for layout_name in layout_names}
+
+    engine = EvaluationEngine(tables, LayoutData(), FingerPenaltyCalculator())
+    if workers and workers > 1:
+        layouts_stats = score_layouts_parallel(engine, layout_maps, workers)
+    else:
+        layouts_stats = {
+            layout_name: engine.score_layout(layout_map)
+            for layout_name, layout_map in layout_maps.items()
+        }
+
+    rows = []
+    for rank, ranking in enumerate(rank_layouts(layouts_stats)):
+        layout_name = ranking['name']
+        ranking['rank'] = rank + 1
+        rows.append(stats_to_row(
+            layout_name, languages[layout_name], layouts_stats[layout_name], ranking, metrics
+        ))
+
+    return {
+        'corpus': corpus_file,
+        'unique_words': len(corpus_stats.words),
+        'total_words': corpus_stats.total_words(),
+        'language_ratio': language_ratio,
+        'metrics': metrics,
+        'layouts': rows,
+    }
+
+
+def write_json(result: Dict[str, Any], output: TextIO) -> None:
+    '''Записывает результат пакетного анализа в JSON'''
+    json.dump(result, output, ensure_ascii=False, indent=2)
+    output.write('\n')
+
+
+def write_csv(result: Dict[str, Any], output: TextIO) -> None:
+    '''Записывает строки результатов по раскладкам в CSV (одна строка - одна раскладка)'''
+    rows = result['layouts']
+    fieldnames = list(rows[0]) if rows else ['layout', 'language']
+
+    writer = csv.DictWriter(output, fieldnames=fieldnames, lineterminator='\n')
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    '''Аргументы командной строки пакетного анализа'''
+    parser = argparse.ArgumentParser(
+        description='Пакетный анализ клавиатурных раскладок (без графиков и интерактивного меню)'
+    )
+    parser.add_argument('corpus', help='файл корпуса: текст или частотный словарь "слово<TAB>количество"')
+    parser.add_argument('--layouts', action='append', dest='layout_dirs', metavar='DIR',
+                        help=f'папка с JSON раскладками (можно указать несколько раз; '
+                             f'по умолчанию {DEFAULT_LAYOUTS_FOLDER})')
+    parser.add_argument('--no-builtin', action='store_true', help='не оценивать встроенные раскладки')
+    parser.add_argument('--match-language', action='store_true',
+                        help='оценивать только раскладки, подходящие по языку корпусу')
+    parser.add_argument('--metrics', default=','.join(METRIC_GROUPS),
+                        help=f'группы метрик через запятую: {", ".join(METRIC_GROUPS)} (по умолчанию все)')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS,
+                        help='формат вывода (по умолчанию - по расширению --output, иначе json)')
+    parser.add_argument('-o', '--output', help='файл результата (по умолчанию stdout)')
+    parser.add_argument('--workers', type=int, help='число процессов для оценки раскладок')
+    parser.add_argument('--corpus-workers', type=int,
+                        help='число процессов для подсчета статистики большого корпуса')
+    parser.add_argument('--no-cache', action='store_true', help='не использовать кэш статистики корпусов')
+    parser.add_argument('--compact-ngrams', action='store_true',
+                        help='хранить комбинации символов компактно (для корпусов с большим словарем)')
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    '''Точка входа пакетного анализа; возвращает код завершения'''
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    metrics = [metric.strip() for metric in args.metrics.split(',') if metric.strip()]
+    unknown = [metric for metric in metrics if metric not in METRIC_GROUPS]
+    if unknown:
+        parser.error(f"неизвестные метрики: {', '.join(unknown)}")
+
+    output_format = args.format
+    if output_format is None:
+        output_format = 'csv' if args.output and args.output.lower().endswith('.csv') else 'json'
+
+    # Диагностические сообщения идут в stderr, чтобы не смешиваться с результатом
+    with contextlib.redirect_stdout(sys.stderr):
+        result = run_batch(
+            args.corpus,
+            layout_dirs=args.layout_dirs,
+            metrics=metrics,
+            include_builtin=not args.no_builtin,
+            match_language=args.match_language,
+            workers=args.workers,
+            use_cache=not args.no_cache,
+            corpus_workers=args.corpus_workers,
+            compact_ngrams=args.compact_ngrams,
+        )
+
+    if result is None:
+        return 1
+
+    writer = write_csv if output_format == 'csv' else write_json
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            writer(result, f)
+    else:
+        writer(result, sys.stdout)
+
+    return 0
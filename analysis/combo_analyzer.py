@@ -1,19 +1,32 @@
-from typing import Dict, Tuple, Set, Any
+from typing import Dict, Tuple, Set, Any, Iterable, Union
 from collections import defaultdict
 
+from layouts.compiled_layout import CompiledLayout
 
-def combos_counter(words_set: Set[str], max_length: int = 4) -> Dict[int, Dict[str, int]]:
+
+def iter_word_counts(words: Union[Dict[str, int], Set[str]]) -> Iterable[Tuple[str, int]]:
+    '''
+    Получает частоты слов (слово -> количество) или множество слов
+    Возвращает пары (слово, количество); для множества количество равно 1
+    '''
+    if isinstance(words, dict):
+        return words.items()
+    return ((word, 1) for word in words)
+
+
+def combos_counter(words: Union[Dict[str, int], Set[str]], max_length: int = 4) -> Dict[int, Dict[str, int]]:
     '''
-    Получает множество со словами и максимальную длину комбинаций
+    Получает частоты слов (или множество слов) и максимальную длину комбинаций
     Возвращает словарь combos: длина_комбо -> {комбинация: количество}
-    Анализирует по словам, а не по символам
+    Анализирует по словам, а не по символам; каждая комбинация
+    учитывается столько раз, сколько встречается слово
     '''
     combos = {}
     
     for current_combos_length in range(2, max_length + 1):
         combos[current_combos_length] = defaultdict(int)
     
-    for word in words_set:
+    for word, count in iter_word_counts(words):
         # Пропускаем короткие слова
         if len(word) < 2:
             continue
@@ -23,7 +36,7 @@ def combos_counter(words_set: Set[str], max_length: int = 4) -> Dict[int, Dict[s
             if len(word) >= current_combos_length:
                 for letter_number in range(len(word) - current_combos_length + 1):
                     combo = word[letter_number:letter_number + current_combos_length]
-                    combos[current_combos_length][combo] += 1
+                    combos[current_combos_length][combo] += count
     
     return combos
 
@@ -33,6 +46,8 @@ def scancode_from_char(char: str, layout_map: Dict[str, Any]) -> Any:
     Получает: символ, словарь
     Возвращает: сканкод для символа с учетом модификаторов
     '''
+    if isinstance(layout_map, CompiledLayout):
+        return layout_map.scancode(char)
     if char in layout_map:
         scancode_info = layout_map[char]
         if isinstance(scancode_info, dict):
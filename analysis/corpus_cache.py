@@ -0,0 +1,292 @@
+"""
+Кэш статистики корпусов на диске
+
+Таблицы слов, символов, комбинаций и пар потока нажатий сохраняются
+в компактном двоичном формате (.npz: строки одним UTF-8 блоком,
+количества массивом int64).
+Ключ - хэш содержимого файла и настройки токенизации, поэтому повторный
+анализ того же корпуса не читает и не разбирает его заново. Общий размер
+кэша ограничен: при переполнении удаляются давно не использованные записи.
+"""
+
+import hashlib
+import json
+import os
+from collections import Counter, defaultdict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from analysis.text_processor import CorpusStats, WORD_PATTERN
+from analysis.evaluation_engine import CorpusTables
+from analysis.ngram_store import NgramStore
+from analysis.parallel_corpus import build_corpus_tables
+from utils.stage_profiler import profile_stage
+
+
+# Версия формата записей: при изменении формата старые записи не читаются
+CACHE_FORMAT_VERSION = 2
+
+# Кэш лежит в каталоге проекта, а не в текущем каталоге запуска
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_DIR = os.path.join(PROJECT_ROOT, '.corpus_cache')
+DEFAULT_CACHE_SIZE = 512 << 20
+
+# Размер блока при хэшировании файла (в байтах)
+HASH_CHUNK_SIZE = 8 << 20
+
+# Файл с хэшами уже виденных файлов: путь -> (размер, время изменения, хэш)
+HASH_INDEX_FILE = 'file_hashes.json'
+
+
+def file_content_hash(filename: str) -> str:
+    '''
+    Хэш содержимого файла (BLAKE2b), файл читается блоками
+    '''
+    digest = hashlib.blake2b(digest_size=20)
+
+    with open(filename, 'rb') as file:
+        while True:
+            block = file.read(HASH_CHUNK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def _pack_words(table: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Таблица слов или комбинаций -> (UTF-8 блок строк через перевод строки, количества)
+    Слова состоят только из букв, поэтому перевод строки не встречается в ключах
+    '''
+    blob = '\n'.join(table).encode('utf-8')
+    counts = np.fromiter(table.values(), dtype=np.int64, count=len(table))
+    return np.frombuffer(blob, dtype=np.uint8), counts
+
+
+def _unpack_words(blob: np.ndarray, counts: np.ndarray) -> Dict[str, int]:
+    '''Обратное преобразование к _pack_words'''
+    if not len(counts):
+        return {}
+    keys = blob.tobytes().decode('utf-8').split('\n')
+    return dict(zip(keys, counts.tolist()))
+
+
+def _pack_chars(table: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray]:
+    '''Таблица символов -> (коды символов, количества); символом может быть что угодно'''
+    codes = np.fromiter((ord(char) for char in table), dtype=np.int32, count=len(table))
+    counts = np.fromiter(table.values(), dtype=np.int64, count=len(table))
+    return codes, counts
+
+
+def _unpack_chars(codes: np.ndarray, counts: np.ndarray) -> Dict[str, int]:
+    '''Обратное преобразование к _pack_chars'''
+    return dict(zip(map(chr, codes.tolist()), counts.tolist()))
+
+
+def _pack_pairs(table: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray]:
+    '''Таблица пар символов -> (коды символов n x 2, количества); пары могут содержать любые символы'''
+    codes = np.fromiter((ord(char) for pair in table for char in pair), dtype=np.int32, count=2 * len(table))
+    counts = np.fromiter(table.values(), dtype=np.int64, count=len(table))
+    return codes.reshape(-1, 2), counts
+
+
+def _unpack_pairs(codes: np.ndarray, counts: np.ndarray) -> Dict[str, int]:
+    '''Обратное преобразование к _pack_pairs'''
+    return dict(zip((chr(first) + chr(second) for first, second in codes.tolist()), counts.tolist()))
+
+
+class CorpusCache:
+    """
+    Кэш статистики корпусов (CorpusStats и CorpusTables) на диске
+    с ограничением общего размера и вытеснением давно не использованных записей
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def _load_hash_index(self) -> Dict[str, list]:
+        try:
+            with open(os.path.join(self.cache_dir, HASH_INDEX_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_hash_index(self, index: Dict[str, list]) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        index_path = os.path.join(self.cache_dir, HASH_INDEX_FILE)
+        tmp_path = index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, index_path)
+
+    def content_hash(self, filename: str) -> str:
+        """
+        Хэш содержимого файла
+        Если размер и время изменения файла не поменялись, хэш берется из индекса,
+        и файл не читается повторно
+        """
+        file_stat = os.stat(filename)
+        path = os.path.abspath(filename)
+        index = self._load_hash_index()
+
+        known = index.get(path)
+        if known and known[0] == file_stat.st_size and known[1] == file_stat.st_mtime_ns:
+            return known[2]
+
+        content_hash = file_content_hash(filename)
+        index[path] = [file_stat.st_size, file_stat.st_mtime_ns, content_hash]
+        try:
+            self._save_hash_index(index)
+        except OSError:
+            # Каталог проекта может быть недоступен для записи: индекс только ускоряет повторный расчет
+            pass
+
+        return content_hash
+
+    def cache_key(self, filename: str, min_length: int, max_combos_length: int) -> str:
+        """Ключ записи: хэш содержимого файла и настройки токенизации"""
+        settings = json.dumps({
+            'version': CACHE_FORMAT_VERSION,
+            'pattern': WORD_PATTERN.pattern,
+            'min_length': min_length,
+            'max_combos_length': max_combos_length,
+        }, sort_keys=True)
+
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(self.content_hash(filename).encode('ascii'))
+        digest.update(settings.encode('utf-8'))
+        return digest.hexdigest()
+
+    def load(self, key: str, min_length: int, compact: bool = False) -> Optional[Tuple[CorpusStats, CorpusTables]]:
+        """
+        Читает запись кэша; None, если записи нет или она повреждена
+        compact=True - комбинации пересчитываются по словам в NgramStore
+        (это быстрее распаковки и не создает словарей)
+        """
+        entry_path = self._entry_path(key)
+
+        try:
+            with np.load(entry_path, allow_pickle=False) as entry:
+                corpus_stats = CorpusStats(min_length)
+                corpus_stats.words = Counter(_unpack_words(entry['words_keys'], entry['words_counts']))
+                corpus_stats.char_counts = Counter(_unpack_chars(entry['chars_keys'], entry['chars_counts']))
+                corpus_stats.word_char_counts = Counter(
+                    _unpack_chars(entry['word_chars_keys'], entry['word_chars_counts'])
+                )
+                corpus_stats.stream_pairs = Counter(_unpack_pairs(entry['stream_keys'], entry['stream_counts']))
+                corpus_stats.space_pairs = Counter(_unpack_pairs(entry['space_keys'], entry['space_counts']))
+
+                combo_lengths = entry['combo_lengths'].tolist()
+                if compact:
+                    combos = NgramStore.from_words(corpus_stats.words, max(combo_lengths))
+                else:
+                    combos = {}
+                    for length in combo_lengths:
+                        combos[length] = defaultdict(int, _unpack_words(
+                            entry[f'combos{length}_keys'], entry[f'combos{length}_counts']
+                        ))
+        except FileNotFoundError:
+            return None
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Поврежденная запись кэша {entry_path}: {e}")
+            self._remove(entry_path)
+            return None
+
+        # Отмечаем запись как недавно использованную
+        os.utime(entry_path)
+
+        tables = CorpusTables(corpus_stats.char_counts, corpus_stats.word_char_counts, combos, key,
+                              corpus_stats.stream_pairs, corpus_stats.space_pairs)
+        return corpus_stats, tables
+
+    def store(self, key: str, corpus_stats: CorpusStats, tables: CorpusTables) -> None:
+        """Сохраняет запись кэша и вытесняет старые записи при превышении размера"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        arrays = {}
+        arrays['words_keys'], arrays['words_counts'] = _pack_words(corpus_stats.words)
+        arrays['chars_keys'], arrays['chars_counts'] = _pack_chars(corpus_stats.char_counts)
+        arrays['word_chars_keys'], arrays['word_chars_counts'] = _pack_chars(corpus_stats.word_char_counts)
+        arrays['stream_keys'], arrays['stream_counts'] = _pack_pairs(corpus_stats.stream_pairs)
+        arrays['space_keys'], arrays['space_counts'] = _pack_pairs(corpus_stats.space_pairs)
+
+        lengths = sorted(tables.combos)
+        arrays['combo_lengths'] = np.array(lengths, dtype=np.int64)
+        for length in lengths:
+            arrays[f'combos{length}_keys'], arrays[f'combos{length}_counts'] = _pack_words(tables.combos[length])
+
+        entry_path = self._entry_path(key)
+        tmp_path = entry_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, entry_path)
+
+        self.evict(keep=entry_path)
+
+    def evict(self, keep: str = None) -> None:
+        """Удаляет давно не использованные записи, пока кэш больше max_bytes"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.npz'):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    file_stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((file_stat.st_mtime, file_stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            self._remove(path)
+            total_size -= size
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def load_corpus(self, filename: str, min_length: int = 2, max_combos_length: int = 4,
+                    workers: int = None, compact: bool = False) -> Optional[Tuple[CorpusStats, CorpusTables]]:
+        """
+        Статистика и таблицы корпуса: из кэша, если файл уже обрабатывался
+        с теми же настройками, иначе - проходом по файлу с записью в кэш
+        (workers > 1 - подсчет в пуле процессов, compact - комбинации в NgramStore)
+        Возвращает None, если файл не найден
+        """
+        try:
+            key = self.cache_key(filename, min_length, max_combos_length)
+        except FileNotFoundError:
+            print(f"Файл {filename} не найден")
+            return None
+
+        with profile_stage('corpus_cache_load'):
+            cached = self.load(key, min_length, compact)
+        if cached is not None:
+            return cached
+
+        # Ключ кэша однозначно определяет корпус и настройки - он же отпечаток таблиц
+        corpus = build_corpus_tables(filename, min_length, max_combos_length, workers, fingerprint=key,
+                                     compact=compact)
+        if corpus is None:
+            return None
+        corpus_stats, tables = corpus
+
+        try:
+            with profile_stage('corpus_cache_store'):
+                self.store(key, corpus_stats, tables)
+        except OSError as e:
+            print(f"Не удалось сохранить кэш корпуса: {e}")
+
+        return corpus_stats, tables
@@ -0,0 +1,184 @@
+"""
+Оценка раскладок по агрегированным таблицам корпуса
+"""
+
+import hashlib
+import json
+from collections import defaultdict
+from typing import Dict, Any, Iterable, List, Tuple
+
+import numpy as np
+
+from analysis.text_processor import CorpusStats
+from analysis.combo_analyzer import combos_counter
+from analysis.ngram_store import NgramStore
+from analysis.finger_penalty_calculator import FingerPenaltyCalculator
+from analysis.keystroke_stream import pair_char_arrays, keystroke_bigram_metrics, across_space_metrics
+from layouts.layout_data import LayoutData, trigram_char_arrays
+from utils.stage_profiler import profile_stage
+
+
+class CorpusTables:
+    """
+    Таблицы униграмм и n-грамм корпуса
+    Строятся один раз, после чего каждая раскладка оценивается только по ним:
+    стоимость оценки зависит от размера алфавита, а не от размера корпуса
+    """
+
+    def __init__(self, char_counts: Dict[str, int], word_char_counts: Dict[str, int],
+                 combos: Dict[int, Dict[str, int]], fingerprint: str = None,
+                 stream_pairs: Dict[str, int] = None, space_pairs: Dict[str, int] = None):
+        # Униграммы всего текста (штраф и нагрузка на пальцы)
+        self.char_counts = char_counts
+        # Униграммы внутри слов (баланс рук)
+        self.word_char_counts = word_char_counts
+        # Комбинации внутри слов: длина -> {комбинация: количество}
+        # (словари или компактное NgramStore с тем же протоколом чтения)
+        self.combos = combos
+        # Поток нажатий: соседние пары символов всего текста и пары слов через пробел
+        self.stream_pairs = stream_pairs or {}
+        self.space_pairs = space_pairs or {}
+        # Индекс биграмм по символам и массивы триграмм и пар потока строятся при первом обращении
+        self._bigrams_by_char = None
+        self._trigram_arrays = None
+        self._stream_arrays = None
+        self._space_arrays = None
+        # Отпечаток корпуса (например, ключ кэша корпуса); иначе считается по таблицам
+        self._fingerprint = fingerprint
+
+    @classmethod
+    def from_corpus_stats(cls, corpus_stats: CorpusStats, max_combos_length: int = 4,
+                          fingerprint: str = None, compact: bool = False) -> 'CorpusTables':
+        """
+        Агрегирует статистику корпуса в таблицы
+        compact=True - комбинации хранятся в NgramStore (в разы меньше памяти)
+        """
+        if compact:
+            combos = NgramStore.from_words(corpus_stats.words, max_combos_length)
+        else:
+            combos = combos_counter(corpus_stats.words, max_combos_length)
+
+        return cls(corpus_stats.char_counts, corpus_stats.word_char_counts, combos, fingerprint,
+                   corpus_stats.stream_pairs, corpus_stats.space_pairs)
+
+    @property
+    def bigram_counts(self) -> Dict[str, int]:
+        """Таблица биграмм внутри слов"""
+        return self.combos.get(2, {})
+
+    def trigram_arrays(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """Триграммы в виде массивов индексов символов и количеств (см. trigram_char_arrays)"""
+        if self._trigram_arrays is None:
+            self._trigram_arrays = trigram_char_arrays(self.combos.get(3, {}))
+        return self._trigram_arrays
+
+    def keystroke_analysis(self, layout_map: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+        """
+        Метрики потока нажатий раскладки: все соседние пары ('stream'),
+        пары внутри слов ('word_internal') и переходы между словами через пробел ('across_space')
+        """
+        if self._stream_arrays is None:
+            self._stream_arrays = pair_char_arrays(self.stream_pairs)
+            self._space_arrays = pair_char_arrays(self.space_pairs)
+
+        return {
+            **keystroke_bigram_metrics(self._stream_arrays, layout_map),
+            'across_space': across_space_metrics(self._space_arrays, layout_map),
+        }
+
+    def fingerprint(self) -> str:
+        """Устойчивый отпечаток содержимого таблиц: одинаков для одинаковых корпусов"""
+        if self._fingerprint is None:
+            digest = hashlib.blake2b(digest_size=20)
+            tables = [self.char_counts, self.word_char_counts] + [self.combos[length] for length in sorted(self.combos)]
+            tables += [self.stream_pairs, self.space_pairs]
+            for table in tables:
+                digest.update(json.dumps(sorted(table.items()), ensure_ascii=False).encode('utf-8'))
+            self._fingerprint = digest.hexdigest()
+
+        return self._fingerprint
+
+    def bigrams_with_chars(self, chars: Iterable[str]) -> List[str]:
+        """Биграммы, содержащие хотя бы один из символов chars (без повторов)"""
+        if self._bigrams_by_char is None:
+            bigrams_by_char = defaultdict(list)
+            for combo in self.bigram_counts:
+                bigrams_by_char[combo[0]].append(combo)
+                if combo[1] != combo[0]:
+                    bigrams_by_char[combo[1]].append(combo)
+            self._bigrams_by_char = bigrams_by_char
+        
+        bigrams = {}
+        for char in chars:
+            bigrams.update(dict.fromkeys(self._bigrams_by_char.get(char, ())))
+        return list(bigrams)
+
+
+class EvaluationEngine:
+    """Оценивает любое количество раскладок по одним и тем же таблицам корпуса"""
+
+    def __init__(self, tables: CorpusTables, data: LayoutData, penalty_calculator: FingerPenaltyCalculator):
+        self.tables = tables
+        self.data = data
+        self.penalty_calculator = penalty_calculator
+
+    def score_layout(self, layout_map: Dict[str, Any]) -> Dict[str, Any]:
+        """Возвращает статистику раскладки в формате layouts_stats"""
+        tables = self.tables
+
+        # Анализируем комбинации с динамическими штрафами
+        with profile_stage('dynamic_penalties', items=len(tables.bigram_counts)):
+            comfort_combos, partial_combos, uncomfortable_combos, dynamic_scores = \
+                self.data.calculate_dynamic_penalties_from_bigrams(tables.bigram_counts, layout_map)
+            # Итоги по категориям - одна взвешенная сумма по матрице биграмм клавиша x клавиша
+            comfort_totals = self.data.calculate_comfort_totals(tables.bigram_counts, layout_map)
+
+        # Подсчет штрафа на пальцы (расстояние от домашнего ряда)
+        with profile_stage('finger_penalty', items=len(tables.char_counts)):
+            finger_penalty = self.penalty_calculator.calculate_finger_penalty_from_counts(
+                tables.char_counts, layout_map
+            )
+
+        # Статистика по пальцам
+        with profile_stage('finger_load', items=len(tables.char_counts)):
+            finger_load = self.penalty_calculator.calculate_finger_load_from_counts(
+                tables.char_counts, layout_map
+            )
+
+        # Анализ баланса рук
+        with profile_stage('hand_balance', items=len(tables.word_char_counts)):
+            hand_balance = self.data.calculate_hand_balance_from_counts(
+                tables.word_char_counts, layout_map
+            )
+
+        # Анализ двухсимвольных комбинаций
+        with profile_stage('two_char_analysis', items=len(tables.bigram_counts)):
+            two_char_analysis = self.data.analyze_two_char_combinations(
+                tables.bigram_counts, layout_map
+            )
+
+        # Роллы, чередование и прочие метрики трехсимвольных комбинаций
+        with profile_stage('trigram_analysis') as record:
+            trigram_arrays = tables.trigram_arrays()
+            record['items'] = len(trigram_arrays[2])
+            trigram_analysis = self.data.calculate_trigram_metrics_from_arrays(trigram_arrays, layout_map)
+
+        # Пары потока нажатий: через пробел, знаки и границы слов
+        with profile_stage('keystroke_analysis', items=len(tables.stream_pairs)):
+            keystroke_analysis = tables.keystroke_analysis(layout_map)
+
+        return {
+            'comfort_combos': comfort_combos,
+            'partial_combos': partial_combos,
+            'uncomfortable_combos': uncomfortable_combos,
+            'total_comfort': comfort_totals['comfortable'],
+            'total_partial': comfort_totals['partially_comfortable'],
+            'total_uncomfortable': comfort_totals['uncomfortable'],
+            'two_char_analysis': two_char_analysis,
+            'trigram_analysis': trigram_analysis,
+            'keystroke_analysis': keystroke_analysis,
+            'finger_load': finger_load,
+            'finger_penalty': finger_penalty,
+            'hand_balance': hand_balance,
+            'avg_dynamic_score': np.mean(list(dynamic_scores.values())) if dynamic_scores else 0
+        }
@@ -5,91 +5,53 @@
 from typing import Dict, Any, Tuple, List
 from collections import defaultdict
 
+import numpy as np
+
+from layouts.key_tables import (
+    FINGER_ORDER, FINGER_INDEX, KEY_FINGER, KEY_HAND, KEY_POSITIONS, HOME_POSITIONS,
+    KEY_FINGER_INDEX, KEY_HOME_DISTANCE, FINGER_BY_SCANCODE, HAND_BY_SCANCODE,
+    MODIFIER_SHIFT, MODIFIER_ALT, MODIFIER_MASK_COUNT
+)
+from layouts.compiled_layout import CompiledLayout, compile_layout
+
+
+# Индексы мизинцев: Shift под мизинцем штрафуется сильнее
+PINKY_FINGERS = (FINGER_INDEX['left_pinky'], FINGER_INDEX['right_pinky'])
+
+# Штраф за Alt (нажимается большим пальцем, поэтому меньше, чем за Shift)
+ALT_PENALTY = 0.5
+
+
+def _typed_chars(layout: CompiledLayout) -> np.ndarray:
+    '''Маска символов раскладки, которые учитываются в штрафах и нагрузке (не пробельные)'''
+    return np.fromiter((bool(char.strip()) for char in layout.chars), dtype=bool, count=len(layout.chars))
+
 
 class FingerPenaltyCalculator:
     """Класс для расчета штрафов на основе расстояния от домашнего ряда"""
     
     def __init__(self):
-        # Соответствие сканкодов позициям на клавиатуре (ряд, колонка)
-        # Основано на стандартной QWERTY раскладке
-        self.key_positions = {
-            # Цифровой ряд (ряд 2)
-            '02': (2, 0), '03': (2, 1), '04': (2, 2), '05': (2, 3), '06': (2, 4),
-            '07': (2, 5), '08': (2, 6), '09': (2, 7), '0A': (2, 8), '0B': (2, 9),
-            
-            # Верхний ряд (ряд 1)
-            '10': (1, 0), '11': (1, 1), '12': (1, 2), '13': (1, 3), '14': (1, 4),
-            '15': (1, 5), '16': (1, 6), '17': (1, 7), '18': (1, 8), '19': (1, 9),
-            '1A': (1, 10), '1B': (1, 11),
-            
-            # Домашний ряд (ряд 0)
-            '1E': (0, 0), '1F': (0, 1), '20': (0, 2), '21': (0, 3), '22': (0, 4),
-            '23': (0, 5), '24': (0, 6), '25': (0, 7), '26': (0, 8), '27': (0, 9),
-            '28': (0, 10), '29': (0, 11),
-            
-            # Нижний ряд (ряд -1)
-            '2C': (-1, 0), '2D': (-1, 1), '2E': (-1, 2), '2F': (-1, 3), '30': (-1, 4),
-            '31': (-1, 5), '32': (-1, 6), '33': (-1, 7), '34': (-1, 8), '35': (-1, 9),
-            '36': (-1, 10), '37': (-1, 11),
-            
-            # LAlt для раскладок с двумя буквами на одной позиции
-            '38': (-1, 0),
-            
-            # Пробел
-            '39': (-2, 5),
-        }
-        
-        # Домашняя позиция для каждого пальца (ряд, колонка) для стандартной QWERTY
-        self.home_positions = {
-            'left_pinky': (0, 0),   # A
-            'left_ring': (0, 1),    # S
-            'left_middle': (0, 2),  # D
-            'left_index': (0, 3),   # F
-            
-            'right_index': (0, 5),  # J
-            'right_middle': (0, 6), # K
-            'right_ring': (0, 7),   # L
-            'right_pinky': (0, 8),  # ;
-        }
-        
-        # Соответствие сканкодов пальцам (БЕЗ БОЛЬШИХ ПАЛЬЦЕВ)
-        self.key_finger = {
-            'left_pinky': ['02', '10', '1E', '2C', '38'],
-            'left_ring': ['03', '11', '1F', '2D'],
-            'left_middle': ['04', '12', '20', '2E'],
-            'left_index': ['05', '13', '21', '2F', '06', '14', '22', '30'],
-            
-            'right_index': ['07', '15', '23', '31', '08', '16', '24', '32'],
-            'right_middle': ['09', '17', '25', '33'],
-            'right_ring': ['0A', '18', '26', '34'],
-            'right_pinky': ['0B', '19', '27', '35', '0C', '1A', '28', '36', '29', '0D', '1B', '37'],
-        }
-        
-        # Соответствие сканкодов рукам (БЕЗ БОЛЬШИХ ПАЛЬЦЕВ)
-        self.key_hand = {
-            'left': ['02', '03', '04', '05', '06', '10', '11', '12', '13', '14', 
-                    '1E', '1F', '20', '21', '22', '2C', '2D', '2E', '2F', '30', '38'],
-            'right': ['07', '08', '09', '0A', '0B', '0C', '0D', '15', '16', '17', '18',
-                     '19', '1A', '1B', '23', '24', '25', '26', '27', '28', '29',
-                     '31', '32', '33', '34', '35', '36', '37']
-        }
+        # Позиции клавиш (ряд, колонка), домашние позиции пальцев и соответствие
+        # сканкодов пальцам и рукам (БЕЗ БОЛЬШИХ ПАЛЬЦЕВ) - общие таблицы из layouts.key_tables
+        self.key_positions = KEY_POSITIONS
+        self.home_positions = HOME_POSITIONS
+        self.key_finger = KEY_FINGER
+        self.key_hand = KEY_HAND
         
         # Дополнительный штраф за использование Shift мизинцем
         self.shift_penalty = 3.0
         
+        # Таблица клавиша x маска модификаторов; пересчитывается при смене shift_penalty
+        self._key_penalty = None
+        self._key_penalty_shift = None
+        
     def get_finger_for_scancode(self, scancode: str) -> str:
         """Получает палец для сканкода"""
-        for finger, scancodes in self.key_finger.items():
-            if scancode in scancodes:
-                return finger
-        return None
+        return FINGER_BY_SCANCODE.get(scancode)
     
     def get_hand_for_scancode(self, scancode: str) -> str:
         """Получает руку для сканкода"""
-        for hand, scancodes in self.key_hand.items():
-            if scancode in scancodes:
-                return hand
-        return None
+        return HAND_BY_SCANCODE.get(scancode)
     
     def get_key_position(self, scancode: str) -> Tuple[int, int]:
         """Получает позицию клавиши (ряд, колонка)"""
@@ -150,78 +112,127 @@ class FingerPenaltyCalculator:
                 if 'alt' in modifiers:
                     # Alt нажимается большим пальцем, который не учитывается в штрафах за пальцы
                     # Но сам факт использования модификатора дает небольшой штраф
-                    total_penalty += 0.5  # Небольшой штраф за использование Alt
+                    total_penalty += ALT_PENALTY  # Небольшой штраф за использование Alt
                 
                 return total_penalty
         return 0.0
     
+    def key_penalty_table(self) -> np.ndarray:
+        """
+        Штрафы всех клавиш сразу: матрица клавиша x маска модификаторов
+        Штраф = расстояние от домашнего ряда + Shift (мизинцем дороже) + Alt;
+        у клавиш без пальца (пробел, неизвестные сканкоды) штраф нулевой
+        """
+        if self._key_penalty is None or self._key_penalty_shift != self.shift_penalty:
+            fingers = np.array(KEY_FINGER_INDEX)
+            distance = np.array(KEY_HOME_DISTANCE, dtype=np.float64)
+            shift_cost = np.where(np.isin(fingers, PINKY_FINGERS), self.shift_penalty, self.shift_penalty * 0.5)
+            
+            masks = np.arange(MODIFIER_MASK_COUNT)
+            table = (distance[:, None]
+                     + np.outer(shift_cost, (masks & MODIFIER_SHIFT) != 0)
+                     + ALT_PENALTY * ((masks & MODIFIER_ALT) != 0))
+            table[fingers < 0] = 0.0
+            
+            self._key_penalty = table
+            self._key_penalty_shift = self.shift_penalty
+        
+        return self._key_penalty
+    
+    def char_penalties(self, layout: CompiledLayout) -> np.ndarray:
+        """
+        Штрафы всех символов скомпилированной раскладки (в порядке layout.chars):
+        штраф клавиши с модификаторами символа, 0 для нештрафуемых символов
+        """
+        penalties = self.key_penalty_table()[layout.key_indices, layout.modifiers]
+        return np.where(layout.penalized, penalties, 0.0)
+    
+    def compile_penalty_table(self, layout_map: Dict[str, Any]) -> Dict[str, float]:
+        """
+        Компилирует раскладку в таблицу символ -> штраф (с учетом Shift и Alt)
+        Пробельные символы и символы без сканкода в таблицу не попадают
+        """
+        layout = compile_layout(layout_map)
+        return {
+            char: penalty for char, penalty in zip(layout.chars, self.char_penalties(layout).tolist())
+            if char.strip()
+        }
+    
     def calculate_penalty_for_char(self, char: str, layout_map: Dict[str, Any]) -> float:
         """Рассчитывает штраф для символа"""
-        if not char or char == ' ':
+        if not char or char == ' ' or char not in layout_map:
             return 0.0
         
-        if char in layout_map:
-            scancode_info = layout_map[char]
-            if isinstance(scancode_info, dict):
-                scancode = scancode_info.get('scancode')
-                modifiers = scancode_info.get('modifiers', [])
-                
-                if scancode and scancode != '39':  # Игнорируем пробел
-                    # Определяем палец для этого сканкода
-                    finger = self.get_finger_for_scancode(scancode)
-                    if finger:
-                        # Штраф = расстояние от домашнего ряда
-                        distance = self.calculate_distance(scancode, finger)
-                        
-                        # Дополнительный штраф за модификаторы
-                        modifier_penalty = 0.0
-                        
-                        if 'shift' in modifiers:
-                            # Штраф за Shift выше, если используется мизинец
-                            if finger in ['left_pinky', 'right_pinky']:
-                                modifier_penalty += self.shift_penalty
-                            else:
-                                modifier_penalty += self.shift_penalty * 0.5
-                        
-                        if 'alt' in modifiers:
-                            # Небольшой штраф за использование Alt
-                            modifier_penalty += 0.5
-                        
-                        # Общий штраф = расстояние + штраф за модификаторы
-                        return distance + modifier_penalty
+        # Обычную карту достаточно скомпилировать для одного символа
+        layout = layout_map if isinstance(layout_map, CompiledLayout) else CompiledLayout({char: layout_map[char]})
+        idx = layout.char_index.get(char)
+        if idx is None:
+            return 0.0
         
-        return 0.0
+        if not layout.penalized[idx]:
+            return 0.0
+        return float(self.key_penalty_table()[layout.key_indices[idx], layout.modifiers[idx]])
     
     def calculate_finger_penalty(self, text: str, layout_map: Dict[str, Any]) -> float:
         """
         Рассчитывает общий штраф для текста
-        Штраф накапливается для каждого символа
+        Весь текст переводится в номера символов раскладки (UTF-32 -> таблица),
+        штраф - скалярное произведение их количеств на штрафы символов
         """
-        total_penalty = 0.0
-        char_count = 0
-        
-        for char in text:
-            if char.strip() and char != ' ':
-                penalty = self.calculate_penalty_for_char(char, layout_map)
-                total_penalty += penalty
-                char_count += 1
+        layout = compile_layout(layout_map)
+        return self._penalty_from_char_counts(layout, layout.count_chars(text))
+    
+    def calculate_finger_penalty_from_counts(self, char_counts: Dict[str, int], layout_map: Dict[str, Any]) -> float:
+        """
+        Рассчитывает общий штраф по количеству каждого символа:
+        скалярное произведение частот символов раскладки на их штрафы
+        """
+        layout = compile_layout(layout_map)
+        counts = np.fromiter(
+            (char_counts.get(char, 0) for char in layout.chars), dtype=np.int64, count=len(layout.chars)
+        )
+        return self._penalty_from_char_counts(layout, counts)
+    
+    def _penalty_from_char_counts(self, layout: CompiledLayout, counts: np.ndarray) -> float:
+        """Суммарный штраф по количествам символов раскладки (в порядке layout.chars)"""
+        # Пробельные символы не штрафуются
+        counts = np.where(_typed_chars(layout), counts, 0).astype(np.float64)
         
         # Возвращаем суммарный штраф (не средний!)
-        return total_penalty
+        return float(np.dot(counts, self.char_penalties(layout)))
     
     def calculate_finger_load(self, text: str, layout_map: Dict[str, Any]) -> Dict[str, int]:
-        """Подсчет нагрузки на пальцы (количество кликов)"""
+        """
+        Подсчет нагрузки на пальцы (количество кликов)
+        Количества символов раскладки в тексте считаются векторно и суммируются по пальцам
+        """
+        layout = compile_layout(layout_map)
+        counts = layout.count_chars(text)
+        return self._finger_load_from_char_counts(layout, counts, counts > 0)
+    
+    def calculate_finger_load_from_counts(self, char_counts: Dict[str, int], layout_map: Dict[str, Any]) -> Dict[str, int]:
+        """
+        Подсчет нагрузки на пальцы по количеству каждого символа:
+        частоты символов раскладки суммируются по пальцам (np.bincount)
+        """
+        layout = compile_layout(layout_map)
+        counts = np.fromiter(
+            (char_counts.get(char, 0) for char in layout.chars), dtype=np.int64, count=len(layout.chars)
+        )
+        present = np.fromiter((char in char_counts for char in layout.chars), dtype=bool, count=len(layout.chars))
+        return self._finger_load_from_char_counts(layout, counts, present)
+    
+    def _finger_load_from_char_counts(self, layout: CompiledLayout, counts: np.ndarray,
+                                      present: np.ndarray) -> Dict[str, int]:
+        """Нагрузка на пальцы по количествам символов раскладки (present - встретившиеся символы)"""
         finger_load = defaultdict(int)
         
-        for char in text:
-            if char.strip() and char != ' ':
-                if char in layout_map:
-                    scancode_info = layout_map[char]
-                    if isinstance(scancode_info, dict):
-                        scancode = scancode_info.get('scancode')
-                        if scancode and scancode != '39':  # Игнорируем пробел
-                            finger = self.get_finger_for_scancode(scancode)
-                            if finger:
-                                finger_load[finger] += 1
+        # У пробела пальца нет; пробельные символы не считаются
+        counted = present & _typed_chars(layout) & (layout.fingers >= 0)
+        fingers = layout.fingers[counted]
+        
+        loads = np.bincount(fingers, weights=counts[counted], minlength=len(FINGER_ORDER))
+        for finger in np.unique(fingers).tolist():
+            finger_load[FINGER_ORDER[finger]] = int(loads[finger])
         
-        return finger_load
\ No newline at end of file
+        return finger_load
@@ -0,0 +1,240 @@
+"""
+Самые частые n-граммы корпуса в фиксированной памяти (Space-Saving)
+
+Точные счетчики всех трех- и четырехсимвольных комбинаций на очень больших
+текстах не помещаются в память. Алгоритм Space-Saving хранит не больше
+capacity комбинаций: новая комбинация вытесняет самую редкую из хранимых
+и наследует ее счетчик как погрешность. Для каждой хранимой комбинации
+истинная частота лежит в [count - error, count], а error не превышает
+total / capacity; любая комбинация чаще total / capacity гарантированно хранится.
+
+По найденным комбинациям строится отчет "худшие комбинации раскладки":
+частота комбинации, умноженная на неудобство переходов между ее клавишами.
+"""
+
+import heapq
+from collections import Counter
+from typing import Dict, Any, Hashable, Iterable, List, Optional, Tuple
+
+from analysis.combo_analyzer import combos_counter
+from analysis.text_processor import (
+    DEFAULT_CHUNK_SIZE, WORD_PATTERN, is_frequency_file, iter_text_chunks, parse_frequency_line
+)
+from layouts.compiled_layout import compile_layout
+from layouts.key_tables import KEY_PAIR_CATEGORY, KEY_PAIR_SCORE, COMFORT_CATEGORIES
+
+
+# Сколько комбинаций каждой длины хранится по умолчанию
+DEFAULT_CAPACITY = 10000
+
+# Длины комбинаций для отчета о худших комбинациях
+DEFAULT_HEAVY_LENGTHS = (3, 4)
+
+# Сколько строк частотного словаря обрабатывается за раз
+FREQUENCY_BATCH_LINES = 100000
+
+
+class SpaceSaving:
+    """
+    Приближенный счетчик самых частых элементов потока (Space-Saving)
+    Память - не больше capacity элементов при любой длине потока
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError("capacity должна быть положительной")
+        self.capacity = capacity
+        # Элемент -> оценка частоты сверху и ее максимальная погрешность
+        self.counts = {}
+        self.errors = {}
+        # Сумма весов всех элементов потока
+        self.total = 0
+        # Куча (счетчик, элемент) для поиска самого редкого элемента;
+        # счетчики в куче обновляются лениво (только при извлечении)
+        self._heap = []
+
+    def update(self, item: Hashable, count: int = 1) -> None:
+        """Добавляет элемент потока с весом count"""
+        self.total += count
+        counts = self.counts
+
+        if item in counts:
+            counts[item] += count
+            return
+
+        if len(counts) < self.capacity:
+            counts[item] = count
+            self.errors[item] = 0
+            heapq.heappush(self._heap, (count, item))
+            return
+
+        # Вытесняем самый редкий элемент; новый наследует его счетчик как погрешность
+        min_count, min_item = self._pop_min()
+        del counts[min_item]
+        del self.errors[min_item]
+
+        counts[item] = min_count + count
+        self.errors[item] = min_count
+        heapq.heappush(self._heap, (min_count + count, item))
+
+    def update_counts(self, item_counts: Dict[Hashable, int]) -> None:
+        """Добавляет уже агрегированные частоты (например, по блоку текста)"""
+        for item, count in item_counts.items():
+            self.update(item, count)
+
+    def _pop_min(self) -> Tuple[int, Hashable]:
+        """Извлекает элемент с наименьшим текущим счетчиком"""
+        heap = self._heap
+        while True:
+            count, item = heapq.heappop(heap)
+            current = self.counts[item]
+            if current == count:
+                return count, item
+            # Счетчик вырос после попадания в кучу - возвращаем с актуальным значением
+            heapq.heappush(heap, (current, item))
+
+    def error_bound(self) -> int:
+        """Наибольшая возможная погрешность счетчика (0, пока память не заполнена)"""
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def top(self, k: int) -> List[Tuple[Hashable, int, int]]:
+        """k элементов с наибольшей оценкой частоты: (элемент, оценка, погрешность)"""
+        items = heapq.nlargest(k, self.counts.items(), key=lambda item: (item[1], -self.errors[item[0]]))
+        return [(item, count, self.errors[item]) for item, count in items]
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+
+class HeavyNgrams:
+    """Самые частые комбинации внутри слов по длинам, по счетчику Space-Saving на длину"""
+
+    def __init__(self, lengths: Iterable[int] = DEFAULT_HEAVY_LENGTHS, capacity: int = DEFAULT_CAPACITY):
+        self.lengths = sorted(lengths)
+        self.counters = {length: SpaceSaving(capacity) for length in self.lengths}
+
+    def add_words(self, word_counts: Dict[str, int]) -> None:
+        """
+        Добавляет частоты слов (обычно - одного блока текста)
+        Комбинации блока сначала считаются точно, затем передаются в счетчики
+        """
+        combos = combos_counter(word_counts, max(self.lengths))
+        for length in self.lengths:
+            self.counters[length].update_counts(combos[length])
+
+    def top(self, length: int, k: int) -> List[Tuple[str, int, int]]:
+        """k самых частых комбинаций длины length: (комбинация, оценка, погрешность)"""
+        return self.counters[length].top(k)
+
+    def error_bound(self, length: int) -> int:
+        """Наибольшая погрешность частот комбинаций длины length"""
+        return self.counters[length].error_bound()
+
+
+def stream_heavy_ngrams(filename: str, lengths: Iterable[int] = DEFAULT_HEAVY_LENGTHS,
+                        capacity: int = DEFAULT_CAPACITY, min_length: int = 2,
+                        chunk_size: int = DEFAULT_CHUNK_SIZE) -> Optional[HeavyNgrams]:
+    '''
+    Получает: файл корпуса (текст или частотный словарь), длины комбинаций,
+    число хранимых комбинаций каждой длины
+    Возвращает: HeavyNgrams после одного прохода по файлу или None, если файл не найден
+    Память не зависит от размера корпуса: блок текста + capacity комбинаций на длину
+    '''
+    heavy = HeavyNgrams(lengths, capacity)
+
+    try:
+        if is_frequency_file(filename):
+            with open(filename, 'r', encoding='utf-8') as file:
+                batch = Counter()
+                for line_number, line in enumerate(file, 1):
+                    parsed = parse_frequency_line(line)
+                    if parsed is not None:
+                        entry, count = parsed
+                        for word in WORD_PATTERN.findall(entry):
+                            if len(word) >= min_length:
+                                batch[word.lower()] += count
+                    if line_number % FREQUENCY_BATCH_LINES == 0:
+                        heavy.add_words(batch)
+                        batch = Counter()
+                heavy.add_words(batch)
+        else:
+            for chunk in iter_text_chunks(filename, chunk_size):
+                heavy.add_words(Counter(
+                    word.lower() for word in WORD_PATTERN.findall(chunk) if len(word) >= min_length
+                ))
+    except FileNotFoundError:
+        print(f"Файл {filename} не найден")
+        return None
+
+    return heavy
+
+
+def combo_cost(combo: str, char_keys: Dict[str, int]) -> Optional[Tuple[float, List[str]]]:
+    '''
+    Получает: комбинацию и индексы клавиш символов раскладки
+    Возвращает: неудобство комбинации (сумма 1 - оценка удобства по переходам
+    между соседними клавишами) и категории переходов;
+    None, если какого-то символа нет в раскладке
+    '''
+    keys = [char_keys.get(char) for char in combo]
+    if None in keys:
+        return None
+
+    cost = 0.0
+    categories = []
+    for key1, key2 in zip(keys, keys[1:]):
+        cost += 1.0 - KEY_PAIR_SCORE[key1, key2]
+        categories.append(COMFORT_CATEGORIES[KEY_PAIR_CATEGORY[key1, key2]])
+
+    return cost, categories
+
+
+def worst_combos(top_combos: List[Tuple[str, int, int]], layout_map: Dict[str, Any],
+                 k: int = 10) -> List[Dict[str, Any]]:
+    '''
+    Получает: частые комбинации (комбинация, оценка частоты, погрешность), карту раскладки
+    Возвращает: k комбинаций с наибольшим вкладом в неудобство раскладки
+    (частота x неудобство); комбинации с символами вне раскладки пропускаются
+    '''
+    char_keys = compile_layout(layout_map).char_keys
+    rows = []
+
+    for combo, count, error in top_combos:
+        scored = combo_cost(combo, char_keys)
+        if scored is None:
+            continue
+        cost, categories = scored
+        if cost <= 0:
+            continue
+        rows.append({
+            'combo': combo,
+            'count': count,
+            'error': error,
+            'cost': cost,
+            'weighted_cost': count * cost,
+            'transitions': categories,
+        })
+
+    rows.sort(key=lambda row: row['weighted_cost'], reverse=True)
+    return rows[:k]
+
+
+def worst_combos_report(heavy: HeavyNgrams, layout_maps: Dict[str, Dict[str, Any]], k: int = 10,
+                        candidates: int = None) -> Dict[str, Dict[int, List[Dict[str, Any]]]]:
+    '''
+    Получает: частые комбинации корпуса и карты раскладок
+    Возвращает: раскладка -> длина комбинации -> k худших комбинаций
+    Кандидаты - candidates самых частых комбинаций каждой длины (по умолчанию 20 * k)
+    '''
+    candidates = candidates or 20 * k
+    top_by_length = {length: heavy.top(length, candidates) for length in heavy.lengths}
+
+    return {
+        layout_name: {
+            length: worst_combos(top_combos, layout_map, k)
+            for length, top_combos in top_by_length.items()
+        }
+        for layout_name, layout_map in layout_maps.items()
+    }
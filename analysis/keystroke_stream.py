@@ -0,0 +1,150 @@
+"""
+Модель потока нажатий
+
+Текст рассматривается как последовательность событий (клавиша, модификаторы):
+каждый символ - нажатие клавиши раскладки с маской Shift / Alt (слой LAlt),
+пробел - нажатие клавиши пробела. В отличие от комбинаций внутри слов,
+поток содержит переходы через пробел и знаки препинания.
+
+Для корпуса поток хранится в виде таблицы соседних пар символов
+(CorpusStats.stream_pairs), не зависящей от раскладки: каждая раскладка
+классифицирует все пары одним векторным проходом. Метрики внутри слов -
+тот же проход, ограниченный парами из двух букв.
+"""
+
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+from analysis.text_processor import WORD_LETTERS
+from layouts.compiled_layout import compile_layout
+from layouts.key_tables import (
+    KEY_FINGER_INDEX, KEY_HAND_INDEX, KEY_PAIR_CATEGORY, COMFORT_CATEGORIES, SPACE_SCANCODE,
+    UNKNOWN_KEY, key_index
+)
+
+
+# Индекс клавиши пробела
+SPACE_KEY = key_index(SPACE_SCANCODE)
+
+# Поля метрик пар нажатий
+KEYSTROKE_FIELDS = (
+    ['total'] + COMFORT_CATEGORIES
+    + ['same_finger', 'same_key', 'hand_alternation', 'space', 'modifier_changes', 'unmapped']
+)
+
+_FINGERS = np.array(KEY_FINGER_INDEX)
+_HANDS = np.array(KEY_HAND_INDEX)
+
+
+def compile_char_events(layout_map: Dict[str, Any]) -> Dict[str, Tuple[int, int]]:
+    '''
+    Получает: карту раскладки
+    Возвращает: символ -> (индекс клавиши, маска модификаторов)
+    Пробел нажимается клавишей пробела, даже если его нет в карте
+    '''
+    layout = compile_layout(layout_map)
+    events = {' ': (SPACE_KEY, 0)}
+    events.update(zip(layout.chars, zip(layout.key_indices.tolist(), layout.modifiers.tolist())))
+    return events
+
+
+def pair_char_arrays(pair_counts: Dict[str, int]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    '''
+    Получает: таблицу пар символов (пара -> количество)
+    Возвращает: алфавит пар, индексы символов в алфавите (n x 2) и количества
+    Не зависит от раскладки, поэтому строится один раз на корпус
+    '''
+    pairs = [pair for pair in pair_counts if len(pair) == 2]
+    alphabet = sorted(set(''.join(pairs)))
+    char_index = {char: idx for idx, char in enumerate(alphabet)}
+
+    indices = np.fromiter(
+        (char_index[char] for pair in pairs for char in pair), dtype=np.intp, count=2 * len(pairs)
+    ).reshape(-1, 2)
+    counts = np.fromiter((pair_counts[pair] for pair in pairs), dtype=np.int64, count=len(pairs))
+
+    return alphabet, indices, counts
+
+
+def _alphabet_events(alphabet: List[str], layout_map: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Клавиша и маска модификаторов каждого символа алфавита пар (-1 - символа нет в раскладке)
+    Последний элемент - пустой символ для индексов за пределами алфавита
+    '''
+    events = compile_char_events(layout_map)
+    char_keys = np.array([events.get(char, (-1, 0))[0] for char in alphabet] + [-1], dtype=np.intp)
+    char_modifiers = np.array([events.get(char, (-1, 0))[1] for char in alphabet] + [0], dtype=np.intp)
+    return char_keys, char_modifiers
+
+
+def _pair_metrics(counts: np.ndarray, mapped: np.ndarray, keys: np.ndarray,
+                  modifiers: np.ndarray) -> Dict[str, int]:
+    '''Сводка по парам нажатий (маски и массивы одинаковой длины)'''
+    known_counts = counts[mapped]
+    keys = keys[mapped]
+    modifiers = modifiers[mapped]
+
+    fingers = _FINGERS[keys]
+    hands = _HANDS[keys]
+    fingered = (fingers >= 0).all(axis=1)
+
+    results = {'total': int(known_counts.sum())}
+
+    # Удобство переходов между пальцами (пары с пробелом и клавишами без пальца - отдельно)
+    categories = KEY_PAIR_CATEGORY[keys[fingered, 0], keys[fingered, 1]]
+    totals = np.bincount(categories, weights=known_counts[fingered], minlength=len(COMFORT_CATEGORIES))
+    for idx, category in enumerate(COMFORT_CATEGORIES):
+        results[category] = int(totals[idx])
+
+    same_finger = fingered & (fingers[:, 0] == fingers[:, 1])
+    same_key = keys[:, 0] == keys[:, 1]
+    results['same_finger'] = int(known_counts[same_finger & ~same_key].sum())
+    results['same_key'] = int(known_counts[same_key].sum())
+    results['hand_alternation'] = int(known_counts[fingered & (hands[:, 0] != hands[:, 1])].sum())
+    results['space'] = int(known_counts[(keys == SPACE_KEY).any(axis=1)].sum())
+    # Между нажатиями нажимается или отпускается Shift / Alt
+    results['modifier_changes'] = int(known_counts[modifiers[:, 0] != modifiers[:, 1]].sum())
+    results['unmapped'] = int(counts[~mapped].sum())
+
+    return results
+
+
+def keystroke_bigram_metrics(pair_arrays: Tuple[List[str], np.ndarray, np.ndarray],
+                             layout_map: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+    '''
+    Получает: пары потока нажатий (см. pair_char_arrays) и карту раскладки
+    Возвращает: метрики пар всего потока ('stream') и только пар внутри слов ('word_internal'):
+    количество пар, удобство переходов, тот же палец, повтор клавиши, смена рук,
+    пары с пробелом, смена модификаторов, пары с символами вне раскладки
+    Все пары классифицируются одним проходом; внутрисловные - фильтр по маске
+    '''
+    alphabet, indices, counts = pair_arrays
+    char_keys, char_modifiers = _alphabet_events(alphabet, layout_map)
+    word_chars = np.array([char in WORD_LETTERS for char in alphabet] + [False])
+
+    keys = char_keys[indices]
+    modifiers = char_modifiers[indices]
+    mapped = (keys >= 0).all(axis=1)
+    keys = np.where(keys >= 0, keys, UNKNOWN_KEY)
+    in_word = word_chars[indices].all(axis=1)
+
+    return {
+        'stream': _pair_metrics(counts, mapped, keys, modifiers),
+        'word_internal': _pair_metrics(counts[in_word], mapped[in_word], keys[in_word], modifiers[in_word]),
+    }
+
+
+def across_space_metrics(pair_arrays: Tuple[List[str], np.ndarray, np.ndarray],
+                         layout_map: Dict[str, Any]) -> Dict[str, int]:
+    '''
+    Получает: пары "последний символ слова -> первый символ следующего" и карту раскладки
+    Возвращает: метрики этих переходов (пробел между ними нажимается большим пальцем)
+    '''
+    alphabet, indices, counts = pair_arrays
+    char_keys, char_modifiers = _alphabet_events(alphabet, layout_map)
+
+    keys = char_keys[indices]
+    mapped = (keys >= 0).all(axis=1)
+    return _pair_metrics(counts, mapped, np.where(keys >= 0, keys, UNKNOWN_KEY), char_modifiers[indices])
+
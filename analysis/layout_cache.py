@@ -0,0 +1,93 @@
+"""
+Кэш результатов оценки раскладок
+
+Статистика раскладки зависит только от ее карты и корпуса, поэтому хранится
+под ключом из отпечатка карты раскладки и отпечатка корпуса. При повторном
+анализе пересчитываются только новые или измененные раскладки.
+"""
+
+import hashlib
+import json
+import os
+from collections import defaultdict
+from typing import Dict, Any, Optional
+
+
+# Версия расчета статистики: меняется вместе с составом или смыслом layouts_stats,
+# чтобы записи на диске от прежних версий не использовались
+SCORING_VERSION = 3
+
+# Поля статистики, которые при оценке являются defaultdict(int)
+DEFAULTDICT_FIELDS = ('comfort_combos', 'partial_combos', 'uncomfortable_combos', 'finger_load')
+
+
+def layout_fingerprint(layout_map: Dict[str, Any]) -> str:
+    '''
+    Устойчивый отпечаток карты раскладки: не зависит от порядка символов
+    и одинаков между запусками программы
+    '''
+    payload = json.dumps(layout_map, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=20).hexdigest()
+
+
+class LayoutResultCache:
+    """
+    Кэш статистики раскладок в памяти и (если задана папка) на диске
+    Ключ - отпечаток карты раскладки, отпечаток корпуса и версия расчета
+    """
+
+    def __init__(self, cache_dir: str = None):
+        self.cache_dir = cache_dir
+        self.memory = {}
+
+    def key(self, layout_map: Dict[str, Any], corpus_fingerprint: str, settings: Dict[str, Any] = None) -> str:
+        """Ключ записи для карты раскладки и корпуса (settings - параметры расчета)"""
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"{SCORING_VERSION}:{corpus_fingerprint}:".encode('ascii'))
+        digest.update(layout_fingerprint(layout_map).encode('ascii'))
+        if settings:
+            digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Статистика из кэша или None"""
+        stats = self.memory.get(key)
+        if stats is not None or not self.cache_dir:
+            return stats
+
+        entry_path = os.path.join(self.cache_dir, f"{key}.json")
+        try:
+            with open(entry_path, 'r', encoding='utf-8') as f:
+                stats = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Ошибка чтения кэша раскладки {entry_path}: {e}")
+            return None
+
+        for field in DEFAULTDICT_FIELDS:
+            stats[field] = defaultdict(int, stats[field])
+
+        self.memory[key] = stats
+        return stats
+
+    def put(self, key: str, stats: Dict[str, Any]) -> None:
+        """Сохраняет статистику в памяти и, если задана папка, на диске"""
+        self.memory[key] = stats
+        if not self.cache_dir:
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry_path = os.path.join(self.cache_dir, f"{key}.json")
+        tmp_path = entry_path + '.tmp'
+
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(stats, f, ensure_ascii=False, default=float)
+            os.replace(tmp_path, entry_path)
+        except OSError as e:
+            print(f"Не удалось сохранить кэш раскладки: {e}")
+
+    def clear(self) -> None:
+        """Очищает кэш в памяти (записи на диске остаются)"""
+        self.memory.clear()
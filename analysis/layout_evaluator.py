@@ -1,18 +1,27 @@
-import json
-import matplotlib.pyplot as plt
-from typing import Dict, List, Any
-import numpy as np
-from collections import defaultdict
-import re
+from typing import Dict, List, Any, Optional, Tuple
+from functools import partial
 import os
-import glob
 
 from visualization.stats_formatter import format_number
-from visualization.charts import visualize_finger_statistics, visualize_combo_distribution
-from analysis.text_processor import file_to_words_set, detect_language_ratio
-from analysis.combo_analyzer import combos_counter, scancode_from_char, key_from_value
+from analysis.text_processor import CorpusStats, stream_corpus_stats
+from analysis.corpus_cache import CorpusCache
+from analysis.parallel_corpus import build_corpus_tables
+from analysis.layout_cache import LayoutResultCache
 from analysis.finger_penalty_calculator import FingerPenaltyCalculator
-from layouts.layout_data import LayoutData
+from analysis.evaluation_engine import CorpusTables, EvaluationEngine
+from analysis.parallel_evaluation import score_layouts_parallel
+from analysis.layout_ranking import rank_layouts, select_layouts_by_language
+from analysis.heavy_hitters import DEFAULT_CAPACITY, DEFAULT_HEAVY_LENGTHS, stream_heavy_ngrams, worst_combos_report
+from optimization.layout_optimizer import LayoutOptimizer
+from layouts.layout_data import LayoutData, BUILTIN_LAYOUT_LANGUAGES
+from layouts.layout_maps import BUILTIN_LAYOUTS, builtin_layout_data
+from layouts.key_tables import FINGER_BY_SCANCODE
+from layouts.compiled_layout import CompiledLayout
+from layouts.layout_loader import (
+    LayoutFileCache, layout_map_from_data, add_char_to_layout, penalty_for_scancode,
+    layout_files_in_folder, load_layout_files
+)
+from utils.stage_profiler import StageProfiler
 
 
 class LayoutEvaluator:
@@ -26,138 +35,59 @@ class LayoutEvaluator:
         
         # Статистика для всех раскладок
         self.all_layouts_stats = {}
+        # Таблицы корпуса последнего анализа (для оценки перестановок клавиш)
+        self.corpus_tables = None
+        
+        # Кэш статистики корпусов на диске (None - без кэша)
+        self.corpus_cache = CorpusCache()
+        
+        # Число процессов для подсчета статистики больших корпусов (None - один проход)
+        self.corpus_workers = None
+        
+        # Кэш результатов по раскладкам: в памяти; LayoutResultCache(папка) - еще и на диске
+        self.result_cache = LayoutResultCache()
+        
+        # Замер этапов анализа: включается LAYOUT_PROFILE=1 (LAYOUT_PROFILE_TRACE=файл - трасса Chrome)
+        # или self.profiler = StageProfiler(enabled=True)
+        self.profiler = StageProfiler.from_env()
         
         # Языки раскладок
-        self.layout_languages = {
-            'ЙЦУКЕН': 'russian',
-            'Скоропись': 'russian',
-            'Фонетическая (яВерт)': 'russian',
-            'Диктор': 'russian',
-            'QWERTY': 'english',
-            'Dvorak': 'english',
-            'Colemak': 'english',
-            'Workman': 'english'
-        }
+        self.layout_languages = dict(BUILTIN_LAYOUT_LANGUAGES)
+        
+        # Кэш разобранных файлов раскладок (повторный импорт разбирает только измененные файлы)
+        # и число потоков (процессов) для разбора папки (None - по числу ядер)
+        self.layout_file_cache = LayoutFileCache()
+        self.layout_workers = None
         
         # Автоматический импорт раскладок из папки
         self.import_layouts_from_folder()
     
     def import_layouts_from_folder(self):
-        """Автоматически импортирует все .json файлы из папки ready_made_layouts"""
+        """
+        Автоматически импортирует все .json файлы из папки ready_made_layouts
+        Файлы разбираются параллельно (неизмененные берутся из кэша),
+        карты раскладок компилируются при первом обращении
+        """
         folder_path = 'ready_made_layouts'
         if not os.path.exists(folder_path):
             os.makedirs(folder_path)
             print(f"Создана папка {folder_path}")
             return
         
-        json_files = glob.glob(os.path.join(folder_path, '*.json'))
-        for json_file in json_files:
+        loaded = load_layout_files(layout_files_in_folder(folder_path), self.layout_file_cache, self.layout_workers)
+        for json_file, layout_data, layout_map in loaded:
             try:
-                layout_name = self.load_custom_layout(json_file)
-                if layout_name:
-                    print(f"Автоматически загружена раскладка: {layout_name}")
+                layout_name = self._register_custom_layout(layout_data, layout_map)
+                print(f"Автоматически загружена раскладка: {layout_name}")
             except Exception as e:
                 print(f"Ошибка при загрузке {json_file}: {e}")
     
     def load_default_layouts(self) -> Dict[str, Any]:
-        """Загружает предустановленные раскладки (ТОЛЬКО ЦИФРЫ И БУКВЫ)"""
-        default_layouts = {}
-        
-        # ЙЦУКЕН (стандартная русская) - ТОЛЬКО ЦИФРЫ И БУКВЫ
-        default_layouts['ЙЦУКЕН'] = {
-            "name": "ЙЦУКЕН",
-            "language": "russian",
-            "layout": [
-                ["1", "2", "3", "4", "5", "6", "7", "8", "9", "0"],
-                ["й", "ц", "у", "к", "е", "н", "г", "ш", "щ", "з", "х", "ъ"],
-                ["ф", "ы", "в", "а", "п", "р", "о", "л", "д", "ж", "э"],
-                ["я", "ч", "с", "м", "и", "т", "ь", "б", "ю"]
-            ]
-        }
-        
-        # Скоропись (русская эргономичная) - ТОЛЬКО ЦИФРЫ И БУКВЫ
-        default_layouts['Скоропись'] = {
-            "name": "Скоропись",
-            "language": "russian",
-            "layout": [
-                ["1", "2", "3", "4", "5", "6", "7", "8", "9", "0"],
-                ["ц", "у", "а", "о", "в", "п", "р", "л", "д", "ж", "э"],
-                ["й", "к", "е", "н", "г", "ш", "з", "х", "ъ", "ф", "ы"],
-                ["я", "ч", "с", "м", "и", "т", "ь", "б", "ю"]
-            ]
-        }
-        
-        # Фонетическая (яВерт) - ТОЛЬКО ЦИФРЫ И БУКВЫ
-        default_layouts['Фонетическая (яВерт)'] = {
-            "name": "Фонетическая (яВерт)",
-            "language": "russian",
-            "layout": [
-                ["1", "2", "3", "4", "5", "6", "7", "8", "9", "0"],
-                ["я", "в", "е", "р", "т", "ы", "у", "и", "о", "п"],
-                ["а", "с", "д", "ф", "г", "х", "й", "к", "л"],
-                ["з", "ь", "ц", "ж", "б", "н", "м", "ш", "щ", "ч"]
-            ]
-        }
-        
-        # Диктор (русская эргономичная для диктовки) - ТОЛЬКО ЦИФРЫ И БУКВЫ
-        default_layouts['Диктор'] = {
-            "name": "Диктор",
-            "language": "russian",
-            "layout": [
-                ["1", "2", "3", "4", "5", "6", "7", "8", "9", "0"],
-                ["н", "т", "с", "р", "в", "м", "д", "п", "л", "г", "б", "ь"],
-                ["о", "а", "е", "и", "у", "к", "я", "ы", "з", "ж", "э"],
-                ["й", "ч", "х", "ц", "ф", "ш", "щ", "ю"]
-            ]
-        }
-        
-        # QWERTY (английская) - ТОЛЬКО ЦИФРЫ И БУКВЫ
-        default_layouts['QWERTY'] = {
-            "name": "QWERTY",
-            "language": "english",
-            "layout": [
-                ["1", "2", "3", "4", "5", "6", "7", "8", "9", "0"],
-                ["q", "w", "e", "r", "t", "y", "u", "i", "o", "p"],
-                ["a", "s", "d", "f", "g", "h", "j", "k", "l"],
-                ["z", "x", "c", "v", "b", "n", "m"]
-            ]
-        }
-        
-        # Dvorak (эргономичная английская) - ТОЛЬКО ЦИФРЫ И БУКВЫ
-        default_layouts['Dvorak'] = {
-            "name": "Dvorak",
-            "language": "english",
-            "layout": [
-                ["1", "2", "3", "4", "5", "6", "7", "8", "9", "0"],
-                ["p", "y", "f", "g", "c", "r", "l"],
-                ["a", "o", "e", "u", "i", "d", "h", "t", "n", "s"],
-                ["q", "j", "k", "x", "b", "m", "w", "v", "z"]
-            ]
-        }
-        
-        # Colemak (эргономичная английская) - ТОЛЬКО ЦИФРЫ И БУКВЫ
-        default_layouts['Colemak'] = {
-            "name": "Colemak",
-            "language": "english",
-            "layout": [
-                ["1", "2", "3", "4", "5", "6", "7", "8", "9", "0"],
-                ["q", "w", "f", "p", "g", "j", "l", "u", "y"],
-                ["a", "r", "s", "t", "d", "h", "n", "e", "i", "o"],
-                ["z", "x", "c", "v", "b", "k", "m"]
-            ]
-        }
-        
-        # Workman (эргономичная английская) - ТОЛЬКО ЦИФРЫ И БУКВЫ
-        default_layouts['Workman'] = {
-            "name": "Workman",
-            "language": "english",
-            "layout": [
-                ["1", "2", "3", "4", "5", "6", "7", "8", "9", "0"],
-                ["q", "d", "r", "w", "b", "j", "f", "u", "p"],
-                ["a", "s", "h", "t", "g", "y", "n", "e", "o", "i"],
-                ["z", "x", "m", "c", "v", "k", "l"]
-            ]
-        }
+        """
+        Загружает предустановленные раскладки (ТОЛЬКО ЦИФРЫ И БУКВЫ)
+        Ряды берутся из layouts.layout_maps - того же источника, что и карты LayoutData
+        """
+        default_layouts = {layout_name: builtin_layout_data(layout_name) for layout_name in BUILTIN_LAYOUTS}
         
         print(f"Загружено {len(default_layouts)} предустановленных раскладок")
         return default_layouts
@@ -187,161 +117,44 @@ class LayoutEvaluator:
     
     def load_custom_layout(self, layout_file: str):
         """Загружает кастомную раскладку из JSON файла"""
-        try:
-            with open(layout_file, 'r', encoding='utf-8') as f:
-                layout_data = json.load(f)
-            
-            layout_name = layout_data.get('name', os.path.basename(layout_file).replace('.json', ''))
-            self.layouts[layout_name] = layout_data
-            
-            # Определяем язык раскладки
-            language = layout_data.get('language', 'unknown')
-            self.layout_languages[layout_name] = language
-            
-            # Создаем карту раскладки если ее нет
-            if layout_name not in self.data.layout_maps:
-                self.data.layout_maps[layout_name] = self.create_layout_map_from_data(layout_data)
-            
-            print(f"Раскладка '{layout_name}' загружена успешно")
-            return layout_name
-            
-        except FileNotFoundError:
-            print(f"Файл {layout_file} не найден")
-            return None
-        except json.JSONDecodeError:
-            print(f"Ошибка чтения JSON файла {layout_file}")
+        loaded = load_layout_files([layout_file], self.layout_file_cache, workers=1)
+        if not loaded:
             return None
+        
+        _, layout_data, layout_map = loaded[0]
+        return self._register_custom_layout(layout_data, layout_map)
+    
+    def _register_custom_layout(self, layout_data: Dict[str, Any], layout_map: Dict[str, Any]) -> str:
+        """Добавляет загруженную раскладку; карта компилируется при первом обращении"""
+        layout_name = layout_data['name']
+        self.layouts[layout_name] = layout_data
+        
+        # Определяем язык раскладки
+        language = layout_data.get('language', 'unknown')
+        self.layout_languages[layout_name] = language
+        
+        # Создаем карту раскладки если ее нет
+        if layout_name not in self.data.layout_maps:
+            self.data.layout_maps.set_factory(layout_name, partial(CompiledLayout, layout_map))
+        
+        print(f"Раскладка '{layout_name}' загружена успешно")
+        return layout_name
     
     def create_layout_map_from_data(self, layout_data: Dict[str, Any]) -> Dict[str, Any]:
         """Создает карту раскладки из данных (только буквы и цифры) с учетом второго слоя через LAlt"""
-        layout_map = {}
-        
-        # Собираем все символы из раскладки
-        if 'layout' in layout_data:
-            scancodes = [
-                '02', '03', '04', '05', '06', '07', '08', '09', '0A', '0B',  # цифровой ряд
-                '10', '11', '12', '13', '14', '15', '16', '17', '18', '19', '1A', '1B',  # верхний ряд
-                '1E', '1F', '20', '21', '22', '23', '24', '25', '26', '27', '28', '29',  # домашний ряд
-                '2C', '2D', '2E', '2F', '30', '31', '32', '33', '34', '35', '36', '37',  # нижний ряд
-                '38'  # LAlt
-            ]
-            
-            scancode_idx = 0
-            
-            for row in layout_data['layout']:
-                for cell in row:
-                    if cell.strip():
-                        if scancode_idx < len(scancodes):
-                            scancode = scancodes[scancode_idx]
-                            scancode_idx += 1
-                            
-                            # Обрабатываем клетки с двумя символами через "/"
-                            if '/' in cell:
-                                parts = cell.split('/')
-                                if len(parts) >= 2:
-                                    # Первый символ - основной (без модификаторов)
-                                    primary_char = parts[0].strip()
-                                    # Второй символ - с Alt
-                                    alt_char = parts[1].strip() if len(parts) > 1 else ''
-                                    
-                                    # Добавляем основной символ (если еще не добавлен)
-                                    if primary_char and len(primary_char) == 1:
-                                        self._add_char_to_layout(layout_map, primary_char, scancode, [])
-                                    
-                                    # Добавляем Alt-символ (если еще не добавлен)
-                                    if alt_char and len(alt_char) == 1:
-                                        self._add_char_to_layout(layout_map, alt_char, scancode, ['alt'])
-                            else:
-                                # Одиночный символ
-                                char = cell.strip()
-                                if len(char) == 1:
-                                    self._add_char_to_layout(layout_map, char, scancode, [])
-        
-        # Добавляем пробел
-        layout_map[' '] = {'scancode': '39', 'modifiers': []}
-        
-        return layout_map
+        return layout_map_from_data(layout_data)
     
     def _add_char_to_layout(self, layout_map: Dict[str, Any], char: str, scancode: str, base_modifiers: List[str]) -> None:
         """Добавляет символ в карту раскладки, выбирая вариант с наименьшим штрафом"""
-        # Вычисляем штраф для этого варианта
-        penalty = self._calculate_penalty_for_scancode(scancode, base_modifiers)
-        
-        # Проверяем, есть ли уже этот символ в карте
-        if char in layout_map:
-            existing_entry = layout_map[char]
-            existing_scancode = existing_entry.get('scancode')
-            existing_modifiers = existing_entry.get('modifiers', [])
-            
-            # Вычисляем штраф для существующего варианта
-            existing_penalty = self._calculate_penalty_for_scancode(existing_scancode, existing_modifiers)
-            
-            # Выбираем вариант с наименьшим штрафом
-            if penalty < existing_penalty:
-                layout_map[char] = {'scancode': scancode, 'modifiers': base_modifiers.copy()}
-                
-                # Также добавляем вариант с Shift, если это буква
-                if char.isalpha() and char.islower():
-                    upper_char = char.upper()
-                    if upper_char not in layout_map or penalty < self._calculate_penalty_for_scancode(
-                        layout_map[upper_char].get('scancode'), layout_map[upper_char].get('modifiers', [])
-                    ):
-                        layout_map[upper_char] = {'scancode': scancode, 'modifiers': base_modifiers + ['shift']}
-                        
-        else:
-            # Добавляем новый символ
-            layout_map[char] = {'scancode': scancode, 'modifiers': base_modifiers.copy()}
-            
-            # Также добавляем вариант с Shift, если это буква
-            if char.isalpha() and char.islower():
-                layout_map[char.upper()] = {'scancode': scancode, 'modifiers': base_modifiers + ['shift']}
-            elif char.isalpha() and char.isupper():
-                layout_map[char.lower()] = {'scancode': scancode, 'modifiers': base_modifiers}
+        add_char_to_layout(layout_map, char, scancode, base_modifiers)
     
     def _calculate_penalty_for_scancode(self, scancode: str, modifiers: List[str]) -> float:
         """Рассчитывает штраф для сканкода с модификаторами"""
-        # Базовая логика расчета штрафа
-        penalty = 0.0
-        
-        if not scancode:
-            return 9999.0  # Большой штраф для невалидного сканкода
-        
-        # Расчет штрафа за модификаторы
-        if 'shift' in modifiers:
-            # Штраф за Shift зависит от пальца
-            finger = self._get_finger_for_scancode_temp(scancode)
-            if finger in ['left_pinky', 'right_pinky']:
-                penalty += 3.0  # Shift penalty
-            else:
-                penalty += 1.5
-        
-        if 'alt' in modifiers:
-            # Небольшой штраф за Alt
-            penalty += 0.5
-        
-        # Штраф за расстояние от домашнего ряда (упрощенный)
-        # Можно добавить более сложную логику при необходимости
-        
-        return penalty
+        return penalty_for_scancode(scancode, modifiers)
     
     def _get_finger_for_scancode_temp(self, scancode: str) -> str:
         """Вспомогательная функция для определения пальца по сканкоду"""
-        # Временная реализация - можно вынести в отдельный класс
-        key_finger = {
-            'left_pinky': ['02', '10', '1E', '2C', '38'],
-            'left_ring': ['03', '11', '1F', '2D'],
-            'left_middle': ['04', '12', '20', '2E'],
-            'left_index': ['05', '13', '21', '2F', '06', '14', '22', '30'],
-            'right_index': ['07', '15', '23', '31', '08', '16', '24', '32'],
-            'right_middle': ['09', '17', '25', '33'],
-            'right_ring': ['0A', '18', '26', '34'],
-            'right_pinky': ['0B', '19', '27', '35', '0C', '1A', '28', '36', '29', '0D', '1B', '37'],
-        }
-        
-        for finger, scancodes in key_finger.items():
-            if scancode in scancodes:
-                return finger
-        return None
+        return FINGER_BY_SCANCODE.get(scancode)
     
     def set_layout(self, layout_name: str):
         """Устанавливает текущую раскладку"""
@@ -351,26 +164,25 @@ class LayoutEvaluator:
         else:
             print(f"Раскладка '{layout_name}' не найдена")
     
-    def filter_layouts_by_language(self, text_file: str) -> List[str]:
-        """Фильтрует раскладки по языку текста"""
+    def filter_layouts_by_language(self, text_file: str, language_ratio: Dict[str, float] = None) -> List[str]:
+        """
+        Фильтрует раскладки по языку текста
+        Если языковой состав уже посчитан при чтении корпуса, файл повторно не читается
+        """
         try:
-            with open(text_file, 'r', encoding='utf-8') as f:
-                text = f.read()
+            if language_ratio is None:
+                corpus_stats = stream_corpus_stats(text_file)
+                if corpus_stats is None:
+                    return list(self.layouts.keys())
+                language_ratio = corpus_stats.language_ratio()
             
-            language_ratio = detect_language_ratio(text)
             print(f"Языковой состав текста: Русский {language_ratio['russian']*100:.1f}%, Английский {language_ratio['english']*100:.1f}%")
             
             # Фильтруем раскладки
-            filtered_layouts = []
-            for layout_name in self.layouts.keys():
-                layout_lang = self.layout_languages.get(layout_name, 'unknown')
-                
-                if layout_lang == 'russian' and language_ratio['russian'] >= 0.1:
-                    filtered_layouts.append(layout_name)
-                elif layout_lang == 'english' and language_ratio['english'] >= 0.1:
-                    filtered_layouts.append(layout_name)
-                elif layout_lang == 'unknown':
-                    filtered_layouts.append(layout_name)
+            filtered_layouts = select_layouts_by_language(
+                {layout_name: self.layout_languages.get(layout_name, 'unknown') for layout_name in self.layouts},
+                language_ratio
+            )
             
             print(f"Для анализа выбрано {len(filtered_layouts)} раскладок (из {len(self.layouts)})")
             return filtered_layouts
@@ -379,139 +191,336 @@ class LayoutEvaluator:
             print(f"Ошибка при анализе языка текста: {e}")
             return list(self.layouts.keys())
     
-    def analyze_combinations_all_layouts(self, text_file: str = None):
-        """Анализирует комбинации символов для всех раскладок"""
+    def _resolve_source_file(self, text_file: str = None) -> str:
+        """Возвращает файл корпуса: заданный или первый найденный из стандартных"""
+        if text_file:
+            return text_file
+        
+        # Пробуем загрузить данные из разных файлов
+        files_to_try = ['1grams-3.txt', 'sortchbukw.csv', 'test_text.txt']
+        
+        for file_name in files_to_try:
+            if os.path.isfile(file_name):
+                return file_name
+        
+        print("Создание тестовых файлов...")
+        self.create_test_files()
+        return 'test_text.txt'
+    
+    def _load_corpus(self, source_file: str) -> Optional[Tuple[CorpusStats, CorpusTables]]:
+        """
+        Статистика и таблицы корпуса (односимвольные слова отбрасываются)
+        При включенном кэше повторный анализ того же файла не разбирает его заново
+        """
+        if self.corpus_cache is not None:
+            return self.corpus_cache.load_corpus(source_file, min_length=2,
+                                                 max_combos_length=self.max_combos_length,
+                                                 workers=self.corpus_workers)
+        
+        return build_corpus_tables(source_file, min_length=2, max_combos_length=self.max_combos_length,
+                                   workers=self.corpus_workers)
+    
+    def analyze_combinations_all_layouts(self, text_file: str = None, parallel: bool = False, workers: int = None,
+                                         visualize: bool = True):
+        """
+        Анализирует комбинации символов для всех раскладок
+        parallel=True включает оценку раскладок в пуле из workers процессов
+        (по умолчанию - по числу ядер)
+        visualize=False - без графиков (matplotlib тогда не загружается)
+        При включенном профилировании после анализа выводится таблица этапов
+        """
+        self.profiler.reset()
+        with self.profiler.activate():
+            with self.profiler.stage('analyze_all_layouts'):
+                self._analyze_combinations_all_layouts(text_file, parallel, workers, visualize)
+        self.report_profile()
+    
+    def report_profile(self):
+        """Выводит профиль этапов последнего анализа и сохраняет трассу (если профилирование включено)"""
+        if not self.profiler.enabled:
+            return
+        
+        self.profiler.print_summary()
+        if self.profiler.trace_file:
+            self.profiler.export_chrome_trace(self.profiler.trace_file)
+            print(f"\nТрасса этапов сохранена в {self.profiler.trace_file} (chrome://tracing, Perfetto)")
+    
+    def _analyze_combinations_all_layouts(self, text_file: str, parallel: bool, workers: int, visualize: bool):
+        """Анализ комбинаций всех раскладок (см. analyze_combinations_all_layouts)"""
         print("\n" + "="*60)
         print("АНАЛИЗ КОМБИНАЦИЙ СИМВОЛОВ ДЛЯ ВСЕХ РАСКЛАДОК")
         print("="*60)
         
         # Определяем какой файл использовать
-        if text_file:
-            source_file = text_file
-        else:
-            # Пробуем загрузить данные из разных файлов
-            files_to_try = ['1grams-3.txt', 'sortchbukw.csv', 'test_text.txt']
-            source_file = None
-            
-            for file_name in files_to_try:
-                try:
-                    with open(file_name, 'r', encoding='utf-8') as f:
-                        text = f.read()
-                    source_file = file_name
-                    break
-                except:
-                    continue
-            
-            if not source_file:
-                print("Создание тестовых файлов...")
-                self.create_test_files()
-                source_file = 'test_text.txt'
+        source_file = self._resolve_source_file(text_file)
         
-        # Загрузка данных
-        try:
-            with open(source_file, 'r', encoding='utf-8') as f:
-                text = f.read()
-        except FileNotFoundError:
-            print(f"Файл {source_file} не найден")
+        # Загрузка данных: один потоковый проход по файлу
+        with self.profiler.stage('load_corpus'):
+            corpus = self._load_corpus(source_file)
+        if corpus is None:
             return
+        corpus_stats, tables = corpus
         
-        words_set = file_to_words_set(source_file, min_length=2)  # Отбрасываем односимвольные слова
+        # Частоты слов: слово -> количество
+        word_counts = corpus_stats.words
         
-        if not words_set:
+        if not word_counts:
             print("Не удалось загрузить данные для анализа")
             return
         
-        print(f"Загружено {len(words_set)} уникальных слов из файла {source_file}")
-        print(f"Проанализировано слов: {format_number(len(words_set))}")
+        print(f"Загружено {len(word_counts)} уникальных слов из файла {source_file}")
+        print(f"Проанализировано слов: {format_number(corpus_stats.total_words())}")
         
         # Фильтруем раскладки по языку текста
         if text_file:
-            layouts_to_analyze = self.filter_layouts_by_language(text_file)
+            with self.profiler.stage('language_filter', items=len(self.layouts)):
+                layouts_to_analyze = self.filter_layouts_by_language(text_file, corpus_stats.language_ratio())
         else:
             layouts_to_analyze = list(self.layouts.keys())
         
-        # Подсчет комбинаций
-        combos = combos_counter(words_set, self.max_combos_length)
-        
-        # Анализ для каждой раскладки
-        layouts_stats = {}
+        # Корпус агрегирован в таблицы один раз; дальше раскладки оцениваются только по ним
+        engine = EvaluationEngine(tables, self.data, self.penalty_calculator)
         
+        # Карты раскладок, которые будем анализировать
+        layout_maps = {}
         for layout_name in layouts_to_analyze:
-            print(f"\nАнализ для раскладки: {layout_name}")
-            
             layout_map = self.data.layout_maps.get(layout_name)
             if not layout_map:
                 print(f"  Нет карты для раскладки {layout_name}")
                 continue
-            
-            # Анализируем комбинации с динамическими штрафами
-            comfort_combos, partial_combos, uncomfortable_combos, dynamic_scores = self.data.calculate_dynamic_penalties(
-                words_set, layout_map
-            )
-            
-            # Преобразуем в формат для статистики
-            total_comfort = sum(comfort_combos.values())
-            total_partial = sum(partial_combos.values())
-            total_uncomfortable = sum(uncomfortable_combos.values())
-            
-            # Подсчет штрафа на пальцы (расстояние от домашнего ряда)
-            finger_penalty = self.penalty_calculator.calculate_finger_penalty(text, layout_map)
-            
-            # Статистика по пальцам
-            finger_load = self.penalty_calculator.calculate_finger_load(text, layout_map)
-            
-            # Анализ баланса рук
-            hand_balance = self.data.calculate_hand_balance(text, layout_map)
-            
-            # Анализ двухсимвольных комбинаций
-            two_char_analysis = self.data.analyze_two_char_combinations(
-                combos.get(2, {}), layout_map
-            )
-            
-            layouts_stats[layout_name] = {
-                'comfort_combos': comfort_combos,
-                'partial_combos': partial_combos,
-                'uncomfortable_combos': uncomfortable_combos,
-                'total_comfort': total_comfort,
-                'total_partial': total_partial,
-                'total_uncomfortable': total_uncomfortable,
-                'two_char_analysis': two_char_analysis,
-                'finger_load': finger_load,
-                'finger_penalty': finger_penalty,
-                'hand_balance': hand_balance,
-                'avg_dynamic_score': np.mean(list(dynamic_scores.values())) if dynamic_scores else 0
+            layout_maps[layout_name] = layout_map
+        
+        # Раскладки, чьи карта и корпус не изменились, берем из кэша результатов
+        with self.profiler.stage('result_cache_lookup', items=len(layout_maps)):
+            corpus_fingerprint = tables.fingerprint()
+            settings = {'shift_penalty': self.penalty_calculator.shift_penalty}
+            cache_keys = {
+                layout_name: self.result_cache.key(layout_map, corpus_fingerprint, settings)
+                for layout_name, layout_map in layout_maps.items()
             }
-            
-            total_combinations = total_comfort + total_partial + total_uncomfortable
-            if total_combinations > 0:
-                comfort_percent = total_comfort / total_combinations * 100
-                partial_percent = total_partial / total_combinations * 100
-                uncomfortable_percent = total_uncomfortable / total_combinations * 100
-            else:
-                comfort_percent = partial_percent = uncomfortable_percent = 0
-            
-            print(f"  Всего комбинаций: {format_number(total_combinations)}")
-            print(f"  Удобные: {format_number(total_comfort)} ({comfort_percent:.1f}%)")
-            print(f"  Частично удобные: {format_number(total_partial)} ({partial_percent:.1f}%)")
-            print(f"  Неудобные: {format_number(total_uncomfortable)} ({uncomfortable_percent:.1f}%)")
-            print(f"  Штраф на пальцы: {finger_penalty:.0f}")
-            print(f"  Баланс рук: {hand_balance['left_percent']:.1f}% левая, {hand_balance['right_percent']:.1f}% правая")
-            if hand_balance['is_good']:
-                print(f"  ✓ Хороший баланс рук (в пределах 45-55%)")
+            cached_stats = {}
+            for layout_name, key in cache_keys.items():
+                stats = self.result_cache.get(key)
+                if stats is not None:
+                    cached_stats[layout_name] = stats
+        
+        pending_maps = {
+            layout_name: layout_map for layout_name, layout_map in layout_maps.items()
+            if layout_name not in cached_stats
+        }
+        if cached_stats:
+            print(f"Из кэша результатов: {len(cached_stats)} раскладок, к оценке: {len(pending_maps)}")
+        
+        # Анализ для каждой новой или измененной раскладки
+        with self.profiler.stage('score_layouts', items=len(pending_maps)):
+            if parallel:
+                new_stats = score_layouts_parallel(engine, pending_maps, workers)
             else:
-                print(f"  ✗ Плохой баланс рук")
-            print(f"  Двухсимвольные комбинации: {format_number(two_char_analysis['one_hand_total'])} одноручных")
+                new_stats = {}
+                for layout_name, layout_map in pending_maps.items():
+                    with self.profiler.stage('score_layout', items=1, layout=layout_name):
+                        new_stats[layout_name] = engine.score_layout(layout_map)
+        
+        for layout_name, stats in new_stats.items():
+            self.result_cache.put(cache_keys[layout_name], stats)
+        
+        # Порядок раскладок - как в layouts_to_analyze
+        layouts_stats = {
+            layout_name: cached_stats[layout_name] if layout_name in cached_stats else new_stats[layout_name]
+            for layout_name in layout_maps
+        }
+        
+        with self.profiler.stage('print_summaries', items=len(layouts_stats)):
+            for layout_name, stats in layouts_stats.items():
+                print(f"\nАнализ для раскладки: {layout_name}")
+                self.print_layout_summary(stats)
         
         # Сохраняем статистику
         self.all_layouts_stats = layouts_stats
+        self.corpus_tables = tables
         
         # Выводим сравнение
-        self.print_combinations_comparison(layouts_stats)
+        with self.profiler.stage('print_comparison', items=len(layouts_stats)):
+            self.print_combinations_comparison(layouts_stats)
         
         # Визуализация
-        if layouts_stats:
-            visualize_finger_statistics(layouts_stats, source_file)
-            visualize_combo_distribution(layouts_stats, source_file)
+        if layouts_stats and visualize:
+            with self.profiler.stage('charts', items=len(layouts_stats)):
+                # Графики загружаются только при необходимости: импорт matplotlib дорогой
+                from visualization.charts import visualize_finger_statistics, visualize_combo_distribution
+                
+                visualize_finger_statistics(layouts_stats, source_file)
+                visualize_combo_distribution(layouts_stats, source_file)
+    
+    def report_worst_combos(self, text_file: str = None, lengths: Tuple[int, ...] = DEFAULT_HEAVY_LENGTHS,
+                            top_k: int = 10, capacity: int = DEFAULT_CAPACITY) -> Dict[str, Any]:
+        """
+        Худшие комбинации каждой раскладки: самые частые n-граммы корпуса
+        (приближенно, в фиксированной памяти) с наибольшим вкладом в неудобство
+        Частота показывается с погрешностью: истинное значение в [частота - погрешность, частота]
+        """
+        print("\n" + "="*60)
+        print("ХУДШИЕ КОМБИНАЦИИ РАСКЛАДОК")
+        print("="*60)
+        
+        source_file = self._resolve_source_file(text_file)
+        heavy = stream_heavy_ngrams(source_file, lengths, capacity)
+        if heavy is None:
+            return None
+        
+        layout_maps = {
+            layout_name: self.data.layout_maps[layout_name]
+            for layout_name in self.layouts if self.data.layout_maps.get(layout_name)
+        }
+        report = worst_combos_report(heavy, layout_maps, top_k)
+        
+        for length in heavy.lengths:
+            counter = heavy.counters[length]
+            print(f"Комбинации длины {length}: всего {format_number(counter.total)}, "
+                  f"хранится {len(counter)}, погрешность частоты не больше {format_number(counter.error_bound())}")
+        
+        transition_names = {
+            'comfortable': 'удобно',
+            'partially_comfortable': 'частично',
+            'uncomfortable': 'неудобно',
+        }
+        for layout_name, by_length in report.items():
+            print(f"\n{layout_name}:")
+            for length, rows in by_length.items():
+                print(f"  Длина {length}:")
+                for row in rows:
+                    transitions = ', '.join(transition_names[name] for name in row['transitions'])
+                    print(f"    {row['combo']:<6} {format_number(row['count']):>8} ±{format_number(row['error']):<8} "
+                          f"неудобство {row['cost']:.1f}  ({transitions})")
+        
+        return report
+    
+    def what_if_swap(self, layout_name: str, scancode1: str, scancode2: str) -> Dict[str, Any]:
+        """
+        Показывает, как изменится статистика раскладки из последнего анализа,
+        если поменять местами клавиши scancode1 и scancode2
+        Пересчитываются только символы на этих клавишах; раскладка не меняется
+        """
+        if self.corpus_tables is None or layout_name not in self.all_layouts_stats:
+            print("Анализ еще не проводился. Сначала выполните анализ комбинаций.")
+            return None
+        
+        layout_map = self.data.layout_maps[layout_name]
+        stats = self.all_layouts_stats[layout_name]
+        swapped_stats = self.data.score_swap(
+            self.corpus_tables, stats, layout_map, scancode1, scancode2, self.penalty_calculator
+        )
+        
+        print(f"\nРаскладка {layout_name}: сейчас")
+        self.print_layout_summary(stats)
+        print(f"\nПосле перестановки клавиш {scancode1} и {scancode2}")
+        self.print_layout_summary(swapped_stats)
+        
+        return swapped_stats
+    
+    def optimize_layout(self, base_layout_name: str, text_file: str = None,
+                        iterations: int = 200000, seed: int = None):
+        """
+        Ищет улучшенную раскладку, переставляя буквы исходной раскладки
+        (имитация отжига по таблицам корпуса), сохраняет ее в ready_made_layouts
+        и сразу загружает. Возвращает имя новой раскладки
+        """
+        print("\n" + "="*60)
+        print("ОПТИМИЗАЦИЯ РАСКЛАДКИ")
+        print("="*60)
+        
+        base_layout_map = self.data.layout_maps.get(base_layout_name)
+        if not base_layout_map:
+            print(f"Раскладка {base_layout_name} не найдена")
+            return None
+        
+        source_file = self._resolve_source_file(text_file)
+        corpus = self._load_corpus(source_file)
+        if corpus is None:
+            return None
+        corpus_stats, tables = corpus
+        
+        if not corpus_stats.words:
+            print("Не удалось загрузить данные для анализа")
+            return None
+        
+        optimizer = LayoutOptimizer(tables, base_layout_map, self.penalty_calculator)
+        
+        print(f"Исходная раскладка: {base_layout_name}, корпус: {source_file}")
+        print(f"Итераций: {format_number(iterations)}")
+        
+        result = optimizer.simulated_annealing(iterations, seed=seed)
+        
+        print(f"\n{'Критерий':<25} {'До':>12} {'После':>12}")
+        print("-" * 51)
+        for key, title in [('comfort_percent', 'Удобство (%)'),
+                           ('finger_penalty', 'Штраф пальцев'),
+                           ('uniformity_score', 'Равномерность'),
+                           ('balance_score', 'Баланс рук'),
+                           ('objective', 'Итоговая оценка')]:
+            print(f"{title:<25} {optimizer.initial_metrics[key]:>12.2f} {result[key]:>12.2f}")
+        
+        layout_name = f"{base_layout_name} (оптимизированная)"
+        language = self.layout_languages.get(base_layout_name, 'unknown')
+        layout_file = optimizer.save_layout(layout_name, language)
+        print(f"\nРаскладка сохранена в {layout_file}")
+        
+        # Перезагружаем карту, если раскладка с таким именем уже была
+        self.data.layout_maps.pop(layout_name, None)
+        return self.load_custom_layout(layout_file)
+    
+    def print_layout_summary(self, stats: Dict[str, Any]):
+        """Выводит краткую статистику одной раскладки"""
+        total_comfort = stats['total_comfort']
+        total_partial = stats['total_partial']
+        total_uncomfortable = stats['total_uncomfortable']
+        finger_penalty = stats['finger_penalty']
+        hand_balance = stats['hand_balance']
+        two_char_analysis = stats['two_char_analysis']
+        
+        total_combinations = total_comfort + total_partial + total_uncomfortable
+        if total_combinations > 0:
+            comfort_percent = total_comfort / total_combinations * 100
+            partial_percent = total_partial / total_combinations * 100
+            uncomfortable_percent = total_uncomfortable / total_combinations * 100
+        else:
+            comfort_percent = partial_percent = uncomfortable_percent = 0
+        
+        print(f"  Всего комбинаций: {format_number(total_combinations)}")
+        print(f"  Удобные: {format_number(total_comfort)} ({comfort_percent:.1f}%)")
+        print(f"  Частично удобные: {format_number(total_partial)} ({partial_percent:.1f}%)")
+        print(f"  Неудобные: {format_number(total_uncomfortable)} ({uncomfortable_percent:.1f}%)")
+        print(f"  Штраф на пальцы: {finger_penalty:.0f}")
+        print(f"  Баланс рук: {hand_balance['left_percent']:.1f}% левая, {hand_balance['right_percent']:.1f}% правая")
+        if hand_balance['is_good']:
+            print(f"  ✓ Хороший баланс рук (в пределах 45-55%)")
+        else:
+            print(f"  ✗ Плохой баланс рук")
+        print(f"  Двухсимвольные комбинации: {format_number(two_char_analysis['one_hand_total'])} одноручных")
+        
+        trigram_analysis = stats['trigram_analysis']
+        trigram_total = trigram_analysis['total']
+        if trigram_total > 0:
+            def trigram_percent(field: str) -> float:
+                return trigram_analysis[field] / trigram_total * 100
+            
+            print(f"  Трехсимвольные комбинации: роллы вовнутрь {trigram_percent('inward_roll'):.1f}%, "
+                  f"наружу {trigram_percent('outward_roll'):.1f}%, "
+                  f"смена направления {trigram_percent('redirect'):.1f}%, "
+                  f"чередование рук {trigram_percent('alternation'):.1f}%")
+            print(f"  Тот же палец через нажатие: {trigram_percent('same_finger_skipgram'):.1f}%")
+        
+        stream = stats['keystroke_analysis']['stream']
+        across_space = stats['keystroke_analysis']['across_space']
+        if stream['total'] > 0:
+            print(f"  Поток нажатий: {format_number(stream['total'])} пар, "
+                  f"с пробелом {stream['space'] / stream['total'] * 100:.1f}%, "
+                  f"тот же палец {stream['same_finger'] / stream['total'] * 100:.1f}%, "
+                  f"смена модификатора {stream['modifier_changes'] / stream['total'] * 100:.1f}%")
+        if across_space['total'] > 0:
+            print(f"  Между словами через пробел: тот же палец "
+                  f"{across_space['same_finger'] / across_space['total'] * 100:.1f}%, "
+                  f"смена рук {across_space['hand_alternation'] / across_space['total'] * 100:.1f}%")
     
     def print_combinations_comparison(self, layouts_stats: Dict[str, Any]):
         """Выводит сравнение результатов анализа комбинаций с правильными рейтингами"""
@@ -519,94 +528,12 @@ class LayoutEvaluator:
         print("СРАВНЕНИЕ РАСКЛАДОК ПО КОМБИНАЦИЯМ СИМВОЛОВ")
         print("="*120)
         
-        # Собираем данные по всем раскладкам
-        layout_data = []
-        
-        for layout_name, stats in layouts_stats.items():
-            total_combinations = stats['total_comfort'] + stats['total_partial'] + stats['total_uncomfortable']
-            finger_penalty = stats['finger_penalty']
-            
-            if total_combinations > 0:
-                comfort_percent = stats['total_comfort'] / total_combinations * 100
-            else:
-                comfort_percent = 0
-            
-            # Нагрузка на пальцы: вычисляем равномерность распределения
-            finger_load = stats['finger_load']
-            
-            # Список всех пальцев (без больших пальцев)
-            fingers = ['left_pinky', 'left_ring', 'left_middle', 'left_index',
-                      'right_index', 'right_middle', 'right_ring', 'right_pinky']
-            
-            # Собираем значения нагрузки для всех пальцев
-            finger_values = []
-            for finger in fingers:
-                finger_values.append(finger_load.get(finger, 0))
-            
-            # Вычисляем стандартное отклонение для оценки равномерности
-            # Чем меньше стандартное отклонение, тем равномернее нагрузка
-            if len(finger_values) > 1:
-                std_dev = np.std(finger_values)
-                # Преобразуем в балл равномерности (чем меньше std_dev, тем выше балл)
-                max_value = max(finger_values) if max(finger_values) > 0 else 1
-                uniformity_score = 100 * (1 - (std_dev / max_value))
-            else:
-                uniformity_score = 0
-            
-            # Баланс рук
-            hand_balance = stats['hand_balance']
-            left_percent = hand_balance.get('left_percent', 50)
-            right_percent = hand_balance.get('right_percent', 50)
-            balance_score = hand_balance.get('balance_score', 0)
-            
-            # Общая нагрузка (для информации)
-            total_finger_load = sum(finger_values)
-            
-            layout_data.append({
-                'name': layout_name,
-                'comfort_percent': comfort_percent,
-                'finger_penalty': finger_penalty,
-                'uniformity_score': uniformity_score,
-                'total_finger_load': total_finger_load,
-                'balance_score': balance_score,
-                'is_good_balance': hand_balance.get('is_good', False),
-                'finger_values': finger_values
-            })
-        
-        # Рассчитываем места по каждой категории
-        # Чем меньше значение (кроме comfort_percent, uniformity_score и balance_score), тем лучше
-        
-        # 1. Удобные комбинации % (чем больше, тем лучше)
-        comfort_sorted = sorted(layout_data, key=lambda x: x['comfort_percent'], reverse=True)
-        for i, layout in enumerate(comfort_sorted):
-            layout['comfort_place'] = i + 1
-        
-        # 2. Штраф на пальцы (чем меньше, тем лучше)
-        penalty_sorted = sorted(layout_data, key=lambda x: x['finger_penalty'])
-        for i, layout in enumerate(penalty_sorted):
-            layout['penalty_place'] = i + 1
-        
-        # 3. Равномерность нагрузки на пальцы (чем больше uniformity_score, тем лучше)
-        uniformity_sorted = sorted(layout_data, key=lambda x: x['uniformity_score'], reverse=True)
-        for i, layout in enumerate(uniformity_sorted):
-            layout['uniformity_place'] = i + 1
-        
-        # 4. Баланс рук (чем ближе к 100%, тем лучше)
-        balance_sorted = sorted(layout_data, key=lambda x: x['balance_score'], reverse=True)
-        for i, layout in enumerate(balance_sorted):
-            layout['balance_place'] = i + 1
-        
-        # Рассчитываем итоговый рейтинг (сумма мест)
-        for layout in layout_data:
-            layout['total_place'] = (
-                layout['comfort_place'] + 
-                layout['penalty_place'] + 
-                layout['uniformity_place'] + 
-                layout['balance_place']
-            )
+        # Критерии, места по категориям и итоговый рейтинг (сумма мест)
+        sorted_layouts = rank_layouts(layouts_stats)
         
-        # Сортируем по итоговому рейтингу (чем меньше сумма мест, тем лучше)
-        sorted_layouts = sorted(layout_data, key=lambda x: x['total_place'])
+        # Те же данные в исходном порядке раскладок (для рейтингов по отдельным критериям)
+        layout_order = {layout_name: idx for idx, layout_name in enumerate(layouts_stats)}
+        layout_data = sorted(sorted_layouts, key=lambda x: layout_order[x['name']])
         
         # Выводим таблицу сравнения
         print(f"\n{'Раскладка':<25} {'Удобные %':<12} {'Штраф':<12} {'Равномер.':<10} {'Баланс':<10} {'Места/Итог':<25}")
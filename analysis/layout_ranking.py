@@ -0,0 +1,98 @@
+"""
+Критерии сравнения раскладок, места по критериям и выбор раскладок по языку
+"""
+
+from typing import Dict, Any, List
+
+import numpy as np
+
+from layouts.key_tables import FINGER_ORDER
+
+
+# Критерии рейтинга: (поле, поле места, чем больше - тем лучше)
+RANKING_CRITERIA = [
+    ('comfort_percent', 'comfort_place', True),
+    ('finger_penalty', 'penalty_place', False),
+    ('uniformity_score', 'uniformity_place', True),
+    ('balance_score', 'balance_place', True),
+]
+
+# Доля букв языка в тексте, начиная с которой раскладки этого языка участвуют в анализе
+LANGUAGE_THRESHOLD = 0.1
+
+
+def layout_criteria(layout_name: str, stats: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    Получает: имя раскладки и ее статистику (layouts_stats)
+    Возвращает: критерии сравнения - процент удобных комбинаций, штраф,
+    равномерность нагрузки на пальцы, баланс рук
+    '''
+    total_combinations = stats['total_comfort'] + stats['total_partial'] + stats['total_uncomfortable']
+
+    if total_combinations > 0:
+        comfort_percent = stats['total_comfort'] / total_combinations * 100
+    else:
+        comfort_percent = 0
+
+    # Нагрузка на все пальцы (без больших пальцев)
+    finger_values = [stats['finger_load'].get(finger, 0) for finger in FINGER_ORDER]
+
+    # Чем меньше стандартное отклонение, тем равномернее нагрузка
+    std_dev = np.std(finger_values)
+    max_value = max(finger_values) if max(finger_values) > 0 else 1
+    uniformity_score = 100 * (1 - (std_dev / max_value))
+
+    hand_balance = stats['hand_balance']
+
+    return {
+        'name': layout_name,
+        'comfort_percent': comfort_percent,
+        'finger_penalty': stats['finger_penalty'],
+        'uniformity_score': uniformity_score,
+        'total_finger_load': sum(finger_values),
+        'balance_score': hand_balance.get('balance_score', 0),
+        'is_good_balance': hand_balance.get('is_good', False),
+        'finger_values': finger_values
+    }
+
+
+def rank_layouts(layouts_stats: Dict[str, Any]) -> List[Dict[str, Any]]:
+    '''
+    Получает: статистику раскладок
+    Возвращает: критерии раскладок с местами по каждому критерию (*_place)
+    и суммой мест (total_place), отсортированные по итоговому рейтингу
+    '''
+    layout_data = [layout_criteria(layout_name, stats) for layout_name, stats in layouts_stats.items()]
+
+    for field_name, place_field, reverse in RANKING_CRITERIA:
+        for place, layout in enumerate(sorted(layout_data, key=lambda x: x[field_name], reverse=reverse)):
+            layout[place_field] = place + 1
+
+    # Итоговый рейтинг - сумма мест (чем меньше, тем лучше)
+    for layout in layout_data:
+        layout['total_place'] = (
+            layout['comfort_place'] +
+            layout['penalty_place'] +
+            layout['uniformity_place'] +
+            layout['balance_place']
+        )
+
+    return sorted(layout_data, key=lambda x: x['total_place'])
+
+
+def select_layouts_by_language(layout_languages: Dict[str, str], language_ratio: Dict[str, float]) -> List[str]:
+    '''
+    Получает: язык каждой раскладки и языковой состав текста
+    Возвращает: раскладки, подходящие тексту (раскладки с неизвестным языком подходят всегда)
+    '''
+    selected = []
+
+    for layout_name, layout_lang in layout_languages.items():
+        if layout_lang == 'russian' and language_ratio['russian'] >= LANGUAGE_THRESHOLD:
+            selected.append(layout_name)
+        elif layout_lang == 'english' and language_ratio['english'] >= LANGUAGE_THRESHOLD:
+            selected.append(layout_name)
+        elif layout_lang == 'unknown':
+            selected.append(layout_name)
+
+    return selected
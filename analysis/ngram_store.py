@@ -0,0 +1,228 @@
+"""
+Компактное хранение комбинаций символов (n-грамм)
+
+Вместо словаря {строка: количество} каждая n-грамма кодируется одним целым
+числом по алфавиту корпуса (символ -> индекс, n-грамма -> число в системе
+счисления с основанием "размер алфавита + 1"). Коды хранятся в отсортированном
+массиве NumPy, количества - в параллельном массиве; поиск - двоичный.
+Коды и количества хранятся в самом узком подходящем типе (uint32/int32, если
+помещаются), то есть 8-16 байт на комбинацию вместо сотни с лишним байт на
+строку, число и слот словаря.
+"""
+
+from collections.abc import Mapping, ItemsView, ValuesView
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
+
+import numpy as np
+
+from analysis.combo_analyzer import iter_word_counts
+
+
+# Размер блока при раскодировании кодов в строки
+DECODE_BLOCK_SIZE = 1 << 16
+
+
+def _smallest_dtype(max_value: int, small, large):
+    '''Меньший из двух целых типов, в который помещается max_value'''
+    return small if max_value <= np.iinfo(small).max else large
+
+
+class _NgramItemsView(ItemsView):
+    """Пары (n-грамма, количество) без поиска каждой n-граммы заново"""
+
+    def __iter__(self):
+        return self._mapping.iter_items()
+
+
+class _NgramValuesView(ValuesView):
+    """Количества в порядке кодов (тот же порядок, что у ключей)"""
+
+    def __iter__(self):
+        return iter(self._mapping.counts.tolist())
+
+
+class NgramTable(Mapping):
+    """
+    Таблица n-грамм одной длины: отсортированные коды и их количества
+    Поддерживает протокол словаря (чтение), поиск и top-k
+    """
+
+    def __init__(self, length: int, alphabet: str, codes: np.ndarray, counts: np.ndarray,
+                 char_index: Dict[str, int] = None):
+        self.length = length
+        self.alphabet = alphabet
+        self.base = len(alphabet) + 1
+        self.codes = codes
+        self.counts = counts
+        # Индексы символов (с 1; 0 - разделитель); таблицы одного хранилища делят один словарь
+        if char_index is None:
+            char_index = {char: idx + 1 for idx, char in enumerate(alphabet)}
+        self._char_index = char_index
+        self._codepoints = np.array([0] + [ord(char) for char in alphabet], dtype=np.uint32)
+
+    def encode(self, ngram: str) -> Optional[int]:
+        """Код n-граммы или None, если в ней есть символ вне алфавита или длина другая"""
+        if len(ngram) != self.length:
+            return None
+
+        code = 0
+        for char in ngram:
+            idx = self._char_index.get(char)
+            if idx is None:
+                return None
+            code = code * self.base + idx
+        return code
+
+    def decode(self, codes: np.ndarray) -> List[str]:
+        """Раскодирует массив кодов в строки (векторно)"""
+        codes = np.asarray(codes, dtype=np.uint64).copy()
+        digits = np.empty((len(codes), self.length), dtype=np.intp)
+
+        for position in range(self.length - 1, -1, -1):
+            digits[:, position] = codes % self.base
+            codes //= self.base
+
+        # Массив кодов символов (m, n) читается как m строк длины n
+        codepoints = np.ascontiguousarray(self._codepoints[digits])
+        return codepoints.view(f'<U{self.length}').ravel().tolist()
+
+    def _find(self, ngram: str) -> int:
+        """Позиция n-граммы в массивах или -1"""
+        code = self.encode(ngram)
+        if code is None:
+            return -1
+
+        idx = int(np.searchsorted(self.codes, code))
+        if idx < len(self.codes) and int(self.codes[idx]) == code:
+            return idx
+        return -1
+
+    def __getitem__(self, ngram: str) -> int:
+        idx = self._find(ngram) if isinstance(ngram, str) else -1
+        if idx < 0:
+            raise KeyError(ngram)
+        return int(self.counts[idx])
+
+    def __contains__(self, ngram) -> bool:
+        return isinstance(ngram, str) and self._find(ngram) >= 0
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __iter__(self) -> Iterator[str]:
+        for start in range(0, len(self.codes), DECODE_BLOCK_SIZE):
+            yield from self.decode(self.codes[start:start + DECODE_BLOCK_SIZE])
+
+    def iter_items(self) -> Iterator[Tuple[str, int]]:
+        """Пары (n-грамма, количество) в порядке кодов"""
+        for start in range(0, len(self.codes), DECODE_BLOCK_SIZE):
+            end = start + DECODE_BLOCK_SIZE
+            yield from zip(self.decode(self.codes[start:end]), self.counts[start:end].tolist())
+
+    def items(self) -> ItemsView:
+        return _NgramItemsView(self)
+
+    def values(self) -> ValuesView:
+        return _NgramValuesView(self)
+
+    def top(self, k: int) -> List[Tuple[str, int]]:
+        """k самых частых n-грамм по убыванию количества"""
+        k = min(k, len(self.counts))
+        if k <= 0:
+            return []
+
+        candidates = np.argpartition(-self.counts, k - 1)[:k] if k < len(self.counts) else np.arange(k)
+        # Сортировка по убыванию количества, при равенстве - по коду
+        order = candidates[np.lexsort((self.codes[candidates], -self.counts[candidates]))]
+        return list(zip(self.decode(self.codes[order]), self.counts[order].tolist()))
+
+    def total(self) -> int:
+        """Сумма количеств всех n-грамм"""
+        return int(self.counts.sum())
+
+    @property
+    def nbytes(self) -> int:
+        """Память под коды и количества (байт)"""
+        return self.codes.nbytes + self.counts.nbytes
+
+
+class NgramStore(Mapping):
+    """
+    Компактная замена результата combos_counter: длина -> NgramTable
+    Все таблицы используют общий алфавит корпуса
+    """
+
+    def __init__(self, alphabet: str, tables: Dict[int, NgramTable]):
+        self.alphabet = alphabet
+        self.tables = tables
+
+    @classmethod
+    def from_words(cls, words: Union[Dict[str, int], Set[str]], max_length: int = 4) -> 'NgramStore':
+        """
+        Считает комбинации длиной 2..max_length внутри слов (как combos_counter)
+        Все слова склеиваются в один массив индексов символов через разделитель,
+        коды n-грамм всех позиций считаются векторно, одинаковые коды суммируются
+        """
+        word_counts = [(word, count) for word, count in iter_word_counts(words) if len(word) >= 2]
+
+        text = '\0'.join(word for word, _ in word_counts)
+        alphabet = ''.join(sorted(set(text) - {'\0'}))
+        base = len(alphabet) + 1
+
+        if base ** max_length >= 2 ** 63:
+            raise ValueError(f"Алфавит из {len(alphabet)} символов слишком велик для комбинаций длины {max_length}")
+
+        # Индексы символов (0 - разделитель между словами)
+        codepoints = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+        alphabet_codepoints = np.array([ord(char) for char in alphabet], dtype=np.uint32)
+        indices = (np.searchsorted(alphabet_codepoints, codepoints) + 1).astype(np.uint64)
+        indices[codepoints == 0] = 0
+
+        # Вес каждой позиции - частота слова, которому она принадлежит
+        lengths = np.fromiter((len(word) + 1 for word, _ in word_counts), dtype=np.intp, count=len(word_counts))
+        counts = np.fromiter((count for _, count in word_counts), dtype=np.int64, count=len(word_counts))
+        weights = np.repeat(counts, lengths)[:len(indices)]
+
+        char_index = {char: idx + 1 for idx, char in enumerate(alphabet)}
+        tables = {}
+        for length in range(2, max_length + 1):
+            positions = max(len(indices) - length + 1, 0)
+
+            codes = np.zeros(positions, dtype=np.uint64)
+            valid = np.ones(positions, dtype=bool)
+            for offset in range(length):
+                part = indices[offset:offset + positions]
+                codes = codes * np.uint64(base) + part
+                valid &= part != 0
+
+            codes = codes[valid]
+            position_weights = weights[:positions][valid]
+
+            # Суммируем веса одинаковых кодов: сортировка и суммы по отрезкам
+            order = np.argsort(codes, kind='stable')
+            codes = codes[order]
+            starts = np.flatnonzero(np.concatenate(([True], codes[1:] != codes[:-1])))[:len(codes)]
+            combo_counts = np.add.reduceat(position_weights[order], starts) if len(codes) else position_weights
+
+            tables[length] = NgramTable(
+                length, alphabet,
+                codes[starts].astype(_smallest_dtype(base ** length - 1, np.uint32, np.uint64)),
+                combo_counts.astype(_smallest_dtype(int(combo_counts.max(initial=0)), np.int32, np.int64)),
+                char_index
+            )
+
+        return cls(alphabet, tables)
+
+    def __getitem__(self, length: int) -> NgramTable:
+        return self.tables[length]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.tables)
+
+    def __len__(self) -> int:
+        return len(self.tables)
+
+    @property
+    def nbytes(self) -> int:
+        """Память под все таблицы (байт)"""
+        return sum(table.nbytes for table in self.tables.values())
@@ -0,0 +1,247 @@
+"""
+Параллельный подсчет статистики больших корпусов
+
+Файл делится на байтовые диапазоны, границы которых выровнены по пробельным
+символам, поэтому ни одно слово не разрывается. Каждый диапазон обрабатывается
+в отдельном процессе, частичные счетчики объединяются попарно (дерево слияний),
+так что и слияние идет параллельно.
+"""
+
+import multiprocessing
+import os
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple, Callable, Any
+
+from analysis.text_processor import (
+    CorpusStats, DEFAULT_CHUNK_SIZE, is_frequency_file, parse_frequency_line, stream_corpus_stats
+)
+from analysis.combo_analyzer import combos_counter
+from analysis.evaluation_engine import CorpusTables
+from analysis.ngram_store import NgramStore
+from utils.stage_profiler import profile_stage
+
+
+# Файлы меньше этого размера обрабатываются в одном процессе: пул дороже выигрыша
+PARALLEL_MIN_BYTES = 8 << 20
+
+# Байты, на которых можно резать текст: пробел, табуляция, перевод строки
+# (возврат каретки не используется, чтобы не разрывать пару \r\n)
+TEXT_DELIMITERS = b' \t\n'
+LINE_DELIMITERS = b'\n'
+
+
+def _find_delimiter(file, position: int, end: int, delimiters: bytes) -> int:
+    '''
+    Позиция сразу после первого разделителя, начиная с position (но не дальше end)
+    '''
+    file.seek(position)
+    while position < end:
+        block = file.read(min(1 << 16, end - position))
+        if not block:
+            return end
+        found = [idx for idx in (block.find(bytes([delimiter])) for delimiter in delimiters) if idx >= 0]
+        if found:
+            return position + min(found) + 1
+        position += len(block)
+    return end
+
+
+def split_byte_ranges(filename: str, parts: int, delimiters: bytes = TEXT_DELIMITERS) -> List[Tuple[int, int]]:
+    '''
+    Делит файл на parts байтовых диапазонов [начало, конец)
+    Каждая граница сдвигается вперед до ближайшего разделителя
+    Разделители - ASCII, поэтому граница не попадает и внутрь UTF-8 символа
+    '''
+    size = os.path.getsize(filename)
+    if size == 0:
+        return []
+
+    boundaries = [0]
+    with open(filename, 'rb') as file:
+        for part in range(1, parts):
+            boundary = _find_delimiter(file, max(size * part // parts, boundaries[-1]), size, delimiters)
+            if boundary > boundaries[-1] and boundary < size:
+                boundaries.append(boundary)
+    boundaries.append(size)
+
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def _iter_range_text(filename: str, start: int, end: int, delimiters: bytes, chunk_size: int):
+    '''
+    Читает диапазон файла блоками по chunk_size байт и отдает текст,
+    разрезанный только по разделителям; переводы строк приводятся к \\n,
+    как при чтении файла в текстовом режиме
+    '''
+    tail = b''
+
+    with open(filename, 'rb') as file:
+        file.seek(start)
+        position = start
+
+        while position < end:
+            block = file.read(min(chunk_size, end - position))
+            if not block:
+                break
+            position += len(block)
+
+            block = tail + block
+            cut = max(block.rfind(bytes([delimiter])) for delimiter in delimiters) + 1
+            if cut == 0:
+                tail = block
+                continue
+
+            tail = block[cut:]
+            yield block[:cut].decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+    if tail:
+        yield tail.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+
+def _count_range(task: Tuple[str, int, int, int, bool, int]) -> CorpusStats:
+    '''Считает статистику одного диапазона файла в рабочем процессе'''
+    filename, start, end, min_length, frequency, chunk_size = task
+    stats = CorpusStats(min_length)
+
+    if frequency:
+        for text in _iter_range_text(filename, start, end, LINE_DELIMITERS, chunk_size):
+            for line in text.split('\n'):
+                parsed = parse_frequency_line(line)
+                if parsed is not None:
+                    stats.add_word_count(*parsed)
+    else:
+        for text in _iter_range_text(filename, start, end, TEXT_DELIMITERS, chunk_size):
+            stats.add_text(text)
+
+    return stats
+
+
+def _merge_corpus_stats(pair: Tuple[CorpusStats, CorpusStats]) -> CorpusStats:
+    return pair[0].merge(pair[1])
+
+
+def _combos_part(task: Tuple[List[Tuple[str, int]], int]) -> Dict[int, Dict[str, int]]:
+    '''Комбинации для части словаря в рабочем процессе'''
+    word_counts, max_length = task
+    return combos_counter(dict(word_counts), max_length)
+
+
+def _merge_combos(pair: Tuple[Dict[int, Dict[str, int]], Dict[int, Dict[str, int]]]) -> Dict[int, Dict[str, int]]:
+    left, right = pair
+    for length, combos in right.items():
+        target = left.setdefault(length, defaultdict(int))
+        for combo, count in combos.items():
+            target[combo] += count
+    return left
+
+
+def tree_reduce(pool, items: List[Any], merge: Callable[[Tuple[Any, Any]], Any]) -> Any:
+    '''
+    Объединяет частичные результаты попарно, уровень за уровнем:
+    на каждом уровне слияния пар выполняются в пуле параллельно
+    '''
+    while len(items) > 1:
+        pairs = list(zip(items[0::2], items[1::2]))
+        merged = pool.map(merge, pairs)
+        if len(items) % 2:
+            merged.append(items[-1])
+        items = merged
+    return items[0] if items else None
+
+
+def _get_context():
+    '''Контекст пула: fork, если доступен (быстрый старт рабочих процессов)'''
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def parallel_corpus_stats(filename: str, min_length: int = 2, workers: int = None,
+                          chunk_size: int = DEFAULT_CHUNK_SIZE, pool=None) -> Optional[CorpusStats]:
+    '''
+    Статистика корпуса, посчитанная в пуле из workers процессов
+    Результат совпадает с stream_corpus_stats; частотные словари тоже поддерживаются
+    Возвращает None, если файл не найден
+    '''
+    workers = workers or multiprocessing.cpu_count()
+
+    try:
+        frequency = is_frequency_file(filename)
+        ranges = split_byte_ranges(filename, workers, LINE_DELIMITERS if frequency else TEXT_DELIMITERS)
+    except FileNotFoundError:
+        print(f"Файл {filename} не найден")
+        return None
+
+    tasks = [(filename, start, end, min_length, frequency, chunk_size) for start, end in ranges]
+    if not tasks:
+        return CorpusStats(min_length)
+
+    if pool is not None:
+        return tree_reduce(pool, pool.map(_count_range, tasks), _merge_corpus_stats)
+
+    with _get_context().Pool(min(workers, len(tasks))) as own_pool:
+        return tree_reduce(own_pool, own_pool.map(_count_range, tasks), _merge_corpus_stats)
+
+
+def parallel_combos_counter(words: Dict[str, int], max_length: int = 4, workers: int = None,
+                            pool=None) -> Dict[int, Dict[str, int]]:
+    '''
+    То же, что combos_counter, но словарь делится на части по числу процессов,
+    а комбинации частей объединяются деревом слияний
+    '''
+    workers = workers or multiprocessing.cpu_count()
+    items = list(words.items())
+    part_size = -(-len(items) // workers) if items else 1
+    tasks = [(items[idx:idx + part_size], max_length) for idx in range(0, len(items), part_size)]
+
+    if len(tasks) <= 1:
+        return combos_counter(words, max_length)
+
+    if pool is not None:
+        return tree_reduce(pool, pool.map(_combos_part, tasks), _merge_combos)
+
+    with _get_context().Pool(min(workers, len(tasks))) as own_pool:
+        return tree_reduce(own_pool, own_pool.map(_combos_part, tasks), _merge_combos)
+
+
+def build_corpus_tables(filename: str, min_length: int = 2, max_combos_length: int = 4,
+                        workers: int = None, fingerprint: str = None,
+                        compact: bool = False) -> Optional[Tuple[CorpusStats, CorpusTables]]:
+    '''
+    Статистика и таблицы корпуса
+    workers > 1 - подсчет в пуле процессов (для файлов от PARALLEL_MIN_BYTES),
+    иначе один потоковый проход
+    compact=True - комбинации в NgramStore (считаются векторно, без пула)
+    Возвращает None, если файл не найден
+    '''
+    try:
+        parallel = bool(workers and workers > 1 and os.path.getsize(filename) >= PARALLEL_MIN_BYTES)
+    except FileNotFoundError:
+        print(f"Файл {filename} не найден")
+        return None
+
+    if not parallel:
+        with profile_stage('tokenize') as record:
+            corpus_stats = stream_corpus_stats(filename, min_length)
+            if corpus_stats is None:
+                return None
+            record['items'] = corpus_stats.total_words()
+        with profile_stage('combos_counter', items=len(corpus_stats.words)):
+            tables = CorpusTables.from_corpus_stats(corpus_stats, max_combos_length, fingerprint, compact)
+        return corpus_stats, tables
+
+    with _get_context().Pool(workers) as pool:
+        with profile_stage('tokenize') as record:
+            corpus_stats = parallel_corpus_stats(filename, min_length, workers, pool=pool)
+            if corpus_stats is None:
+                return None
+            record['items'] = corpus_stats.total_words()
+        with profile_stage('combos_counter', items=len(corpus_stats.words)):
+            if compact:
+                combos = NgramStore.from_words(corpus_stats.words, max_combos_length)
+            else:
+                combos = parallel_combos_counter(corpus_stats.words, max_combos_length, workers, pool=pool)
+
+    tables = CorpusTables(corpus_stats.char_counts, corpus_stats.word_char_counts, combos, fingerprint,
+                          corpus_stats.stream_pairs, corpus_stats.space_pairs)
+    return corpus_stats, tables
@@ -0,0 +1,59 @@
+"""
+Параллельная оценка раскладок в пуле процессов
+"""
+
+import multiprocessing
+from typing import Dict, Any, Tuple
+
+from analysis.evaluation_engine import EvaluationEngine
+
+
+# Движок оценки в рабочем процессе: при fork наследуется от родителя,
+# иначе передается один раз на процесс через initializer
+_worker_engine = None
+
+
+def _init_worker(engine: EvaluationEngine) -> None:
+    """Сохраняет движок оценки в рабочем процессе"""
+    global _worker_engine
+    _worker_engine = engine
+
+
+def _score_layout_task(task: Tuple[str, Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+    """Оценивает одну раскладку в рабочем процессе"""
+    layout_name, layout_map = task
+    return layout_name, _worker_engine.score_layout(layout_map)
+
+
+def score_layouts_parallel(engine: EvaluationEngine, layout_maps: Dict[str, Dict[str, Any]],
+                           workers: int = None) -> Dict[str, Dict[str, Any]]:
+    '''
+    Оценивает раскладки параллельно в пуле процессов
+    Таблицы корпуса передаются рабочим процессам один раз (наследуются при fork),
+    а не сериализуются для каждой задачи; в задачу попадает только карта раскладки
+    Возвращает статистику в том же порядке, что и layout_maps
+    '''
+    global _worker_engine
+
+    tasks = list(layout_maps.items())
+    if not tasks:
+        return {}
+
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+        initializer, initargs = None, ()
+        _worker_engine = engine
+    else:
+        context = multiprocessing.get_context()
+        initializer, initargs = _init_worker, (engine,)
+
+    workers = min(workers or multiprocessing.cpu_count(), len(tasks))
+
+    try:
+        with context.Pool(workers, initializer, initargs) as pool:
+            # map сохраняет порядок задач, поэтому результат детерминирован
+            results = pool.map(_score_layout_task, tasks)
+    finally:
+        _worker_engine = None
+
+    return dict(results)
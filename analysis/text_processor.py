@@ -1,51 +1,406 @@
+import mmap
+import os
 import re
-from typing import Set, Dict
-from collections import defaultdict
+from typing import Set, Dict, Iterator, Optional, Tuple
+from collections import defaultdict, Counter
 
+import numpy as np
 
-def file_to_words_set(filename: str, min_length: int = 2) -> Set[str]:
+
+# Буквы, из которых состоят слова (русский и английский алфавиты)
+WORD_PATTERN = re.compile(r'[а-яёА-ЯЁa-zA-Z]+')
+WORD_LETTERS = frozenset('абвгдеёжзийклмнопрстуфхцчшщъыьэюяАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ'
+                         'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ')
+RU_LETTERS = frozenset('абвгдеёжзийклмнопрстуфхцчшщъыьэюяАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ')
+EN_LETTERS = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ')
+
+# Тот же шаблон слова над байтами UTF-8: латиница, кириллица а-я, А-Я (D0 90..D1 8F), Ё (D0 81), ё (D1 91)
+WORD_PATTERN_BYTES = re.compile(rb'(?:[a-zA-Z]|\xd0[\x81\x90-\xbf]|\xd1[\x80-\x8f\x91])+')
+# Байт, на котором точно не продолжается слово (ASCII, но не буква)
+WORD_BOUNDARY_BYTES = re.compile(rb'[^a-zA-Z\x80-\xff]')
+
+# Размер блока при потоковом чтении (в символах)
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+# Сколько первых строк просматривать при определении частотного словаря
+FREQUENCY_SNIFF_LINES = 20
+# Сколько символов начала файла читать для этой проверки
+FREQUENCY_SNIFF_SIZE = 1 << 16
+
+# Пробельные символы, разделяющие слова в потоке нажатий
+STREAM_WHITESPACE = ' \t\n\r\x0b\x0c'
+_STREAM_WHITESPACE_CODES = np.array([ord(char) for char in STREAM_WHITESPACE], dtype=np.uint64)
+
+# Сколько последних символов блока нужно, чтобы досчитать пары на стыке блоков
+STREAM_CONTEXT = 2
+
+# Пара кодов символов упаковывается в одно число: код Unicode занимает до 21 бита
+_CODE_BITS = 21
+_CODE_MASK = (1 << _CODE_BITS) - 1
+
+
+def _decode_pair_counts(pair_codes: np.ndarray) -> Counter:
+    """Упакованные коды пар -> Counter двухсимвольных строк"""
+    unique, counts = np.unique(pair_codes, return_counts=True)
+    return Counter({
+        chr(code >> _CODE_BITS) + chr(code & _CODE_MASK): count
+        for code, count in zip(unique.tolist(), counts.tolist())
+    })
+
+
+def stream_pair_counts(text: str, start: int = 0) -> Tuple[Counter, Counter]:
     '''
-    Загружает содержимое файла и возвращает множество уникальных слов
-    Игнорирует односимвольные слова
+    Получает: текст и позицию, с которой начинается еще не посчитанная часть
+    Возвращает: соседние пары символов потока нажатий (включая пробелы и знаки)
+    и пары "последний символ слова -> первый символ следующего" через один пробел;
+    учитываются только пары, заканчивающиеся не раньше start
+    Пары считаются векторно по тексту в UTF-32
     '''
-    words_set = set()
-    
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype='<u4').astype(np.uint64)
+    if len(codes) < 2:
+        return Counter(), Counter()
+
+    pair_codes = (codes[:-1] << _CODE_BITS) | codes[1:]
+    pairs = _decode_pair_counts(pair_codes[max(start - 1, 0):])
+
+    # Символ, пробел, символ: первый и третий - не пробельные
+    spaced = np.flatnonzero(codes[1:-1] == ord(' '))
+    spaced = spaced[spaced >= start - 2]
+    solid = ~np.isin(codes, _STREAM_WHITESPACE_CODES)
+    spaced = spaced[solid[spaced] & solid[spaced + 2]]
+    space_pairs = _decode_pair_counts((codes[spaced] << _CODE_BITS) | codes[spaced + 2])
+
+    return pairs, space_pairs
+
+
+class CorpusStats:
+    """
+    Статистика корпуса, накапливаемая за один проход по тексту:
+    слова, количество каждого символа и языковой состав
+    """
+
+    def __init__(self, min_length: int = 2):
+        self.min_length = min_length
+        # Частоты слов (в нижнем регистре): слово -> количество
+        self.words = Counter()
+        # Все символы текста - для штрафа и нагрузки на пальцы
+        self.char_counts = Counter()
+        # Символы слов длиной не меньше min_length - для баланса рук
+        self.word_char_counts = Counter()
+        # Поток нажатий: соседние пары символов (с пробелами и знаками)
+        # и пары соседних слов через пробел (последний символ -> первый символ)
+        self.stream_pairs = Counter()
+        self.space_pairs = Counter()
+        # Начало и конец потока - для пар на стыке блоков и частей корпуса
+        self._stream_head = ''
+        self._stream_tail = ''
+
+    def add_text(self, text: str) -> None:
+        """
+        Добавляет в статистику блок текста, не разрывающий слова
+        Блоки должны идти в порядке текста: пары на стыке блоков тоже считаются
+        """
+        self.char_counts.update(text)
+
+        pairs, space_pairs = stream_pair_counts(self._stream_tail + text, len(self._stream_tail))
+        self.stream_pairs.update(pairs)
+        self.space_pairs.update(space_pairs)
+        if len(self._stream_head) < STREAM_CONTEXT:
+            self._stream_head = (self._stream_head + text)[:STREAM_CONTEXT]
+        self._stream_tail = (self._stream_tail + text)[-STREAM_CONTEXT:]
+
+        long_words = [word for word in WORD_PATTERN.findall(text) if len(word) >= self.min_length]
+        self.words.update(word.lower() for word in long_words)
+        self.word_char_counts.update(''.join(long_words))
+
+    def add_word_count(self, entry: str, count: int) -> None:
+        """Добавляет в статистику строку частотного словаря, встретившуюся count раз"""
+        for char in entry:
+            self.char_counts[char] += count
+
+        # Строка словаря набирается отдельно: пробел перед ней и после нее
+        typed = f' {entry} '
+        for idx in range(len(typed) - 1):
+            self.stream_pairs[typed[idx:idx + 2]] += count
+        if ' ' in entry:
+            for idx in range(1, len(typed) - 2):
+                if typed[idx + 1] == ' ' and typed[idx] not in STREAM_WHITESPACE \
+                        and typed[idx + 2] not in STREAM_WHITESPACE:
+                    self.space_pairs[typed[idx] + typed[idx + 2]] += count
+
+        for word in WORD_PATTERN.findall(entry):
+            if len(word) >= self.min_length:
+                self.words[word.lower()] += count
+                for char in word:
+                    self.word_char_counts[char] += count
+
+    def merge(self, other: 'CorpusStats') -> 'CorpusStats':
+        """
+        Добавляет к статистике статистику другой части корпуса и возвращает себя
+        other - часть текста, идущая сразу после этой: досчитываются пары на стыке
+        """
+        self.words.update(other.words)
+        self.char_counts.update(other.char_counts)
+        self.word_char_counts.update(other.word_char_counts)
+        self.stream_pairs.update(other.stream_pairs)
+        self.space_pairs.update(other.space_pairs)
+
+        if self._stream_tail and other._stream_head:
+            # Пары, начинающиеся в конце этой части и заканчивающиеся в начале другой
+            joint = self._stream_tail + other._stream_head
+            boundary = len(self._stream_tail)
+            self.stream_pairs[joint[boundary - 1:boundary + 1]] += 1
+            for idx in range(max(boundary - 2, 0), boundary):
+                if (idx + 2 < len(joint) and joint[idx + 1] == ' '
+                        and joint[idx] not in STREAM_WHITESPACE and joint[idx + 2] not in STREAM_WHITESPACE):
+                    self.space_pairs[joint[idx] + joint[idx + 2]] += 1
+
+        if len(self._stream_head) < STREAM_CONTEXT:
+            self._stream_head = (self._stream_head + other._stream_head)[:STREAM_CONTEXT]
+        self._stream_tail = (self._stream_tail + other._stream_tail)[-STREAM_CONTEXT:]
+        return self
+
+    def total_words(self) -> int:
+        """Общее количество словоупотреблений"""
+        return sum(self.words.values())
+
+    def language_ratio(self) -> Dict[str, float]:
+        """Языковое соотношение по накопленным символам"""
+        return language_ratio_from_counts(self.char_counts)
+
+
+def iter_text_chunks(filename: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    '''
+    Читает файл блоками фиксированного размера
+    Незаконченное на границе блока слово переносится в следующий блок,
+    поэтому ни один блок не разрывает слово
+    '''
+    tail = ''
+
+    with open(filename, 'r', encoding='utf-8') as file:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+
+            chunk = tail + chunk
+
+            # Ищем начало слова, которое может продолжиться в следующем блоке
+            end = len(chunk)
+            while end > 0 and chunk[end - 1] in WORD_LETTERS:
+                end -= 1
+
+            tail = chunk[end:]
+            if end:
+                yield chunk[:end]
+
+    if tail:
+        yield tail
+
+
+def parse_frequency_line(line: str) -> Optional[Tuple[str, int]]:
+    '''
+    Разбирает строку частотного словаря "слово<TAB>количество"
+    (поддерживается и обратный порядок "количество<TAB>слово")
+    Возвращает (слово, количество) или None, если строка не в этом формате
+    '''
+    fields = line.rstrip('\r\n').split('\t')
+    if len(fields) < 2:
+        return None
+
+    # isdecimal, а не isdigit: int() не разбирает надстрочные цифры вроде '²'
+    if fields[-1].strip().isdecimal():
+        return ' '.join(fields[:-1]), int(fields[-1])
+    if fields[0].strip().isdecimal():
+        return ' '.join(fields[1:]), int(fields[0])
+    return None
+
+
+def is_frequency_sample(sample: str, complete: bool) -> bool:
+    '''
+    Получает: начало файла и признак того, что это весь файл
+    Возвращает: True, если первые строки - строки частотного словаря
+    Оборванная последняя строка неполного начала не проверяется
+    '''
+    if not complete:
+        sample = sample[:sample.rfind('\n') + 1]
+
+    checked_lines = 0
+    for line in sample.split('\n'):
+        if not line.strip():
+            continue
+        if parse_frequency_line(line) is None:
+            return False
+        checked_lines += 1
+        if checked_lines >= FREQUENCY_SNIFF_LINES:
+            break
+
+    return checked_lines > 0
+
+
+def is_frequency_bytes(sample: bytes, complete: bool) -> bool:
+    '''
+    Получает: начало файла в байтах (например, срез mmap) и признак того, что это весь файл
+    Возвращает: True, если первые строки - строки частотного словаря в UTF-8
+    '''
+    if not complete:
+        # Оборванная строка отбрасывается до декодирования: в ней может быть разрезан символ
+        sample = sample[:sample.rfind(b'\n') + 1]
+
+    try:
+        return is_frequency_sample(sample.decode('utf-8'), True)
+    except UnicodeDecodeError:
+        return False
+
+
+def is_frequency_file(filename: str) -> bool:
+    '''
+    Проверяет, является ли файл частотным словарем "слово<TAB>количество"
+    Читает не больше FREQUENCY_SNIFF_SIZE символов, поэтому файл без переводов
+    строк не загружается в память целиком
+    '''
+    with open(filename, 'r', encoding='utf-8') as file:
+        sample = file.read(FREQUENCY_SNIFF_SIZE)
+        complete = not file.read(1)
+
+    return is_frequency_sample(sample, complete)
+
+
+def load_frequency_file(filename: str, min_length: int = 2) -> Optional[CorpusStats]:
+    '''
+    Загружает частотный словарь "слово<TAB>количество" построчно
+    Каждое слово учитывается столько раз, сколько указано в таблице
+    '''
+    stats = CorpusStats(min_length)
+
     try:
         with open(filename, 'r', encoding='utf-8') as file:
-            text = file.read()
-        
-        # Простая токенизация - разбиваем на слова по всем не-буквенным символам
-        words = re.findall(r'[а-яёА-ЯЁa-zA-Z]+', text)
-        
-        for word in words:
-            if len(word) >= min_length:
-                words_set.add(word.lower())
-    
+            for line in file:
+                parsed = parse_frequency_line(line)
+                if parsed is not None:
+                    stats.add_word_count(*parsed)
     except FileNotFoundError:
         print(f"Файл {filename} не найден")
-        return set()
-    
-    return words_set
+        return None
 
+    return stats
 
-def detect_language_ratio(text: str) -> Dict[str, float]:
+
+def stream_corpus_stats(filename: str, min_length: int = 2, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Optional[CorpusStats]:
     '''
-    Определяет языковое соотношение текста
+    Потоковая обработка корпуса за один проход с ограниченной памятью
+    Частотные словари "слово<TAB>количество" распознаются автоматически
+    Возвращает CorpusStats или None, если файл не найден
+    '''
+    stats = CorpusStats(min_length)
+
+    try:
+        if is_frequency_file(filename):
+            return load_frequency_file(filename, min_length)
+
+        for chunk in iter_text_chunks(filename, chunk_size):
+            stats.add_text(chunk)
+    except FileNotFoundError:
+        print(f"Файл {filename} не найден")
+        return None
+
+    return stats
+
+
+def mmap_words_counter(filename: str, min_length: int = 2, window_size: int = DEFAULT_CHUNK_SIZE) -> Counter:
+    '''
+    Частоты слов (слово -> количество) для файлов больше оперативной памяти
+    Файл отображается в память (mmap), слова ищутся регулярным выражением
+    прямо по байтам окнами по window_size байт; строка всего файла не создается,
+    в памяти - только словарь уникальных слов
+    Результат совпадает с file_to_words_counter
+    '''
+    try:
+        with open(filename, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return Counter()
+
+            # Сначала считаем слова как байты, декодируем только уникальные
+            raw_words = Counter()
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                size = len(mapped)
+                # Формат определяется по началу отображения, файл заново не читается
+                if is_frequency_bytes(mapped[:FREQUENCY_SNIFF_SIZE], size <= FREQUENCY_SNIFF_SIZE):
+                    stats = load_frequency_file(filename, min_length)
+                    return stats.words if stats is not None else Counter()
+
+                position = 0
+                while position < size:
+                    # Конец окна сдвигаем до байта, на котором слово не продолжается
+                    boundary = WORD_BOUNDARY_BYTES.search(mapped, min(position + window_size, size))
+                    end = boundary.start() + 1 if boundary else size
+                    raw_words.update(WORD_PATTERN_BYTES.findall(mapped, position, end))
+                    position = end
+    except FileNotFoundError:
+        print(f"Файл {filename} не найден")
+        return Counter()
+
+    words = Counter()
+    for raw_word, count in raw_words.items():
+        word = raw_word.decode('utf-8')
+        if len(word) >= min_length:
+            words[word.lower()] += count
+
+    return words
+
+
+def file_to_words_counter(filename: str, min_length: int = 2) -> Counter:
+    '''
+    Загружает содержимое файла и возвращает частоты слов: слово -> количество
+    Игнорирует односимвольные слова
+    '''
+    stats = stream_corpus_stats(filename, min_length)
+    if stats is None:
+        return Counter()
+
+    return stats.words
+
+
+def file_to_words_set(filename: str, min_length: int = 2, use_mmap: bool = False) -> Set[str]:
+    '''
+    Загружает содержимое файла и возвращает множество уникальных слов
+    Игнорирует односимвольные слова
+    Файл читается блоками, поэтому его размер не ограничен объемом памяти
+    use_mmap=True - поиск слов по отображенному в память файлу (mmap_words_counter)
+    '''
+    if use_mmap:
+        return set(mmap_words_counter(filename, min_length))
+    return set(file_to_words_counter(filename, min_length))
+
+
+def language_ratio_from_counts(char_counts: Dict[str, int]) -> Dict[str, float]:
+    '''
+    Определяет языковое соотношение по количеству символов
     Возвращает словарь {'russian': 0.75, 'english': 0.25}
     '''
-    # Простые регулярные выражения для определения языка
-    ru_pattern = re.compile(r'[а-яёА-ЯЁ]')
-    en_pattern = re.compile(r'[a-zA-Z]')
-    
-    # Подсчитываем символы каждого языка
-    ru_chars = len(ru_pattern.findall(text))
-    en_chars = len(en_pattern.findall(text))
+    ru_chars = 0
+    en_chars = 0
+
+    for char, count in char_counts.items():
+        if char in RU_LETTERS:
+            ru_chars += count
+        elif char in EN_LETTERS:
+            en_chars += count
+
     total_chars = ru_chars + en_chars
-    
+
     if total_chars == 0:
         return {'russian': 0, 'english': 0}
-    
+
     return {
         'russian': ru_chars / total_chars,
         'english': en_chars / total_chars
-    }
\ No newline at end of file
+    }
+
+
+def detect_language_ratio(text: str) -> Dict[str, float]:
+    '''
+    Определяет языковое соотношение текста
+    Возвращает словарь {'russian': 0.75, 'english': 0.25}
+    '''
+    return language_ratio_from_counts(Counter(text))
@@ -0,0 +1,14 @@
+"""
+Пакетный анализ раскладок из командной строки
+
+Пример:
+    python cli.py corpus.txt --layouts ready_made_layouts --metrics comfort,penalty -o results.csv
+"""
+
+import sys
+
+from analysis.batch import main
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,332 @@
+"""
+Скомпилированная карта раскладки
+
+Значение в карте раскладки может быть словарем {'scancode', 'modifiers'},
+списком [сканкод, ...] или строкой сканкода, поэтому каждый анализатор
+разбирал запись символа заново. CompiledLayout один раз разбирает все записи
+в массивы по символам (клавиша, палец, рука, ряд, колонка, маска модификаторов,
+базовый штраф) и при этом остается обычным словарем символ -> запись.
+"""
+
+from collections.abc import MutableMapping
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from layouts.key_tables import (
+    KEY_FINGER_INDEX, KEY_HAND_INDEX, KEY_ROW, KEY_COL, KEY_HOME_DISTANCE, UNKNOWN_KEY, key_index,
+    modifier_mask
+)
+
+
+# Таблицы геометрии по индексу клавиши в виде массивов
+_KEY_FINGERS = np.array(KEY_FINGER_INDEX, dtype=np.int8)
+_KEY_HANDS = np.array(KEY_HAND_INDEX, dtype=np.int8)
+_KEY_ROWS = np.array(KEY_ROW, dtype=np.int8)
+_KEY_COLS = np.array(KEY_COL, dtype=np.int8)
+_KEY_HOME_DISTANCE = np.array(KEY_HOME_DISTANCE, dtype=np.float64)
+
+# Текст переводится в коды символов кусками, чтобы не держать UTF-32 копию всего корпуса
+TEXT_CHUNK_CHARS = 1 << 22
+
+
+def text_code_chunks(text: str) -> Iterator[np.ndarray]:
+    '''
+    Получает: текст
+    Возвращает: коды символов текста (uint32, UTF-32) кусками по TEXT_CHUNK_CHARS
+    '''
+    for start in range(0, len(text), TEXT_CHUNK_CHARS):
+        chunk = text[start:start + TEXT_CHUNK_CHARS]
+        yield np.frombuffer(chunk.encode('utf-32-le', 'surrogatepass'), dtype='<u4')
+
+
+def long_word_code_chunks(text: str, letters: np.ndarray) -> Iterator[np.ndarray]:
+    '''
+    Получает: текст и таблицу букв (код символа -> является ли буквой слова)
+    Возвращает: коды букв из слов длиной от двух букв кусками по TEXT_CHUNK_CHARS
+    Буква входит в такое слово, если слева или справа от нее тоже буква
+    '''
+    for start in range(0, len(text), TEXT_CHUNK_CHARS):
+        # Кусок берется с соседним символом с каждой стороны
+        context_start = max(start - 1, 0)
+        has_next = start + TEXT_CHUNK_CHARS < len(text)
+        chunk = text[context_start:start + TEXT_CHUNK_CHARS + 1]
+        codes = np.frombuffer(chunk.encode('utf-32-le', 'surrogatepass'), dtype='<u4')
+
+        is_letter = letters[np.minimum(codes, len(letters) - 1)]
+        has_neighbor = np.zeros(len(codes), dtype=bool)
+        has_neighbor[1:] |= is_letter[:-1]
+        has_neighbor[:-1] |= is_letter[1:]
+        keep = is_letter & has_neighbor
+        keep[:start - context_start] = False
+        if has_next:
+            keep[-1] = False
+
+        yield codes[keep]
+
+
+def entry_scancode(scancode_info: Any) -> Optional[str]:
+    '''
+    Получает: запись символа в карте раскладки (словарь, список или сканкод)
+    Возвращает: сканкод записи
+    '''
+    if isinstance(scancode_info, dict):
+        return scancode_info.get('scancode')
+    elif isinstance(scancode_info, list):
+        return scancode_info[0] if scancode_info else None
+    return scancode_info
+
+
+class CompiledLayout(dict):
+    """
+    Карта раскладки с массивами по символам
+
+    Символы со сканкодом перечислены в chars; i-й элемент каждого массива
+    относится к chars[i]. Базовый штраф - расстояние от домашнего ряда
+    (штраф за модификаторы зависит от настроек и добавляется при расчете);
+    penalized отмечает символы, которые вообще штрафуются.
+    Изменение карты только помечает массивы устаревшими: они собираются
+    заново при следующем обращении, поэтому построение карты по одному
+    символу не перекомпилирует ее на каждом шаге.
+    """
+
+    __slots__ = (
+        '_chars', '_char_index', '_char_keys', '_scancodes', '_key_indices', '_fingers', '_hands',
+        '_rows', '_cols', '_modifiers', '_penalized', '_base_penalty', '_code_table', '_dirty'
+    )
+
+    def __init__(self, *args, **kwargs):
+        self._dirty = True
+        self._code_table = None
+        super().__init__(*args, **kwargs)
+
+    def _invalidate(self) -> None:
+        """Помечает массивы устаревшими после изменения карты"""
+        self._dirty = True
+        self._code_table = None
+
+    def _compile(self) -> None:
+        """Разбирает записи всех символов в массивы"""
+        chars = []
+        scancodes = []
+        modifiers = []
+        penalized = []
+
+        for char, scancode_info in self.items():
+            scancode = entry_scancode(scancode_info)
+            if scancode is None:
+                continue
+            chars.append(char)
+            scancodes.append(scancode)
+            if isinstance(scancode_info, dict):
+                modifiers.append(modifier_mask(scancode_info.get('modifiers')))
+                # Штраф считается только для записей-словарей с непустым сканкодом
+                penalized.append(bool(scancode))
+            else:
+                modifiers.append(0)
+                penalized.append(False)
+
+        key_indices = np.fromiter(
+            (key_index(scancode) for scancode in scancodes), dtype=np.uint8, count=len(chars)
+        )
+
+        self._chars = chars
+        self._char_index = {char: idx for idx, char in enumerate(chars)}
+        self._char_keys = dict(zip(chars, key_indices.tolist()))
+        self._scancodes = scancodes
+        self._key_indices = key_indices
+        self._fingers = _KEY_FINGERS[key_indices]
+        self._hands = _KEY_HANDS[key_indices]
+        self._rows = _KEY_ROWS[key_indices]
+        self._cols = _KEY_COLS[key_indices]
+        self._modifiers = np.array(modifiers, dtype=np.uint8)
+        self._penalized = np.array(penalized, dtype=bool)
+        self._base_penalty = np.where(self._penalized, _KEY_HOME_DISTANCE[key_indices], 0.0)
+        self._code_table = None
+        self._dirty = False
+
+    def _compiled(name: str, doc: str) -> property:
+        """Свойство-массив: перед чтением карта компилируется, если она менялась"""
+        slot = '_' + name
+
+        def getter(self):
+            if self._dirty:
+                self._compile()
+            return getattr(self, slot)
+
+        return property(getter, doc=doc)
+
+    chars = _compiled('chars', 'Символы со сканкодом (порядок элементов всех массивов)')
+    char_index = _compiled('char_index', 'Символ -> номер в chars')
+    char_keys = _compiled('char_keys', 'Символ -> индекс клавиши')
+    scancodes = _compiled('scancodes', 'Сканкоды символов')
+    key_indices = _compiled('key_indices', 'Индексы клавиш символов (uint8)')
+    fingers = _compiled('fingers', 'Пальцы символов')
+    hands = _compiled('hands', 'Руки символов')
+    rows = _compiled('rows', 'Ряды символов')
+    cols = _compiled('cols', 'Колонки символов')
+    modifiers = _compiled('modifiers', 'Маски модификаторов символов')
+    penalized = _compiled('penalized', 'Штрафуется ли символ')
+    base_penalty = _compiled('base_penalty', 'Базовый штраф символов (расстояние от домашнего ряда)')
+    del _compiled
+
+    def scancode(self, char: str) -> Optional[str]:
+        """Сканкод символа (None, если символа нет в раскладке)"""
+        idx = self.char_index.get(char)
+        return self.scancodes[idx] if idx is not None else None
+
+    def code_table(self) -> np.ndarray:
+        """
+        Таблица код символа -> номер символа в chars (len(chars) - символа нет в раскладке);
+        коды за пределами таблицы попадают в последнюю ячейку
+        """
+        if self._code_table is None:
+            missing = len(self.chars)
+            codes = {ord(char): idx for idx, char in enumerate(self.chars) if len(char) == 1}
+            table = np.full(max(codes, default=0) + 2, missing, dtype=np.min_scalar_type(missing))
+            table[list(codes)] = list(codes.values())
+            self._code_table = table
+        return self._code_table
+
+    def text_char_indices(self, text: str) -> Iterator[np.ndarray]:
+        """Номера символов текста в chars (len(chars) - символа нет в раскладке) кусками"""
+        table = self.code_table()
+        for codes in text_code_chunks(text):
+            yield table[np.minimum(codes, len(table) - 1)]
+
+    def text_keys(self, text: str) -> np.ndarray:
+        """Индексы клавиш (uint8) всех символов текста; символы вне раскладки - UNKNOWN_KEY"""
+        keys = np.append(self.key_indices, np.uint8(UNKNOWN_KEY))
+        chunks = [keys[indices] for indices in self.text_char_indices(text)]
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.uint8)
+
+    def count_chars(self, text: str) -> np.ndarray:
+        """Количество каждого символа раскладки в тексте (в порядке chars): np.bincount по кускам"""
+        return self.count_codes(text_code_chunks(text))
+
+    def count_codes(self, code_chunks: Iterable[np.ndarray]) -> np.ndarray:
+        """Количество каждого символа раскладки среди кодов символов (в порядке chars)"""
+        table = self.code_table()
+        counts = np.zeros(len(self.chars) + 1, dtype=np.int64)
+        for codes in code_chunks:
+            counts += np.bincount(table[np.minimum(codes, len(table) - 1)], minlength=len(counts))
+        return counts[:-1]
+
+    def modifiers_for(self, char: str) -> List[str]:
+        """Список модификаторов символа, как в записи карты"""
+        scancode_info = self.get(char)
+        if isinstance(scancode_info, dict):
+            return scancode_info.get('modifiers', [])
+        return []
+
+    # Изменение карты: массивы помечаются устаревшими
+
+    def __setitem__(self, char: str, scancode_info: Any) -> None:
+        super().__setitem__(char, scancode_info)
+        self._invalidate()
+
+    def __delitem__(self, char: str) -> None:
+        super().__delitem__(char)
+        self._invalidate()
+
+    def update(self, *args, **kwargs) -> None:
+        super().update(*args, **kwargs)
+        self._invalidate()
+
+    def setdefault(self, char: str, default: Any = None) -> Any:
+        value = super().setdefault(char, default)
+        self._invalidate()
+        return value
+
+    def pop(self, char: str, *default) -> Any:
+        value = super().pop(char, *default)
+        self._invalidate()
+        return value
+
+    def popitem(self) -> Any:
+        item = super().popitem()
+        self._invalidate()
+        return item
+
+    def clear(self) -> None:
+        super().clear()
+        self._invalidate()
+
+    def __ior__(self, other: Any) -> 'CompiledLayout':
+        super().__ior__(other)
+        self._invalidate()
+        return self
+
+    def copy(self) -> 'CompiledLayout':
+        return CompiledLayout(self)
+
+    def __reduce__(self):
+        # Для pickle и copy передается только карта: массивы собираются заново
+        return CompiledLayout, (dict(self),)
+
+
+def compile_layout(layout_map: Dict[str, Any]) -> CompiledLayout:
+    '''
+    Получает: карту раскладки
+    Возвращает: скомпилированную карту (ту же, если она уже скомпилирована)
+    '''
+    if isinstance(layout_map, CompiledLayout):
+        return layout_map
+    return CompiledLayout(layout_map)
+
+
+class _PendingLayout:
+    """Карта раскладки, которая еще не построена: фабрика вызывается при первом обращении"""
+
+    __slots__ = ('factory',)
+
+    def __init__(self, factory: Callable[[], Dict[str, Any]]):
+        self.factory = factory
+
+
+class LazyLayoutMaps(MutableMapping):
+    """
+    Имя раскладки -> карта раскладки
+
+    Карту можно задать фабрикой (set_factory): она строится и компилируется
+    при первом обращении и запоминается. Проверка имени, обход имен и len
+    карты не строят; items() и values() строят все карты.
+    """
+
+    def __init__(self, layout_maps: Dict[str, Any] = None):
+        self._maps = {}
+        if layout_maps:
+            self.update(layout_maps)
+
+    def set_factory(self, layout_name: str, factory: Callable[[], Dict[str, Any]]) -> None:
+        """Задает карту раскладки фабрикой (порядок имени сохраняется, как в словаре)"""
+        self._maps[layout_name] = _PendingLayout(factory)
+
+    def is_built(self, layout_name: str) -> bool:
+        """Построена ли уже карта раскладки"""
+        return not isinstance(self._maps.get(layout_name), _PendingLayout)
+
+    def __getitem__(self, layout_name: str) -> Dict[str, Any]:
+        layout_map = self._maps[layout_name]
+        if isinstance(layout_map, _PendingLayout):
+            layout_map = compile_layout(layout_map.factory())
+            self._maps[layout_name] = layout_map
+        return layout_map
+
+    def __setitem__(self, layout_name: str, layout_map: Dict[str, Any]) -> None:
+        self._maps[layout_name] = layout_map
+
+    def __delitem__(self, layout_name: str) -> None:
+        del self._maps[layout_name]
+
+    def __contains__(self, layout_name: object) -> bool:
+        return layout_name in self._maps
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._maps)
+
+    def __len__(self) -> int:
+        return len(self._maps)
+
+    def __repr__(self) -> str:
+        return f"LazyLayoutMaps({list(self._maps)})"
@@ -0,0 +1,302 @@
+"""
+Геометрия клавиатуры в виде плоских таблиц
+
+Каждому сканкоду сопоставлен небольшой целый индекс клавиши, а палец, рука,
+ряд, колонка и расстояние до домашней позиции хранятся в кортежах,
+индексируемых этим индексом. Поиск по спискам сканкодов на каждом символе
+заменяется обращением к элементу кортежа.
+"""
+
+from typing import Any, Tuple
+
+import numpy as np
+
+
+# Порядок пальцев (без больших пальцев): от левого мизинца к правому
+FINGER_ORDER = [
+    'left_pinky', 'left_ring', 'left_middle', 'left_index',
+    'right_index', 'right_middle', 'right_ring', 'right_pinky'
+]
+FINGER_INDEX = {finger: idx for idx, finger in enumerate(FINGER_ORDER)}
+
+HANDS = ['left', 'right']
+HAND_INDEX = {hand: idx for idx, hand in enumerate(HANDS)}
+
+# Соответствие сканкодов пальцам (БЕЗ БОЛЬШИХ ПАЛЬЦЕВ)
+KEY_FINGER = {
+    'left_pinky': ['02', '10', '1E', '2C', '38'],
+    'left_ring': ['03', '11', '1F', '2D'],
+    'left_middle': ['04', '12', '20', '2E'],
+    'left_index': ['05', '13', '21', '2F', '06', '14', '22', '30'],
+
+    'right_index': ['07', '15', '23', '31', '08', '16', '24', '32'],
+    'right_middle': ['09', '17', '25', '33'],
+    'right_ring': ['0A', '18', '26', '34'],
+    'right_pinky': ['0B', '19', '27', '35', '0C', '1A', '28', '36', '29', '0D', '1B', '37'],
+}
+
+# Соответствие сканкодов рукам (БЕЗ БОЛЬШИХ ПАЛЬЦЕВ)
+KEY_HAND = {
+    'left': ['02', '03', '04', '05', '06', '10', '11', '12', '13', '14',
+             '1E', '1F', '20', '21', '22', '2C', '2D', '2E', '2F', '30', '38'],
+    'right': ['07', '08', '09', '0A', '0B', '0C', '0D', '15', '16', '17', '18',
+              '19', '1A', '1B', '23', '24', '25', '26', '27', '28', '29',
+              '31', '32', '33', '34', '35', '36', '37']
+}
+
+# Соответствие сканкодов позициям на клавиатуре (ряд, колонка)
+# Основано на стандартной QWERTY раскладке
+KEY_POSITIONS = {
+    # Цифровой ряд (ряд 2)
+    '02': (2, 0), '03': (2, 1), '04': (2, 2), '05': (2, 3), '06': (2, 4),
+    '07': (2, 5), '08': (2, 6), '09': (2, 7), '0A': (2, 8), '0B': (2, 9),
+
+    # Верхний ряд (ряд 1)
+    '10': (1, 0), '11': (1, 1), '12': (1, 2), '13': (1, 3), '14': (1, 4),
+    '15': (1, 5), '16': (1, 6), '17': (1, 7), '18': (1, 8), '19': (1, 9),
+    '1A': (1, 10), '1B': (1, 11),
+
+    # Домашний ряд (ряд 0)
+    '1E': (0, 0), '1F': (0, 1), '20': (0, 2), '21': (0, 3), '22': (0, 4),
+    '23': (0, 5), '24': (0, 6), '25': (0, 7), '26': (0, 8), '27': (0, 9),
+    '28': (0, 10), '29': (0, 11),
+
+    # Нижний ряд (ряд -1)
+    '2C': (-1, 0), '2D': (-1, 1), '2E': (-1, 2), '2F': (-1, 3), '30': (-1, 4),
+    '31': (-1, 5), '32': (-1, 6), '33': (-1, 7), '34': (-1, 8), '35': (-1, 9),
+    '36': (-1, 10), '37': (-1, 11),
+
+    # LAlt для раскладок с двумя буквами на одной позиции
+    '38': (-1, 0),
+
+    # Пробел
+    '39': (-2, 5),
+}
+
+# Домашняя позиция для каждого пальца (ряд, колонка) для стандартной QWERTY
+HOME_POSITIONS = {
+    'left_pinky': (0, 0),   # A
+    'left_ring': (0, 1),    # S
+    'left_middle': (0, 2),  # D
+    'left_index': (0, 3),   # F
+
+    'right_index': (0, 5),  # J
+    'right_middle': (0, 6), # K
+    'right_ring': (0, 7),   # L
+    'right_pinky': (0, 8),  # ;
+}
+
+SPACE_SCANCODE = '39'
+
+# Сканкоды рядов в порядке заполнения раскладки из JSON:
+# цифровой, верхний, домашний и нижний ряды, затем LAlt
+LAYOUT_ROW_SCANCODES = [
+    ['02', '03', '04', '05', '06', '07', '08', '09', '0A', '0B'],
+    ['10', '11', '12', '13', '14', '15', '16', '17', '18', '19', '1A', '1B'],
+    ['1E', '1F', '20', '21', '22', '23', '24', '25', '26', '27', '28', '29'],
+    ['2C', '2D', '2E', '2F', '30', '31', '32', '33', '34', '35', '36', '37'],
+]
+JSON_LAYOUT_SCANCODES = [scancode for row in LAYOUT_ROW_SCANCODES for scancode in row] + ['38']
+
+# Все известные сканкоды; индекс клавиши - позиция в этом списке
+SCANCODES = sorted(
+    set(KEY_POSITIONS)
+    | {scancode for scancodes in KEY_FINGER.values() for scancode in scancodes}
+    | {scancode for scancodes in KEY_HAND.values() for scancode in scancodes},
+    key=lambda scancode: int(scancode, 16)
+)
+SCANCODE_INDEX = {scancode: idx for idx, scancode in enumerate(SCANCODES)}
+
+# Индекс для сканкодов, которых нет в таблицах: у такой клавиши нет ни пальца, ни руки
+UNKNOWN_KEY = len(SCANCODES)
+KEY_COUNT = UNKNOWN_KEY + 1
+
+# Быстрый поиск пальца и руки по сканкоду
+FINGER_BY_SCANCODE = {scancode: finger for finger, scancodes in KEY_FINGER.items() for scancode in scancodes}
+HAND_BY_SCANCODE = {scancode: hand for hand, scancodes in KEY_HAND.items() for scancode in scancodes}
+
+
+def _home_distance(scancode: str) -> int:
+    """Манхэттенское расстояние от клавиши до домашней позиции ее пальца"""
+    finger = FINGER_BY_SCANCODE.get(scancode)
+    if finger is None:
+        return 0
+
+    key_row, key_col = KEY_POSITIONS.get(scancode, (0, 0))
+    home_row, home_col = HOME_POSITIONS[finger]
+    return abs(key_row - home_row) + abs(key_col - home_col)
+
+
+# Плоские таблицы по индексу клавиши (-1 = нет пальца / руки)
+KEY_FINGER_INDEX = tuple(
+    [FINGER_INDEX.get(FINGER_BY_SCANCODE.get(scancode), -1) for scancode in SCANCODES] + [-1]
+)
+KEY_HAND_INDEX = tuple(
+    [HAND_INDEX.get(HAND_BY_SCANCODE.get(scancode), -1) for scancode in SCANCODES] + [-1]
+)
+KEY_ROW = tuple([KEY_POSITIONS.get(scancode, (0, 0))[0] for scancode in SCANCODES] + [0])
+KEY_COL = tuple([KEY_POSITIONS.get(scancode, (0, 0))[1] for scancode in SCANCODES] + [0])
+KEY_HOME_DISTANCE = tuple([_home_distance(scancode) for scancode in SCANCODES] + [0])
+
+
+def key_index(scancode: str) -> int:
+    """Индекс клавиши для сканкода (UNKNOWN_KEY для неизвестного сканкода)"""
+    return SCANCODE_INDEX.get(scancode, UNKNOWN_KEY)
+
+
+# Биты маски модификаторов символа (0 - без модификаторов)
+MODIFIER_SHIFT = 1
+MODIFIER_ALT = 2
+# Число различных масок (размер таблиц клавиша x маска)
+MODIFIER_MASK_COUNT = (MODIFIER_SHIFT | MODIFIER_ALT) + 1
+MODIFIER_BITS = {'shift': MODIFIER_SHIFT, 'alt': MODIFIER_ALT}
+
+
+def modifier_mask(modifiers: Any) -> int:
+    """Маска модификаторов по их списку (неизвестные модификаторы не учитываются)"""
+    mask = 0
+    for modifier in modifiers or ():
+        mask |= MODIFIER_BITS.get(modifier, 0)
+    return mask
+
+
+def finger_direction(finger_idx1: int, finger_idx2: int) -> Any:
+    """
+    Направление движения между пальцами по их индексам:
+    1 = вовнутрь, 0 = тот же палец, -1 = наружу, None = разные руки
+    """
+    if finger_idx1 < 0 or finger_idx2 < 0:
+        return None
+
+    # Левая рука - индексы 0..3, правая - 4..7
+    if (finger_idx1 < 4) != (finger_idx2 < 4):
+        return None
+
+    if finger_idx1 == finger_idx2:
+        return 0
+
+    direction = finger_idx2 - finger_idx1
+
+    # Для левой руки вовнутрь - рост индекса, для правой - убывание
+    if finger_idx1 < 4:
+        return 1 if direction > 0 else -1
+    return -1 if direction > 0 else 1
+
+
+def classify_key_pair(key1: int, key2: int) -> Tuple[float, str]:
+    """
+    Классифицирует пару клавиш по индексам:
+    удобная (вовнутрь одной рукой), частично удобная (тот же палец или наружу),
+    неудобная (разные руки)
+    """
+    finger1 = KEY_FINGER_INDEX[key1]
+    finger2 = KEY_FINGER_INDEX[key2]
+
+    if finger1 < 0 or finger2 < 0:
+        return 0.0, 'uncomfortable'
+
+    if KEY_HAND_INDEX[key1] != KEY_HAND_INDEX[key2]:
+        return 0.0, 'uncomfortable'
+
+    if finger1 == finger2:
+        return 0.5, 'partially_comfortable'
+
+    direction = finger_direction(finger1, finger2)
+
+    if direction == 1:
+        return 1.0, 'comfortable'
+    elif direction == -1:
+        return 0.3, 'partially_comfortable'
+    return 0.0, 'uncomfortable'
+
+
+# Категории удобства двухсимвольных комбинаций (индекс = код категории)
+COMFORT_CATEGORIES = ['comfortable', 'partially_comfortable', 'uncomfortable']
+COMFORT_CATEGORY_INDEX = {category: idx for idx, category in enumerate(COMFORT_CATEGORIES)}
+
+
+def _build_key_pair_tables() -> Tuple[np.ndarray, np.ndarray]:
+    """Классифицирует каждую пару клавиш один раз: матрицы кодов категорий и оценок"""
+    categories = np.empty((KEY_COUNT, KEY_COUNT), dtype=np.int8)
+    scores = np.empty((KEY_COUNT, KEY_COUNT), dtype=np.float64)
+
+    for key1 in range(KEY_COUNT):
+        for key2 in range(KEY_COUNT):
+            score, category = classify_key_pair(key1, key2)
+            categories[key1, key2] = COMFORT_CATEGORY_INDEX[category]
+            scores[key1, key2] = score
+
+    return categories, scores
+
+
+# Матрицы клавиша x клавиша: код категории удобства и оценка удобства пары
+KEY_PAIR_CATEGORY, KEY_PAIR_SCORE = _build_key_pair_tables()
+
+
+# Категории трехсимвольных комбинаций (индекс = код категории):
+# чередование рук, роллы вовнутрь и наружу, смена направления на одной руке,
+# соседние нажатия одним пальцем, прочие (клавиши без пальца)
+TRIGRAM_CATEGORIES = ['alternation', 'inward_roll', 'outward_roll', 'redirect', 'same_finger', 'other']
+TRIGRAM_CATEGORY_INDEX = {category: idx for idx, category in enumerate(TRIGRAM_CATEGORIES)}
+
+
+def _build_key_triple_tables() -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Классифицирует каждую тройку клавиш один раз (векторно):
+    массив кодов категорий KEY_COUNT^3 и признак "тот же палец через одно нажатие"
+    - чередование: рука меняется на обоих переходах
+    - ролл: две соседние клавиши одной рукой разными пальцами, третья - другой рукой,
+      или три клавиши одной рукой в одном направлении
+    - смена направления: три клавиши одной рукой, направление меняется
+    - тот же палец: два соседних нажатия одним пальцем
+    """
+    fingers = np.array(KEY_FINGER_INDEX)
+    hands = np.array(KEY_HAND_INDEX)
+
+    finger1, finger2, finger3 = np.ix_(fingers, fingers, fingers)
+    hand1, hand2, hand3 = np.ix_(hands, hands, hands)
+
+    def inward(finger_from, finger_to):
+        # Левая рука - индексы 0..3 (вовнутрь - рост индекса), правая - 4..7 (убывание)
+        return np.where(finger_from < 4, finger_to > finger_from, finger_to < finger_from)
+
+    known = (finger1 >= 0) & (finger2 >= 0) & (finger3 >= 0)
+    same_finger = (finger1 == finger2) | (finger2 == finger3)
+    switch12 = hand1 != hand2
+    switch23 = hand2 != hand3
+
+    categories = np.full((KEY_COUNT,) * 3, TRIGRAM_CATEGORY_INDEX['other'], dtype=np.int8)
+
+    # Одна смена руки: направление задает пара соседних клавиш одной рукой
+    first_pair = ~switch12 & switch23
+    second_pair = switch12 & ~switch23
+    pair_inward = np.where(first_pair, inward(finger1, finger2), inward(finger2, finger3))
+    roll = first_pair | second_pair
+
+    # Три клавиши одной рукой: ролл, если оба перехода в одну сторону
+    one_hand = ~switch12 & ~switch23
+    inward12 = inward(finger1, finger2)
+    inward23 = inward(finger2, finger3)
+
+    rules = [
+        (roll & pair_inward, 'inward_roll'),
+        (roll & ~pair_inward, 'outward_roll'),
+        (one_hand & inward12 & inward23, 'inward_roll'),
+        (one_hand & ~inward12 & ~inward23, 'outward_roll'),
+        (one_hand & (inward12 != inward23), 'redirect'),
+        (switch12 & switch23, 'alternation'),
+        (same_finger, 'same_finger'),
+    ]
+    # Более поздние правила важнее: соседние нажатия одним пальцем - всегда same_finger
+    for mask, category in rules:
+        categories[np.broadcast_to(mask & known, categories.shape)] = TRIGRAM_CATEGORY_INDEX[category]
+
+    keys = np.arange(KEY_COUNT)
+    skipgram = known & (finger1 == finger3) & (keys[:, None, None] != keys[None, None, :])
+
+    return categories, np.broadcast_to(skipgram, categories.shape).copy()
+
+
+# Тройки клавиш: код категории трехсимвольной комбинации и признак
+# "тот же палец через одно нажатие" (первая и третья клавиши разные, палец один)
+KEY_TRIPLE_CATEGORY, KEY_TRIPLE_SKIPGRAM = _build_key_triple_tables()
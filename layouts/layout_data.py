@@ -1,6 +1,24 @@
-import re
-from typing import Dict, Tuple, List, Set, Any, Optional
+from typing import Dict, Tuple, List, Set, Any, Optional, Union
 from collections import defaultdict
+from functools import partial
+
+import numpy as np
+
+from layouts.key_tables import (
+    FINGER_ORDER, FINGER_INDEX, HANDS, HAND_INDEX, KEY_FINGER, KEY_HAND, KEY_FINGER_INDEX, KEY_HAND_INDEX,
+    FINGER_BY_SCANCODE, HAND_BY_SCANCODE, classify_key_pair, finger_direction,
+    key_index, KEY_COUNT, KEY_PAIR_CATEGORY, KEY_PAIR_SCORE, COMFORT_CATEGORIES, COMFORT_CATEGORY_INDEX,
+    KEY_TRIPLE_CATEGORY, KEY_TRIPLE_SKIPGRAM, TRIGRAM_CATEGORIES
+)
+from layouts.compiled_layout import CompiledLayout, LazyLayoutMaps, compile_layout, long_word_code_chunks
+from layouts.layout_maps import BUILTIN_LAYOUTS, BUILTIN_LAYOUT_LANGUAGES, builtin_layout_map
+
+
+# Буквы слов для баланса рук ([а-яА-ЯёЁa-zA-Z]) как таблица по коду символа
+WORD_LETTERS = ('абвгдеёжзийклмнопрстуфхцчшщъыьэюяАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ'
+                'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ')
+WORD_LETTER_TABLE = np.zeros(max(map(ord, WORD_LETTERS)) + 2, dtype=bool)
+WORD_LETTER_TABLE[[ord(char) for char in WORD_LETTERS]] = True
 
 
 def key_from_value(item, the_dict):
@@ -19,6 +37,8 @@ def scancode_from_char(char: str, layout_map: Dict[str, Any]) -> Optional[str]:
     Получает: символ, словарь
     Возвращает: сканкод для символа с учетом модификаторов
     '''
+    if isinstance(layout_map, CompiledLayout):
+        return layout_map.scancode(char)
     if char in layout_map:
         scancode_info = layout_map[char]
         if isinstance(scancode_info, dict):
@@ -34,6 +54,8 @@ def get_modifiers_for_char(char: str, layout_map: Dict[str, Any]) -> List[str]:
     '''
     Возвращает список модификаторов для символа
     '''
+    if isinstance(layout_map, CompiledLayout):
+        return layout_map.modifiers_for(char)
     if char in layout_map:
         scancode_info = layout_map[char]
         if isinstance(scancode_info, dict):
@@ -41,63 +63,49 @@ def get_modifiers_for_char(char: str, layout_map: Dict[str, Any]) -> List[str]:
     return []
 
 
+def trigram_char_arrays(trigram_counts: Dict[str, int]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    '''
+    Получает: таблицу трехсимвольных комбинаций (комбинация -> количество)
+    Возвращает: алфавит комбинаций, индексы символов в алфавите (n x 3) и количества
+    Не зависит от раскладки, поэтому строится один раз на корпус
+    '''
+    combos = [combo for combo in trigram_counts if len(combo) == 3 and ' ' not in combo]
+    alphabet = sorted(set(''.join(combos)))
+    char_index = {char: idx for idx, char in enumerate(alphabet)}
+    
+    indices = np.fromiter(
+        (char_index[char] for combo in combos for char in combo), dtype=np.intp, count=3 * len(combos)
+    ).reshape(-1, 3)
+    counts = np.fromiter((trigram_counts[combo] for combo in combos), dtype=np.int64, count=len(combos))
+    
+    return alphabet, indices, counts
+
+
 class LayoutData:
     """Класс для хранения данных о раскладках"""
     
     def __init__(self):
-        # Карты всех раскладок (ТОЛЬКО БУКВЫ И ЦИФРЫ)
-        self.layout_maps = {
-            'ЙЦУКЕН': self.create_icuken_layout_map(),
-            'Скоропись': self.create_scoropis_layout_map(),
-            'Фонетическая (яВерт)': self.create_phonetic_vert_layout_map(),
-            'Диктор': self.create_diktor_layout_map(),
-            'QWERTY': self.create_qwerty_layout_map(),
-            'Dvorak': self.create_dvorak_layout_map(),
-            'Colemak': self.create_colemak_layout_map(),
-            'Workman': self.create_workman_layout_map()
-        }
+        # Карты всех раскладок (ТОЛЬКО БУКВЫ И ЦИФРЫ): встроенные строятся
+        # из рядов layouts.layout_maps при первом обращении и запоминаются
+        self.layout_maps = LazyLayoutMaps()
+        for layout_name in BUILTIN_LAYOUTS:
+            self.layout_maps.set_factory(layout_name, partial(builtin_layout_map, layout_name))
         
-        # Соответствие сканкодов пальцам (БЕЗ БОЛЬШИХ ПАЛЬЦЕВ)
-        self.key_finger = {
-            'left_pinky': ['02', '10', '1E', '2C', '38'],
-            'left_ring': ['03', '11', '1F', '2D'],
-            'left_middle': ['04', '12', '20', '2E'],
-            'left_index': ['05', '13', '21', '2F', '06', '14', '22', '30'],
-            
-            'right_index': ['07', '15', '23', '31', '08', '16', '24', '32'],
-            'right_middle': ['09', '17', '25', '33'],
-            'right_ring': ['0A', '18', '26', '34'],
-            'right_pinky': ['0B', '19', '27', '35', '0C', '1A', '28', '36', '29', '0D', '1B', '37'],
-        }
-        
-        # Соответствие сканкодов рукам (БЕЗ БОЛЬШИХ ПАЛЬЦЕВ)
-        self.key_hand = {
-            'left': ['02', '03', '04', '05', '06', '10', '11', '12', '13', '14', 
-                    '1E', '1F', '20', '21', '22', '2C', '2D', '2E', '2F', '30', '38'],
-            'right': ['07', '08', '09', '0A', '0B', '0C', '0D', '15', '16', '17', '18',
-                     '19', '1A', '1B', '23', '24', '25', '26', '27', '28', '29',
-                     '31', '32', '33', '34', '35', '36', '37']
-        }
+        # Соответствие сканкодов пальцам и рукам (БЕЗ БОЛЬШИХ ПАЛЬЦЕВ)
+        # Общие таблицы геометрии клавиатуры - см. layouts.key_tables
+        self.key_finger = KEY_FINGER
+        self.key_hand = KEY_HAND
         
         # Порядок пальцев для определения направления
-        self.finger_order = [
-            'left_pinky', 'left_ring', 'left_middle', 'left_index',
-            'right_index', 'right_middle', 'right_ring', 'right_pinky'
-        ]
+        self.finger_order = FINGER_ORDER
     
     def get_finger_for_scancode(self, scancode: str) -> str:
         """Получает палец для сканкода"""
-        for finger, scancodes in self.key_finger.items():
-            if scancode in scancodes:
-                return finger
-        return None
+        return FINGER_BY_SCANCODE.get(scancode)
     
     def get_hand_for_scancode(self, scancode: str) -> str:
         """Получает руку для сканкода"""
-        for hand, scancodes in self.key_hand.items():
-            if scancode in scancodes:
-                return hand
-        return None
+        return HAND_BY_SCANCODE.get(scancode)
     
     def calculate_finger_direction(self, finger1: str, finger2: str) -> int:
         """
@@ -107,83 +115,133 @@ class LayoutData:
         -1 = от указательного к мизинцу (менее удобно, наружу)
         None = разные руки
         """
-        if finger1 not in self.finger_order or finger2 not in self.finger_order:
+        if finger1 not in FINGER_INDEX or finger2 not in FINGER_INDEX:
             return None
         
-        idx1 = self.finger_order.index(finger1)
-        idx2 = self.finger_order.index(finger2)
-        
-        # Проверяем, на одной ли руке пальцы
-        left_fingers = ['left_pinky', 'left_ring', 'left_middle', 'left_index']
-        right_fingers = ['right_index', 'right_middle', 'right_ring', 'right_pinky']
-        
-        is_left_hand = finger1 in left_fingers and finger2 in left_fingers
-        is_right_hand = finger1 in right_fingers and finger2 in right_fingers
-        
-        if not (is_left_hand or is_right_hand):
-            return None  # Разные руки
-        
-        if idx1 == idx2:
-            return 0  # Тот же палец
-        
-        direction = idx2 - idx1
-        
-        # Для левой руки: от мизинца (0) к указательному (3) - положительное направление (1)
-        # Для правой руки: от мизинца (7) к указательному (4) - отрицательное направление (-1)
-        if is_left_hand:
-            return 1 if direction > 0 else -1
-        else:  # правая рука
-            return -1 if direction > 0 else 1  # Обратное направление для правой руки
+        return finger_direction(FINGER_INDEX[finger1], FINGER_INDEX[finger2])
     
-    def calculate_dynamic_penalties(self, words_set: Set[str], layout_map: Dict[str, Any]) -> Tuple[Dict[str, int], Dict[str, int], Dict[str, int], Dict[str, float]]:
+    def calculate_dynamic_penalties(self, words: Union[Dict[str, int], Set[str]], layout_map: Dict[str, Any]) -> Tuple[Dict[str, int], Dict[str, int], Dict[str, int], Dict[str, float]]:
         """
         Рассчитывает динамические штрафы по правилам:
         - Удобные: нет смены рук и пальцы идут вовнутрь
         - Частично удобные: смена направления пальцев, но той же руки
         - Неудобные: разные руки
         
+        Принимает частоты слов (слово -> количество) или множество слов
         Возвращает словари комбинаций и оценок
         """
-        comfort_combos = defaultdict(int)
-        partial_combos = defaultdict(int)
-        uncomfortable_combos = defaultdict(int)
-        dynamic_scores = {}
+        # Для множества слов каждое слово учитывается один раз
+        word_counts = words.items() if isinstance(words, dict) else ((word, 1) for word in words)
         
-        for word in words_set:
+        # Собираем все последовательные пары символов внутри слов
+        bigram_counts = defaultdict(int)
+        
+        for word, count in word_counts:
             if len(word) < 2:  # Пропускаем односимвольные слова
                 continue
             
-            # Анализируем все последовательные пары символов в слове
             for i in range(len(word) - 1):
-                combo = word[i:i+2]
-                
-                # Пропускаем комбинации с пробелами или неподдерживаемыми символами
-                if ' ' in combo:
-                    continue
-                
-                valid = True
-                for char in combo:
-                    if scancode_from_char(char, layout_map) is None:  # Используем функцию из этого же файла
-                        valid = False
-                        break
-                
-                if not valid:
-                    continue
-                
-                # Определяем удобство комбинации
-                comfort_score, category = self.calculate_combo_comfort_dynamic(combo, layout_map)
-                dynamic_scores[combo] = comfort_score
-                
-                # Добавляем в соответствующий словарь
-                if category == 'comfortable':
-                    comfort_combos[combo] += 1
-                elif category == 'partially_comfortable':
-                    partial_combos[combo] += 1
-                elif category == 'uncomfortable':
-                    uncomfortable_combos[combo] += 1
+                bigram_counts[word[i:i+2]] += count
+        
+        return self.calculate_dynamic_penalties_from_bigrams(bigram_counts, layout_map)
+    
+    def calculate_dynamic_penalties_from_bigrams(self, bigram_counts: Dict[str, int], layout_map: Dict[str, Any]) -> Tuple[Dict[str, int], Dict[str, int], Dict[str, int], Dict[str, float]]:
+        """
+        Рассчитывает динамические штрафы по готовой таблице биграмм (комбинация -> количество)
+        Каждая комбинация классифицируется один раз, независимо от размера корпуса
+        """
+        combos, first_keys, second_keys, counts = self._bigram_key_arrays(bigram_counts, layout_map)
+        
+        # Каждая пара классифицируется обращением к матрице категорий клавиша x клавиша
+        categories = KEY_PAIR_CATEGORY[first_keys, second_keys]
+        scores = KEY_PAIR_SCORE[first_keys, second_keys]
+        
+        combo_dicts = []
+        for category in COMFORT_CATEGORIES:
+            mask = categories == COMFORT_CATEGORY_INDEX[category]
+            combo_dicts.append(defaultdict(int, zip(combos[mask].tolist(), counts[mask].tolist())))
+        
+        comfort_combos, partial_combos, uncomfortable_combos = combo_dicts
+        dynamic_scores = dict(zip(combos.tolist(), scores.tolist()))
         
         return comfort_combos, partial_combos, uncomfortable_combos, dynamic_scores
     
+    def calculate_comfort_totals(self, bigram_counts: Dict[str, int], layout_map: Dict[str, Any]) -> Dict[str, int]:
+        """
+        Суммарное количество удобных, частично удобных и неудобных комбинаций
+        Считается одной взвешенной суммой по матрице количеств биграмм клавиша x клавиша
+        """
+        count_matrix = self.bigram_count_matrix(bigram_counts, layout_map)
+        
+        totals = np.bincount(KEY_PAIR_CATEGORY.ravel(), weights=count_matrix.ravel(),
+                             minlength=len(COMFORT_CATEGORIES))
+        
+        return {category: int(totals[idx]) for idx, category in enumerate(COMFORT_CATEGORIES)}
+    
+    def bigram_count_matrix(self, bigram_counts: Dict[str, int], layout_map: Dict[str, Any]) -> np.ndarray:
+        """Матрица количеств биграмм по индексам клавиш раскладки (KEY_COUNT x KEY_COUNT)"""
+        _, first_keys, second_keys, counts = self._bigram_key_arrays(bigram_counts, layout_map)
+        
+        count_matrix = np.zeros((KEY_COUNT, KEY_COUNT), dtype=np.int64)
+        np.add.at(count_matrix, (first_keys, second_keys), counts)
+        
+        return count_matrix
+    
+    def _bigram_key_arrays(self, bigram_counts: Dict[str, int], layout_map: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Переводит таблицу биграмм в массивы: комбинации, индексы первой и второй клавиши, количества
+        Комбинации с пробелами и символами без сканкода отбрасываются
+        """
+        # Символ -> индекс клавиши (символы без сканкода не попадают)
+        char_keys = compile_layout(layout_map).char_keys
+        
+        combos = [
+            combo for combo in bigram_counts
+            if len(combo) == 2 and ' ' not in combo and combo[0] in char_keys and combo[1] in char_keys
+        ]
+        
+        first_keys = np.fromiter((char_keys[combo[0]] for combo in combos), dtype=np.intp, count=len(combos))
+        second_keys = np.fromiter((char_keys[combo[1]] for combo in combos), dtype=np.intp, count=len(combos))
+        counts = np.fromiter((bigram_counts[combo] for combo in combos), dtype=np.int64, count=len(combos))
+        
+        return np.array(combos, dtype=object), first_keys, second_keys, counts
+    
+    def calculate_trigram_metrics(self, trigram_counts: Dict[str, int], layout_map: Dict[str, Any]) -> Dict[str, int]:
+        """
+        Метрики трехсимвольных комбинаций по таблице комбинация -> количество
+        (см. calculate_trigram_metrics_from_arrays)
+        """
+        return self.calculate_trigram_metrics_from_arrays(trigram_char_arrays(trigram_counts), layout_map)
+    
+    def calculate_trigram_metrics_from_arrays(self, trigram_arrays: Tuple[List[str], np.ndarray, np.ndarray],
+                                              layout_map: Dict[str, Any]) -> Dict[str, int]:
+        """
+        Метрики трехсимвольных комбинаций: количество комбинаций каждой категории
+        (чередование рук, роллы вовнутрь и наружу, смена направления, тот же палец)
+        и same_finger_skipgram - первая и третья клавиши разные, но нажимаются одним пальцем
+        Каждая комбинация классифицируется обращением к таблицам троек клавиш
+        """
+        alphabet, indices, counts = trigram_arrays
+        char_keys = compile_layout(layout_map).char_keys
+        
+        # Символ алфавита корпуса -> индекс клавиши (-1 - символа нет в раскладке)
+        char_to_key = np.array([char_keys.get(char, -1) for char in alphabet] + [-1], dtype=np.intp)
+        keys = char_to_key[indices]
+        known = (keys >= 0).all(axis=1)
+        keys = keys[known]
+        counts = counts[known]
+        
+        categories = KEY_TRIPLE_CATEGORY[keys[:, 0], keys[:, 1], keys[:, 2]]
+        skipgrams = KEY_TRIPLE_SKIPGRAM[keys[:, 0], keys[:, 1], keys[:, 2]]
+        totals = np.bincount(categories, weights=counts, minlength=len(TRIGRAM_CATEGORIES))
+        
+        results = {'total': int(counts.sum())}
+        for idx, category in enumerate(TRIGRAM_CATEGORIES):
+            results[category] = int(totals[idx])
+        results['same_finger_skipgram'] = int(counts[skipgrams].sum())
+        
+        return results
+    
     def calculate_combo_comfort_dynamic(self, combo: str, layout_map: Dict[str, Any]) -> Tuple[float, str]:
         """
         Улучшенный расчет удобства комбинации:
@@ -198,70 +256,47 @@ class LayoutData:
         if len(combo) != 2:
             return 0.0, 'uncomfortable'
         
-        char1, char2 = combo[0], combo[1]
-        
         # Получаем сканкоды
-        scancode1 = scancode_from_char(char1, layout_map)
-        scancode2 = scancode_from_char(char2, layout_map)
+        scancode1 = scancode_from_char(combo[0], layout_map)
+        scancode2 = scancode_from_char(combo[1], layout_map)
         
         if scancode1 is None or scancode2 is None:
             return 0.0, 'uncomfortable'
         
-        # Определяем пальцы
-        finger1 = self.get_finger_for_scancode(scancode1)
-        finger2 = self.get_finger_for_scancode(scancode2)
-        
-        if finger1 is None or finger2 is None:
-            return 0.0, 'uncomfortable'
-        
-        # Проверяем смену рук (неудобно)
-        hand1 = self.get_hand_for_scancode(scancode1)
-        hand2 = self.get_hand_for_scancode(scancode2)
-        
-        if hand1 != hand2:
-            return 0.0, 'uncomfortable'
-        
-        # Проверяем тот же палец (частично удобно)
-        if finger1 == finger2:
-            return 0.5, 'partially_comfortable'
-        
-        # Определяем направление
-        direction = self.calculate_finger_direction(finger1, finger2)
-        
-        if direction == 1:
-            # От мизинца к указательному (удобно)
-            return 1.0, 'comfortable'
-        elif direction == -1:
-            # От указательного к мизинцу (частично удобно)
-            return 0.3, 'partially_comfortable'
-        else:
-            # Неопределенное направление
-            return 0.0, 'uncomfortable'
+        return classify_key_pair(key_index(scancode1), key_index(scancode2))
     
     def calculate_hand_balance(self, text: str, layout_map: Dict[str, Any]) -> Dict[str, Any]:
         """Рассчитывает баланс между руками (без учета больших пальцев)"""
-        hand_counts = {'left': 0, 'right': 0}
+        # Буквы слов (без односимвольных слов) отбираются векторно по кодам символов текста
+        layout = compile_layout(layout_map)
+        counts = layout.count_codes(long_word_code_chunks(text, WORD_LETTER_TABLE))
         
-        # Разбиваем текст на слова (только буквы)
-        words = re.findall(r'[а-яА-ЯёЁa-zA-Z]+', text)
-        
-        for word in words:
-            if len(word) < 2:  # Пропускаем односимвольные слова
-                continue
-            
-            for char in word:
-                if char.strip() and char != ' ':
-                    scancode = scancode_from_char(char, layout_map)
-                    if scancode and scancode != '39':  # Игнорируем пробел
-                        hand = self.get_hand_for_scancode(scancode)
-                        if hand in hand_counts:
-                            hand_counts[hand] += 1
+        return self._hand_balance_from_char_counts(layout, counts)
+    
+    def calculate_hand_balance_from_counts(self, word_char_counts: Dict[str, int], layout_map: Dict[str, Any]) -> Dict[str, Any]:
+        """Рассчитывает баланс между руками по количеству символов в словах"""
+        layout = compile_layout(layout_map)
+        counts = np.fromiter(
+            (word_char_counts.get(char, 0) for char in layout.chars), dtype=np.int64, count=len(layout.chars)
+        )
+        
+        return self._hand_balance_from_char_counts(layout, counts)
+    
+    def _hand_balance_from_char_counts(self, layout: CompiledLayout, counts: np.ndarray) -> Dict[str, Any]:
+        """Баланс рук по количествам символов раскладки (в порядке layout.chars)"""
+        # У пробела руки нет
+        handed = layout.hands >= 0
+        hand_counts = np.bincount(layout.hands[handed], weights=counts[handed], minlength=len(HANDS))
         
-        total = hand_counts['left'] + hand_counts['right']
+        return self.hand_balance_from_hand_counts(int(hand_counts[0]), int(hand_counts[1]))
+    
+    def hand_balance_from_hand_counts(self, left_count: int, right_count: int) -> Dict[str, Any]:
+        """Баланс рук по числу нажатий левой и правой рукой"""
+        total = left_count + right_count
         
         if total > 0:
-            left_percent = (hand_counts['left'] / total) * 100
-            right_percent = (hand_counts['right'] / total) * 100
+            left_percent = (left_count / total) * 100
+            right_percent = (right_count / total) * 100
             
             # Рассчитываем балл баланса (чем ближе к 50%, тем лучше)
             balance_score = 100 - abs(left_percent - 50) * 2
@@ -270,8 +305,8 @@ class LayoutData:
             is_good = 45 <= left_percent <= 55
             
             return {
-                'left_count': hand_counts['left'],
-                'right_count': hand_counts['right'],
+                'left_count': left_count,
+                'right_count': right_count,
                 'left_percent': left_percent,
                 'right_percent': right_percent,
                 'balance_score': balance_score,
@@ -296,20 +331,22 @@ class LayoutData:
             'one_hand_total': 0,
         }
         
+        char_keys = compile_layout(layout_map).char_keys
+        
         for combo, count in combos_dict.items():
             if len(combo) != 2:
                 continue
             
-            scancode1 = scancode_from_char(combo[0], layout_map)
-            scancode2 = scancode_from_char(combo[1], layout_map)
+            key1 = char_keys.get(combo[0])
+            key2 = char_keys.get(combo[1])
             
-            if scancode1 is None or scancode2 is None:
+            if key1 is None or key2 is None:
                 continue
             
-            hand1 = self.get_hand_for_scancode(scancode1)
-            hand2 = self.get_hand_for_scancode(scancode2)
+            hand1 = KEY_HAND_INDEX[key1]
+            hand2 = KEY_HAND_INDEX[key2]
             
-            if hand1 is None or hand2 is None:
+            if hand1 < 0 or hand2 < 0:
                 continue
             
             # Проверяем одноручность
@@ -318,280 +355,184 @@ class LayoutData:
         
         return results
     
-    # МЕТОДЫ СОЗДАНИЯ РАСКЛАДОК (ТОЛЬКО БУКВЫ И ЦИФРЫ)
+    def swap_scancodes(self, layout_map: Dict[str, Any], scancode1: str, scancode2: str) -> Dict[str, Any]:
+        """
+        Возвращает новую карту раскладки, в которой клавиши scancode1 и scancode2
+        поменялись местами (символы всех слоев переходят вместе с клавишей)
+        """
+        swap = {scancode1: scancode2, scancode2: scancode1}
+        swapped_map = {}
+        
+        for char, scancode_info in layout_map.items():
+            scancode = scancode_from_char(char, layout_map)
+            if scancode in swap:
+                if isinstance(scancode_info, dict):
+                    scancode_info = {**scancode_info, 'scancode': swap[scancode]}
+                elif isinstance(scancode_info, list):
+                    scancode_info = [swap[scancode]] + scancode_info[1:]
+                else:
+                    scancode_info = swap[scancode]
+            swapped_map[char] = scancode_info
+        
+        return CompiledLayout(swapped_map)
     
-    def create_icuken_layout_map(self) -> Dict[str, Any]:
-        """Создает карту раскладки ЙЦУКЕН (только буквы и цифры)"""
-        layout = {}
-        
-        # Русские буквы нижний регистр
-        ru_lower = {
-            'й': '10', 'ц': '11', 'у': '12', 'к': '13', 'е': '14',
-            'н': '15', 'г': '16', 'ш': '17', 'щ': '18', 'з': '19',
-            'х': '1A', 'ъ': '1B', 'ф': '1E', 'ы': '1F', 'в': '20',
-            'а': '21', 'п': '22', 'р': '23', 'о': '24', 'л': '25',
-            'д': '26', 'ж': '27', 'э': '28', 'я': '2C', 'ч': '2D',
-            'с': '2E', 'м': '2F', 'и': '30', 'т': '31', 'ь': '32',
-            'б': '33', 'ю': '34', 'ё': '29'
+    def score_swap(self, tables: Any, layout_stats: Dict[str, Any], layout_map: Dict[str, Any],
+                   scancode1: str, scancode2: str, penalty_calculator: Any) -> Dict[str, Any]:
+        """
+        Пересчитывает статистику раскладки после перестановки клавиш scancode1 и scancode2
+        tables - таблицы корпуса (CorpusTables), layout_stats - результат score_layout
+        для layout_map. Пересчитываются только униграммы и биграммы символов
+        на этих двух клавишах (метрики триграмм и потока нажатий - целиком); результат в формате layouts_stats
+        """
+        swap = {scancode1: scancode2, scancode2: scancode1}
+        
+        # Символы на переставляемых клавишах и их новые сканкоды
+        moved = {}
+        for char in layout_map:
+            scancode = scancode_from_char(char, layout_map)
+            if scancode in swap:
+                moved[char] = swap[scancode]
+        
+        def old_key(char: str) -> Optional[int]:
+            scancode = scancode_from_char(char, layout_map)
+            return key_index(scancode) if scancode is not None else None
+        
+        def new_key(char: str) -> Optional[int]:
+            if char in moved:
+                return key_index(moved[char])
+            return old_key(char)
+        
+        combo_dicts = {
+            'comfortable': defaultdict(int, layout_stats['comfort_combos']),
+            'partially_comfortable': defaultdict(int, layout_stats['partial_combos']),
+            'uncomfortable': defaultdict(int, layout_stats['uncomfortable_combos']),
         }
-        
-        # Добавляем русские буквы нижнего и верхнего регистра
-        for char_lower, scancode in ru_lower.items():
-            layout[char_lower] = {'scancode': scancode, 'modifiers': []}
-            layout[char_lower.upper()] = {'scancode': scancode, 'modifiers': ['shift']}
-        
-        # Цифры
-        digits = {
-            '1': '02', '2': '03', '3': '04', '4': '05', '5': '06',
-            '6': '07', '7': '08', '8': '09', '9': '0A', '0': '0B'
+        totals = {
+            'comfortable': layout_stats['total_comfort'],
+            'partially_comfortable': layout_stats['total_partial'],
+            'uncomfortable': layout_stats['total_uncomfortable'],
         }
+        combos_total = sum(len(combos) for combos in combo_dicts.values())
+        score_change = 0.0
+        one_hand_change = 0
         
-        for digit, scancode in digits.items():
-            layout[digit] = {'scancode': scancode, 'modifiers': []}
-        
-        # Пробел
-        layout[' '] = {'scancode': '39', 'modifiers': []}
+        # Биграммы, в которых участвует хотя бы один переставленный символ
+        for combo in tables.bigrams_with_chars(moved):
+            if ' ' in combo:
+                continue
+            
+            key1, key2 = old_key(combo[0]), old_key(combo[1])
+            if key1 is None or key2 is None:
+                continue
+            new_key1, new_key2 = new_key(combo[0]), new_key(combo[1])
+            count = tables.bigram_counts[combo]
+            
+            old_score, old_category = classify_key_pair(key1, key2)
+            new_score, new_category = classify_key_pair(new_key1, new_key2)
+            score_change += new_score - old_score
+            
+            if old_category != new_category:
+                combo_dicts[old_category].pop(combo, None)
+                combo_dicts[new_category][combo] = count
+                totals[old_category] -= count
+                totals[new_category] += count
+            
+            hand1, hand2 = KEY_HAND_INDEX[key1], KEY_HAND_INDEX[key2]
+            if hand1 >= 0 and hand1 == hand2:
+                one_hand_change -= count
+            hand1, hand2 = KEY_HAND_INDEX[new_key1], KEY_HAND_INDEX[new_key2]
+            if hand1 >= 0 and hand1 == hand2:
+                one_hand_change += count
+        
+        # Униграммы переставленных символов: штраф, нагрузка на пальцы, баланс рук
+        swapped_map = {char: layout_map[char] for char in moved}
+        swapped_map = self.swap_scancodes(swapped_map, scancode1, scancode2)
+        
+        finger_penalty = layout_stats['finger_penalty']
+        finger_load = defaultdict(int, layout_stats['finger_load'])
+        hand_balance = layout_stats['hand_balance']
+        left_count, right_count = hand_balance['left_count'], hand_balance['right_count']
+        
+        for char in moved:
+            count = tables.char_counts.get(char, 0)
+            if count and char.strip():
+                finger_penalty += count * (
+                    penalty_calculator.calculate_penalty_for_char(char, swapped_map)
+                    - penalty_calculator.calculate_penalty_for_char(char, layout_map)
+                )
+                
+                for key, sign in ((old_key(char), -1), (new_key(char), 1)):
+                    finger = KEY_FINGER_INDEX[key]
+                    if finger >= 0:
+                        finger_load[FINGER_ORDER[finger]] += sign * count
+                        if not finger_load[FINGER_ORDER[finger]]:
+                            del finger_load[FINGER_ORDER[finger]]
+            
+            count = tables.word_char_counts.get(char, 0)
+            if count:
+                for key, sign in ((old_key(char), -1), (new_key(char), 1)):
+                    hand = KEY_HAND_INDEX[key]
+                    if hand == HAND_INDEX['left']:
+                        left_count += sign * count
+                    elif hand == HAND_INDEX['right']:
+                        right_count += sign * count
+        
+        avg_dynamic_score = layout_stats['avg_dynamic_score']
+        if combos_total:
+            avg_dynamic_score += score_change / combos_total
+        
+        # Метрики триграмм и потока нажатий пересчитываются целиком: это векторные проходы
+        swapped_layout = self.swap_scancodes(layout_map, scancode1, scancode2)
         
-        return layout
+        return {
+            'comfort_combos': combo_dicts['comfortable'],
+            'partial_combos': combo_dicts['partially_comfortable'],
+            'uncomfortable_combos': combo_dicts['uncomfortable'],
+            'total_comfort': totals['comfortable'],
+            'total_partial': totals['partially_comfortable'],
+            'total_uncomfortable': totals['uncomfortable'],
+            'two_char_analysis': {
+                **layout_stats['two_char_analysis'],
+                'one_hand_total': layout_stats['two_char_analysis']['one_hand_total'] + one_hand_change
+            },
+            'finger_load': finger_load,
+            'finger_penalty': finger_penalty,
+            'hand_balance': self.hand_balance_from_hand_counts(left_count, right_count),
+            'avg_dynamic_score': avg_dynamic_score,
+            'trigram_analysis': self.calculate_trigram_metrics_from_arrays(tables.trigram_arrays(), swapped_layout),
+            'keystroke_analysis': tables.keystroke_analysis(swapped_layout)
+        }
+    
+    # МЕТОДЫ СОЗДАНИЯ РАСКЛАДОК (ТОЛЬКО БУКВЫ И ЦИФРЫ)
+    
+    def create_icuken_layout_map(self) -> CompiledLayout:
+        """Создает карту раскладки ЙЦУКЕН (только буквы и цифры)"""
+        return CompiledLayout(builtin_layout_map('ЙЦУКЕН'))
     
-    def create_scoropis_layout_map(self) -> Dict[str, Any]:
+    def create_scoropis_layout_map(self) -> CompiledLayout:
         """Создает карту раскладки Скоропись (только буквы и цифры)"""
-        layout = {}
-        
-        # Русские буквы Скоропись
-        scoropis_lower = {
-            'ц': '10', 'у': '11', 'а': '12', 'о': '13', 'в': '14',
-            'п': '15', 'р': '16', 'л': '17', 'д': '18', 'ж': '19', 'э': '1A',
-            'й': '1E', 'к': '1F', 'е': '20', 'н': '21', 'г': '22',
-            'ш': '23', 'з': '24', 'х': '25', 'ъ': '26', 'ф': '27', 'ы': '28',
-            'я': '2C', 'ч': '2D', 'с': '2E', 'м': '2F', 'и': '30',
-            'т': '31', 'ь': '32', 'б': '33', 'ю': '34', 'ё': '35'
-        }
-        
-        # Добавляем русские буквы
-        for char_lower, scancode in scoropis_lower.items():
-            layout[char_lower] = {'scancode': scancode, 'modifiers': []}
-            layout[char_lower.upper()] = {'scancode': scancode, 'modifiers': ['shift']}
-        
-        # Цифры
-        digits = {
-            '1': '02', '2': '03', '3': '04', '4': '05', '5': '06',
-            '6': '07', '7': '08', '8': '09', '9': '0A', '0': '0B'
-        }
-        
-        for digit, scancode in digits.items():
-            layout[digit] = {'scancode': scancode, 'modifiers': []}
-        
-        # Пробел
-        layout[' '] = {'scancode': '39', 'modifiers': []}
-        
-        return layout
+        return CompiledLayout(builtin_layout_map('Скоропись'))
     
-    def create_phonetic_vert_layout_map(self) -> Dict[str, Any]:
+    def create_phonetic_vert_layout_map(self) -> CompiledLayout:
         """Создает карту фонетической раскладки яВерт (только буквы и цифры)"""
-        layout = {}
-        
-        # Русские буквы Фонетическая яВерт
-        phonetic_lower = {
-            'я': '10', 'в': '11', 'е': '12', 'р': '13', 'т': '14',
-            'ы': '15', 'у': '16', 'и': '17', 'о': '18', 'п': '19',
-            'а': '1E', 'с': '1F', 'д': '20', 'ф': '21', 'г': '22',
-            'х': '23', 'й': '24', 'к': '25', 'л': '26',
-            'з': '2C', 'ь': '2D', 'ц': '2E', 'ж': '2F', 'б': '30',
-            'н': '31', 'м': '32', 'ш': '33', 'щ': '34', 'ч': '35'
-        }
-        
-        # Добавляем русские буквы
-        for char_lower, scancode in phonetic_lower.items():
-            layout[char_lower] = {'scancode': scancode, 'modifiers': []}
-            layout[char_lower.upper()] = {'scancode': scancode, 'modifiers': ['shift']}
-        
-        # Добавляем недостающие буквы
-        layout['э'] = {'scancode': '28', 'modifiers': []}
-        layout['Э'] = {'scancode': '28', 'modifiers': ['shift']}
-        layout['ъ'] = {'scancode': '29', 'modifiers': []}
-        layout['Ъ'] = {'scancode': '29', 'modifiers': ['shift']}
-        layout['ё'] = {'scancode': '35', 'modifiers': []}
-        layout['Ё'] = {'scancode': '35', 'modifiers': ['shift']}
-        
-        # Цифры
-        digits = {
-            '1': '02', '2': '03', '3': '04', '4': '05', '5': '06',
-            '6': '07', '7': '08', '8': '09', '9': '0A', '0': '0B'
-        }
-        
-        for digit, scancode in digits.items():
-            layout[digit] = {'scancode': scancode, 'modifiers': []}
-        
-        # Пробел
-        layout[' '] = {'scancode': '39', 'modifiers': []}
-        
-        return layout
+        return CompiledLayout(builtin_layout_map('Фонетическая (яВерт)'))
     
-    def create_diktor_layout_map(self) -> Dict[str, Any]:
+    def create_diktor_layout_map(self) -> CompiledLayout:
         """Создает карту раскладки Диктор"""
-        layout = {}
-        
-        # Русские буквы Диктор
-        diktor_lower = {
-            'н': '10', 'т': '11', 'с': '12', 'р': '13', 'в': '14',
-            'м': '15', 'д': '16', 'п': '17', 'л': '18', 'г': '19',
-            'б': '1A', 'ь': '1B', 'о': '1E', 'а': '1F', 'е': '20',
-            'и': '21', 'у': '22', 'к': '23', 'я': '24', 'ы': '25',
-            'з': '26', 'ж': '27', 'э': '28', 'й': '2C', 'ч': '2D',
-            'х': '2E', 'ц': '2F', 'ф': '30', 'ш': '31', 'щ': '32',
-            'ю': '33', 'ъ': '34', 'ё': '35'
-        }
-        
-        # Добавляем русские буквы
-        for char_lower, scancode in diktor_lower.items():
-            layout[char_lower] = {'scancode': scancode, 'modifiers': []}
-            layout[char_lower.upper()] = {'scancode': scancode, 'modifiers': ['shift']}
-        
-        # Цифры
-        digits = {
-            '1': '02', '2': '03', '3': '04', '4': '05', '5': '06',
-            '6': '07', '7': '08', '8': '09', '9': '0A', '0': '0B'
-        }
-        
-        for digit, scancode in digits.items():
-            layout[digit] = {'scancode': scancode, 'modifiers': []}
-        
-        # Пробел
-        layout[' '] = {'scancode': '39', 'modifiers': []}
-        
-        return layout
+        return CompiledLayout(builtin_layout_map('Диктор'))
     
-    def create_qwerty_layout_map(self) -> Dict[str, Any]:
+    def create_qwerty_layout_map(self) -> CompiledLayout:
         """Создает карту раскладки QWERTY (только буквы и цифры)"""
-        layout = {}
-        
-        # Английские буквы
-        en_lower = {
-            'q': '10', 'w': '11', 'e': '12', 'r': '13', 't': '14',
-            'y': '15', 'u': '16', 'i': '17', 'o': '18', 'p': '19',
-            'a': '1E', 's': '1F', 'd': '20', 'f': '21', 'g': '22',
-            'h': '23', 'j': '24', 'k': '25', 'l': '26',
-            'z': '2C', 'x': '2D', 'c': '2E', 'v': '2F', 'b': '30',
-            'n': '31', 'm': '32'
-        }
-        
-        # Добавляем английские буквы
-        for char_lower, scancode in en_lower.items():
-            layout[char_lower] = {'scancode': scancode, 'modifiers': []}
-            layout[char_lower.upper()] = {'scancode': scancode, 'modifiers': ['shift']}
-        
-        # Цифры
-        digits = {
-            '1': '02', '2': '03', '3': '04', '4': '05', '5': '06',
-            '6': '07', '7': '08', '8': '09', '9': '0A', '0': '0B'
-        }
-        
-        for digit, scancode in digits.items():
-            layout[digit] = {'scancode': scancode, 'modifiers': []}
-        
-        # Пробел
-        layout[' '] = {'scancode': '39', 'modifiers': []}
-        
-        return layout
+        return CompiledLayout(builtin_layout_map('QWERTY'))
     
-    def create_dvorak_layout_map(self) -> Dict[str, Any]:
+    def create_dvorak_layout_map(self) -> CompiledLayout:
         """Создает карту раскладки Dvorak (только буквы и цифры)"""
-        layout = {}
-        
-        # Dvorak буквы (только буквы)
-        dvorak_lower_letters = {
-            'p': '10', 'y': '11', 'f': '12', 'g': '13', 'c': '14',
-            'r': '15', 'l': '16', 'a': '1E', 'o': '1F', 'e': '20',
-            'u': '21', 'i': '22', 'd': '23', 'h': '24', 't': '25',
-            'n': '26', 's': '27', 'q': '2C', 'j': '2D', 'k': '2E',
-            'x': '2F', 'b': '30', 'm': '31', 'w': '32', 'v': '33',
-            'z': '34'
-        }
-        
-        # Добавляем Dvorak буквы
-        for char_lower, scancode in dvorak_lower_letters.items():
-            layout[char_lower] = {'scancode': scancode, 'modifiers': []}
-            layout[char_lower.upper()] = {'scancode': scancode, 'modifiers': ['shift']}
-        
-        # Цифры
-        digits = {
-            '1': '02', '2': '03', '3': '04', '4': '05', '5': '06',
-            '6': '07', '7': '08', '8': '09', '9': '0A', '0': '0B'
-        }
-        
-        for digit, scancode in digits.items():
-            layout[digit] = {'scancode': scancode, 'modifiers': []}
-        
-        # Пробел
-        layout[' '] = {'scancode': '39', 'modifiers': []}
-        
-        return layout
+        return CompiledLayout(builtin_layout_map('Dvorak'))
     
-    def create_colemak_layout_map(self) -> Dict[str, Any]:
+    def create_colemak_layout_map(self) -> CompiledLayout:
         """Создает карту раскладки Colemak (только буквы и цифры)"""
-        layout = {}
-        
-        # Colemak буквы
-        colemak_lower = {
-            'q': '10', 'w': '11', 'f': '12', 'p': '13', 'g': '14',
-            'j': '15', 'l': '16', 'u': '17', 'y': '18', 'a': '1E',
-            'r': '1F', 's': '20', 't': '21', 'd': '22', 'h': '23',
-            'n': '24', 'e': '25', 'i': '26', 'o': '27', 'z': '2C',
-            'x': '2D', 'c': '2E', 'v': '2F', 'b': '30', 'k': '31',
-            'm': '32'
-        }
-        
-        # Добавляем Colemak буквы
-        for char_lower, scancode in colemak_lower.items():
-            if char_lower.isalpha():
-                layout[char_lower] = {'scancode': scancode, 'modifiers': []}
-                layout[char_lower.upper()] = {'scancode': scancode, 'modifiers': ['shift']}
-        
-        # Цифры
-        digits = {
-            '1': '02', '2': '03', '3': '04', '4': '05', '5': '06',
-            '6': '07', '7': '08', '8': '09', '9': '0A', '0': '0B'
-        }
-        
-        for digit, scancode in digits.items():
-            layout[digit] = {'scancode': scancode, 'modifiers': []}
-        
-        # Пробел
-        layout[' '] = {'scancode': '39', 'modifiers': []}
-        
-        return layout
+        return CompiledLayout(builtin_layout_map('Colemak'))
     
-    def create_workman_layout_map(self) -> Dict[str, Any]:
+    def create_workman_layout_map(self) -> CompiledLayout:
         """Создает карту раскладки Workman (только буквы и цифры)"""
-        layout = {}
-        
-        # Workman буквы
-        workman_lower = {
-            'q': '10', 'd': '11', 'r': '12', 'w': '13', 'b': '14',
-            'j': '15', 'f': '16', 'u': '17', 'p': '18', 'a': '1E',
-            's': '1F', 'h': '20', 't': '21', 'g': '22', 'y': '23',
-            'n': '24', 'e': '25', 'o': '26', 'i': '27', 'z': '2C',
-            'x': '2D', 'm': '2E', 'c': '2F', 'v': '30', 'k': '31',
-            'l': '32'
-        }
-        
-        # Добавляем Workman буквы
-        for char_lower, scancode in workman_lower.items():
-            if char_lower.isalpha():
-                layout[char_lower] = {'scancode': scancode, 'modifiers': []}
-                layout[char_lower.upper()] = {'scancode': scancode, 'modifiers': ['shift']}
-        
-        # Цифры
-        digits = {
-            '1': '02', '2': '03', '3': '04', '4': '05', '5': '06',
-            '6': '07', '7': '08', '8': '09', '9': '0A', '0': '0B'
-        }
-        
-        for digit, scancode in digits.items():
-            layout[digit] = {'scancode': scancode, 'modifiers': []}
-        
-        # Пробел
-        layout[' '] = {'scancode': '39', 'modifiers': []}
-        
-        return layout
\ No newline at end of file
+        return CompiledLayout(builtin_layout_map('Workman'))
@@ -0,0 +1,361 @@
+"""
+Загрузка раскладок из JSON (формат ready_made_layouts) в карты раскладок
+
+Папка раскладок загружается пулом потоков (или процессов): каждый файл
+читается, проверяется и разбирается в карту независимо. Разобранные карты
+хранятся в LayoutFileCache под путем файла; запись действительна, пока
+не изменились размер и время изменения файла, а если изменились - пока
+совпадает хэш содержимого. Компилируются карты при первом обращении
+(см. LazyLayoutMaps).
+"""
+
+import glob
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+
+from layouts.compiled_layout import CompiledLayout
+from layouts.key_tables import FINGER_BY_SCANCODE, JSON_LAYOUT_SCANCODES, SPACE_SCANCODE
+
+
+DEFAULT_LAYOUTS_FOLDER = 'ready_made_layouts'
+
+
+def penalty_for_scancode(scancode: str, modifiers: List[str]) -> float:
+    '''
+    Штраф варианта набора символа: клавиша и модификаторы
+    Используется для выбора слоя, если символ есть на нескольких клавишах
+    '''
+    if not scancode:
+        return 9999.0  # Большой штраф для невалидного сканкода
+
+    return _variant_penalty(scancode, 'shift' in modifiers, 'alt' in modifiers)
+
+
+@lru_cache(maxsize=None)
+def _variant_penalty(scancode: str, shift: bool, alt: bool) -> float:
+    '''Штраф клавиши с модификаторами (вариантов немного, поэтому запоминается)'''
+    # Базовая логика расчета штрафа
+    penalty = 0.0
+
+    # Расчет штрафа за модификаторы
+    if shift:
+        # Штраф за Shift зависит от пальца
+        finger = FINGER_BY_SCANCODE.get(scancode)
+        if finger in ['left_pinky', 'right_pinky']:
+            penalty += 3.0  # Shift penalty
+        else:
+            penalty += 1.5
+
+    if alt:
+        # Небольшой штраф за Alt
+        penalty += 0.5
+
+    # Штраф за расстояние от домашнего ряда (упрощенный)
+    # Можно добавить более сложную логику при необходимости
+
+    return penalty
+
+
+def add_char_to_layout(layout_map: Dict[str, Any], char: str, scancode: str, base_modifiers: List[str]) -> None:
+    '''
+    Добавляет символ в карту раскладки, выбирая вариант с наименьшим штрафом
+    '''
+    # Вычисляем штраф для этого варианта
+    penalty = penalty_for_scancode(scancode, base_modifiers)
+
+    # Проверяем, есть ли уже этот символ в карте
+    if char in layout_map:
+        existing_entry = layout_map[char]
+        existing_scancode = existing_entry.get('scancode')
+        existing_modifiers = existing_entry.get('modifiers', [])
+
+        # Вычисляем штраф для существующего варианта
+        existing_penalty = penalty_for_scancode(existing_scancode, existing_modifiers)
+
+        # Выбираем вариант с наименьшим штрафом
+        if penalty < existing_penalty:
+            layout_map[char] = {'scancode': scancode, 'modifiers': base_modifiers.copy()}
+
+            # Также добавляем вариант с Shift, если это буква
+            if char.isalpha() and char.islower():
+                upper_char = char.upper()
+                if upper_char not in layout_map or penalty < penalty_for_scancode(
+                    layout_map[upper_char].get('scancode'), layout_map[upper_char].get('modifiers', [])
+                ):
+                    layout_map[upper_char] = {'scancode': scancode, 'modifiers': base_modifiers + ['shift']}
+
+    else:
+        # Добавляем новый символ
+        layout_map[char] = {'scancode': scancode, 'modifiers': base_modifiers.copy()}
+
+        # Также добавляем вариант с Shift, если это буква
+        if char.isalpha() and char.islower():
+            layout_map[char.upper()] = {'scancode': scancode, 'modifiers': base_modifiers + ['shift']}
+        elif char.isalpha() and char.isupper():
+            layout_map[char.lower()] = {'scancode': scancode, 'modifiers': base_modifiers}
+
+
+def layout_map_from_data(layout_data: Dict[str, Any]) -> CompiledLayout:
+    '''
+    Создает карту раскладки из данных JSON (только буквы и цифры)
+    с учетом второго слоя через LAlt
+    '''
+    return CompiledLayout(build_layout_map(layout_data))
+
+
+def build_layout_map(layout_data: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    Получает: данные раскладки JSON
+    Возвращает: карту раскладки обычным словарем (без компиляции)
+    '''
+    layout_map = {}
+
+    # Собираем все символы из раскладки
+    if 'layout' in layout_data:
+        # Цифровой, верхний, домашний и нижний ряды, затем LAlt
+        scancodes = JSON_LAYOUT_SCANCODES
+
+        scancode_idx = 0
+
+        for row in layout_data['layout']:
+            for cell in row:
+                if cell == '':
+                    # Пустой слот: клавиша без символа
+                    scancode_idx += 1
+                elif cell.strip():
+                    if scancode_idx < len(scancodes):
+                        scancode = scancodes[scancode_idx]
+                        scancode_idx += 1
+
+                        # Обрабатываем клетки с двумя символами через "/"
+                        if '/' in cell:
+                            parts = cell.split('/')
+                            if len(parts) >= 2:
+                                # Первый символ - основной (без модификаторов)
+                                primary_char = parts[0].strip()
+                                # Второй символ - с Alt
+                                alt_char = parts[1].strip() if len(parts) > 1 else ''
+
+                                # Добавляем основной символ (если еще не добавлен)
+                                if primary_char and len(primary_char) == 1:
+                                    add_char_to_layout(layout_map, primary_char, scancode, [])
+
+                                # Добавляем Alt-символ (если еще не добавлен)
+                                if alt_char and len(alt_char) == 1:
+                                    add_char_to_layout(layout_map, alt_char, scancode, ['alt'])
+                        else:
+                            # Одиночный символ
+                            char = cell.strip()
+                            if len(char) == 1:
+                                add_char_to_layout(layout_map, char, scancode, [])
+
+    # Добавляем пробел
+    layout_map[' '] = {'scancode': SPACE_SCANCODE, 'modifiers': []}
+
+    return layout_map
+
+
+def is_layout_data(layout_data: Any) -> bool:
+    '''
+    Получает: разобранное содержимое JSON файла
+    Возвращает: True, если это объект раскладки с рядами в поле layout
+    '''
+    return isinstance(layout_data, dict) and isinstance(layout_data.get('layout'), list)
+
+
+def read_layout_file(layout_file: str) -> Optional[Dict[str, Any]]:
+    '''
+    Читает JSON файл раскладки
+    Возвращает данные раскладки (имя по умолчанию - имя файла) или None при ошибке
+    '''
+    try:
+        with open(layout_file, 'r', encoding='utf-8') as f:
+            layout_data = json.load(f)
+    except FileNotFoundError:
+        print(f"Файл {layout_file} не найден")
+        return None
+    except OSError as e:
+        print(f"Ошибка чтения файла {layout_file}: {e}")
+        return None
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        print(f"Ошибка чтения JSON файла {layout_file}")
+        return None
+
+    if not is_layout_data(layout_data):
+        print(f"Неверный формат раскладки в файле {layout_file}: нужен объект с полем layout (список рядов)")
+        return None
+
+    layout_data.setdefault('name', os.path.basename(layout_file).replace('.json', ''))
+    return layout_data
+
+
+def layout_files_in_folder(folder_path: str = DEFAULT_LAYOUTS_FOLDER) -> List[str]:
+    '''
+    Все .json файлы раскладок в папке (в алфавитном порядке)
+    '''
+    return sorted(glob.glob(os.path.join(folder_path, '*.json')))
+
+
+def _content_hash(content: bytes) -> str:
+    '''Хэш содержимого файла раскладки (BLAKE2b)'''
+    return hashlib.blake2b(content, digest_size=20).hexdigest()
+
+
+def _parse_layout_file(layout_file: str) -> Optional[Dict[str, Any]]:
+    '''
+    Получает: путь к файлу раскладки
+    Возвращает: запись кэша (размер, время изменения, хэш, данные и карта раскладки)
+    или None при ошибке; выполняется в пуле потоков или процессов
+    '''
+    try:
+        file_stat = os.stat(layout_file)
+        with open(layout_file, 'rb') as f:
+            content = f.read()
+    except FileNotFoundError:
+        print(f"Файл {layout_file} не найден")
+        return None
+    except OSError as e:
+        print(f"Ошибка чтения файла {layout_file}: {e}")
+        return None
+
+    try:
+        layout_data = json.loads(content.decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        print(f"Ошибка чтения JSON файла {layout_file}")
+        return None
+
+    if not is_layout_data(layout_data):
+        print(f"Неверный формат раскладки в файле {layout_file}: нужен объект с полем layout (список рядов)")
+        return None
+
+    try:
+        layout_map = build_layout_map(layout_data)
+    except Exception as e:
+        print(f"Ошибка при загрузке {layout_file}: {e}")
+        return None
+
+    return {
+        'size': file_stat.st_size,
+        'mtime_ns': file_stat.st_mtime_ns,
+        'hash': _content_hash(content),
+        'layout_data': layout_data,
+        'layout_map': layout_map,
+    }
+
+
+class LayoutFileCache:
+    """
+    Кэш разобранных файлов раскладок в памяти
+    Запись файла действительна, пока не изменились его размер и время изменения;
+    если они изменились, содержимое хэшируется и запись используется при совпадении хэша
+    """
+
+    def __init__(self):
+        # Абсолютный путь -> (размер, время изменения (нс), хэш)
+        self.files = {}
+        # Хэш содержимого -> {'layout_data': ..., 'layout_map': ...}
+        self.layouts = {}
+
+    def get(self, layout_file: str) -> Optional[Dict[str, Any]]:
+        """Запись кэша для файла ({'layout_data', 'layout_map'}) или None, если файл изменился"""
+        path = os.path.abspath(layout_file)
+        known = self.files.get(path)
+        if known is None:
+            return None
+
+        try:
+            file_stat = os.stat(path)
+        except OSError:
+            return None
+
+        if known[0] == file_stat.st_size and known[1] == file_stat.st_mtime_ns:
+            return self.layouts.get(known[2])
+
+        # Время изменения другое: запись годится, если содержимое то же
+        try:
+            with open(path, 'rb') as f:
+                content_hash = _content_hash(f.read())
+        except OSError:
+            return None
+
+        entry = self.layouts.get(content_hash)
+        if entry is not None:
+            self.files[path] = (file_stat.st_size, file_stat.st_mtime_ns, content_hash)
+        return entry
+
+    def put(self, layout_file: str, entry: Dict[str, Any]) -> None:
+        """Запоминает разобранный файл (запись из _parse_layout_file)"""
+        path = os.path.abspath(layout_file)
+        previous = self.files.get(path)
+        self.files[path] = (entry['size'], entry['mtime_ns'], entry['hash'])
+        self.layouts[entry['hash']] = {'layout_data': entry['layout_data'], 'layout_map': entry['layout_map']}
+
+        # Прежнее содержимое файла больше не нужно, если на него не ссылаются другие файлы
+        if previous and previous[2] != entry['hash'] and all(
+            known[2] != previous[2] for known in self.files.values()
+        ):
+            self.layouts.pop(previous[2], None)
+
+    def clear(self) -> None:
+        """Забывает все файлы"""
+        self.files.clear()
+        self.layouts.clear()
+
+
+# С какого числа неразобранных файлов пул процессов выгоднее пула потоков
+# (разбор JSON и построение карты держат GIL, но запуск процессов дорог)
+PROCESS_POOL_MIN_FILES = 256
+
+
+def load_layout_files(layout_files: List[str], cache: LayoutFileCache = None, workers: int = None,
+                      use_processes: bool = None) -> List[Tuple[str, Dict[str, Any], Dict[str, Any]]]:
+    '''
+    Получает: файлы раскладок, кэш разобранных файлов, число потоков (процессов) пула
+    (None - по числу ядер), признак пула процессов (None - выбрать по числу файлов)
+    Возвращает: (файл, данные раскладки, карта раскладки обычным словарем) в порядке файлов;
+    файлы с ошибками пропускаются
+    Файлы, которых нет в кэше, читаются и разбираются параллельно
+    '''
+    entries = {}
+    missing = []
+    for layout_file in layout_files:
+        entry = cache.get(layout_file) if cache is not None else None
+        if entry is None:
+            missing.append(layout_file)
+        else:
+            entries[layout_file] = entry
+
+    workers = workers or os.cpu_count() or 1
+    if len(missing) > 1 and workers > 1:
+        if use_processes is None:
+            use_processes = len(missing) >= PROCESS_POOL_MIN_FILES
+        if use_processes:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                parsed = list(executor.map(_parse_layout_file, missing,
+                                           chunksize=max(1, len(missing) // (workers * 4))))
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                parsed = list(executor.map(_parse_layout_file, missing))
+    else:
+        parsed = [_parse_layout_file(layout_file) for layout_file in missing]
+
+    for layout_file, entry in zip(missing, parsed):
+        if entry is not None:
+            entries[layout_file] = entry
+            if cache is not None:
+                cache.put(layout_file, entry)
+
+    loaded = []
+    for layout_file in layout_files:
+        entry = entries.get(layout_file)
+        if entry is not None:
+            # Имя по умолчанию - имя файла (как в read_layout_file)
+            layout_data = dict(entry['layout_data'])
+            layout_data.setdefault('name', os.path.basename(layout_file).replace('.json', ''))
+            loaded.append((layout_file, layout_data, entry['layout_map']))
+
+    return loaded
@@ -1,4 +1,150 @@
+"""
+Встроенные раскладки: единственный источник рядов и карт
+
+Каждая раскладка задана рядами символов (цифровой, верхний, домашний и нижний
+ряды; i-й символ ряда стоит на i-й клавише ряда из LAYOUT_ROW_SCANCODES).
+extra_keys - буквы на клавишах, которых нет в рядах (или которые уже заняты
+другой буквой). Ряды показываются в меню, карта раскладки строится из них
+только при первом обращении (см. LayoutData.layout_maps).
+"""
+
 from typing import Dict, Any
 
-# Это файл можно оставить пустым или переместить сюда функции create_*_layout_map
-# из класса LayoutData для лучшей организации
\ No newline at end of file
+from layouts.key_tables import LAYOUT_ROW_SCANCODES, SPACE_SCANCODE
+
+
+DIGITS_ROW = ["1", "2", "3", "4", "5", "6", "7", "8", "9", "0"]
+
+# ТОЛЬКО ЦИФРЫ И БУКВЫ
+BUILTIN_LAYOUTS = {
+    # ЙЦУКЕН (стандартная русская)
+    'ЙЦУКЕН': {
+        'language': 'russian',
+        'layout': [
+            DIGITS_ROW,
+            ["й", "ц", "у", "к", "е", "н", "г", "ш", "щ", "з", "х", "ъ"],
+            ["ф", "ы", "в", "а", "п", "р", "о", "л", "д", "ж", "э"],
+            ["я", "ч", "с", "м", "и", "т", "ь", "б", "ю"]
+        ],
+        'extra_keys': {'ё': '29'},
+    },
+    # Скоропись (русская эргономичная)
+    'Скоропись': {
+        'language': 'russian',
+        'layout': [
+            DIGITS_ROW,
+            ["ц", "у", "а", "о", "в", "п", "р", "л", "д", "ж", "э"],
+            ["й", "к", "е", "н", "г", "ш", "з", "х", "ъ", "ф", "ы"],
+            ["я", "ч", "с", "м", "и", "т", "ь", "б", "ю"]
+        ],
+        'extra_keys': {'ё': '35'},
+    },
+    # Фонетическая (яВерт)
+    'Фонетическая (яВерт)': {
+        'language': 'russian',
+        'layout': [
+            DIGITS_ROW,
+            ["я", "в", "е", "р", "т", "ы", "у", "и", "о", "п"],
+            ["а", "с", "д", "ф", "г", "х", "й", "к", "л"],
+            ["з", "ь", "ц", "ж", "б", "н", "м", "ш", "щ", "ч"]
+        ],
+        'extra_keys': {'э': '28', 'ъ': '29', 'ё': '35'},
+    },
+    # Диктор (русская эргономичная для диктовки)
+    'Диктор': {
+        'language': 'russian',
+        'layout': [
+            DIGITS_ROW,
+            ["н", "т", "с", "р", "в", "м", "д", "п", "л", "г", "б", "ь"],
+            ["о", "а", "е", "и", "у", "к", "я", "ы", "з", "ж", "э"],
+            ["й", "ч", "х", "ц", "ф", "ш", "щ", "ю"]
+        ],
+        'extra_keys': {'ъ': '34', 'ё': '35'},
+    },
+    # QWERTY (английская)
+    'QWERTY': {
+        'language': 'english',
+        'layout': [
+            DIGITS_ROW,
+            ["q", "w", "e", "r", "t", "y", "u", "i", "o", "p"],
+            ["a", "s", "d", "f", "g", "h", "j", "k", "l"],
+            ["z", "x", "c", "v", "b", "n", "m"]
+        ],
+    },
+    # Dvorak (эргономичная английская)
+    'Dvorak': {
+        'language': 'english',
+        'layout': [
+            DIGITS_ROW,
+            ["p", "y", "f", "g", "c", "r", "l"],
+            ["a", "o", "e", "u", "i", "d", "h", "t", "n", "s"],
+            ["q", "j", "k", "x", "b", "m", "w", "v", "z"]
+        ],
+    },
+    # Colemak (эргономичная английская)
+    'Colemak': {
+        'language': 'english',
+        'layout': [
+            DIGITS_ROW,
+            ["q", "w", "f", "p", "g", "j", "l", "u", "y"],
+            ["a", "r", "s", "t", "d", "h", "n", "e", "i", "o"],
+            ["z", "x", "c", "v", "b", "k", "m"]
+        ],
+    },
+    # Workman (эргономичная английская)
+    'Workman': {
+        'language': 'english',
+        'layout': [
+            DIGITS_ROW,
+            ["q", "d", "r", "w", "b", "j", "f", "u", "p"],
+            ["a", "s", "h", "t", "g", "y", "n", "e", "o", "i"],
+            ["z", "x", "m", "c", "v", "k", "l"]
+        ],
+    },
+}
+
+# Языки встроенных раскладок
+BUILTIN_LAYOUT_LANGUAGES = {layout_name: layout['language'] for layout_name, layout in BUILTIN_LAYOUTS.items()}
+
+
+def builtin_layout_data(layout_name: str) -> Dict[str, Any]:
+    '''
+    Получает: имя встроенной раскладки
+    Возвращает: данные раскладки в формате JSON раскладок (имя, язык, ряды)
+    '''
+    layout = BUILTIN_LAYOUTS[layout_name]
+    return {
+        'name': layout_name,
+        'language': layout['language'],
+        'layout': [list(row) for row in layout['layout']],
+    }
+
+
+def builtin_layout_map(layout_name: str) -> Dict[str, Any]:
+    '''
+    Получает: имя встроенной раскладки
+    Возвращает: карту раскладки (только буквы и цифры): буквы рядов и extra_keys
+    без модификаторов и заглавными на Shift, затем цифры и пробел
+    '''
+    layout = BUILTIN_LAYOUTS[layout_name]
+    digits_row, *letter_rows = layout['layout']
+    layout_map = {}
+
+    letters = [
+        (char, scancode)
+        for row, scancodes in zip(letter_rows, LAYOUT_ROW_SCANCODES[1:])
+        for char, scancode in zip(row, scancodes) if char
+    ]
+    letters.extend(layout.get('extra_keys', {}).items())
+
+    for char_lower, scancode in letters:
+        layout_map[char_lower] = {'scancode': scancode, 'modifiers': []}
+        layout_map[char_lower.upper()] = {'scancode': scancode, 'modifiers': ['shift']}
+
+    for digit, scancode in zip(digits_row, LAYOUT_ROW_SCANCODES[0]):
+        layout_map[digit] = {'scancode': scancode, 'modifiers': []}
+
+    # Пробел
+    layout_map[' '] = {'scancode': SPACE_SCANCODE, 'modifiers': []}
+
+    return layout_map
@@ -1,4 +1,3 @@
-import matplotlib.pyplot as plt
 from analysis.layout_evaluator import LayoutEvaluator
 
 
@@ -16,9 +15,11 @@ def main():
         print("4. Анализировать конкретный текстовый файл")
         print("5. Показать результаты последнего анализа")
         print("6. Обновить раскладки из папки ready_made_layouts")
-        print("7. Выход")
+        print("7. Оптимизировать раскладку")
+        print("8. Худшие комбинации раскладок")
+        print("9. Выход")
         
-        choice = input("\nВыберите действие (1-7): ").strip()
+        choice = input("\nВыберите действие (1-9): ").strip()
         
         if choice == '1':
             evaluator.show_all_layouts()
@@ -57,6 +58,16 @@ def main():
             print("Раскладки обновлены из папки ready_made_layouts")
             
         elif choice == '7':
+            layout_name = input("Введите имя исходной раскладки: ").strip()
+            text_file = input("Введите имя файла с текстом (Enter - по умолчанию): ").strip()
+            if layout_name:
+                evaluator.optimize_layout(layout_name, text_file or None)
+            
+        elif choice == '8':
+            text_file = input("Введите имя файла с текстом (Enter - по умолчанию): ").strip()
+            evaluator.report_worst_combos(text_file or None)
+            
+        elif choice == '9':
             print("Выход из программы.")
             break
             
@@ -65,11 +76,5 @@ def main():
 
 
 if __name__ == "__main__":
-    # Устанавливаем Nerd Fonts для графиков
-    try:
-        plt.rcParams['font.family'] = ['DejaVu Sans Mono', 'monospace']
-        plt.rcParams['axes.unicode_minus'] = False
-    except:
-        pass
-    
+    # Шрифты для графиков настраиваются в visualization.charts при первом построении графика
     main()
\ No newline at end of file
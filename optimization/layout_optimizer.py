@@ -0,0 +1,119 @@
+"""
+Поиск раскладки с лучшей оценкой методом имитации отжига
+"""
+
+import json
+import math
+import os
+import random
+import re
+from typing import Dict, Any, List
+
+from analysis.evaluation_engine import CorpusTables
+from analysis.finger_penalty_calculator import FingerPenaltyCalculator
+from layouts.key_tables import LAYOUT_ROW_SCANCODES
+from optimization.swap_scorer import SwapScorer
+
+
+class LayoutOptimizer:
+    """
+    Оптимизатор раскладки: переставляет буквы исходной раскладки между клавишами,
+    максимизируя взвешенную сумму критериев сравнения (удобство, штраф,
+    равномерность, баланс). Каждый кандидат оценивается инкрементально.
+    """
+
+    def __init__(self, tables: CorpusTables, base_layout_map: Dict[str, Any],
+                 penalty_calculator: FingerPenaltyCalculator = None, weights: Dict[str, float] = None):
+        self.scorer = SwapScorer(tables, base_layout_map, penalty_calculator, weights)
+        self.initial_metrics = self.scorer.metrics()
+
+    def simulated_annealing(self, iterations: int = 200000, start_temperature: float = 2.0,
+                            end_temperature: float = 0.005, seed: int = None) -> Dict[str, float]:
+        """
+        Имитация отжига: случайная перестановка двух букв принимается, если она
+        улучшает оценку, или с вероятностью exp(дельта / температура)
+        В конце восстанавливается лучшая найденная раскладка
+        Возвращает ее критерии
+        """
+        scorer = self.scorer
+        rng = random.Random(seed)
+        movable = scorer.movable_indices
+
+        if len(movable) < 2 or iterations <= 0:
+            return scorer.metrics()
+
+        best_objective = scorer.objective
+        best_positions = scorer.positions.copy()
+        cooling = (end_temperature / start_temperature) ** (1 / iterations)
+        temperature = start_temperature
+
+        for _ in range(iterations):
+            i, j = rng.sample(movable, 2)
+            delta, state = scorer.swap_delta(i, j)
+
+            if delta >= 0 or rng.random() < math.exp(delta / temperature):
+                scorer.apply_swap(i, j, state)
+
+                if scorer.objective > best_objective:
+                    best_objective = scorer.objective
+                    best_positions = scorer.positions.copy()
+
+            temperature *= cooling
+
+        scorer.set_positions(best_positions)
+
+        return scorer.metrics()
+
+    def best_layout_map(self) -> Dict[str, Any]:
+        """Карта найденной раскладки"""
+        return self.scorer.to_layout_map()
+
+    def layout_rows(self) -> List[List[str]]:
+        """
+        Ряды найденной раскладки в формате ready_made_layouts
+        Клавиша без символа записывается пустой строкой, Alt-символ - через "/"
+        """
+        primary = {}
+        alt = {}
+        for char, entry in self.best_layout_map().items():
+            if not isinstance(entry, dict) or char == ' ':
+                continue
+            modifiers = entry.get('modifiers', [])
+            if not modifiers:
+                primary.setdefault(entry.get('scancode'), char)
+            elif modifiers == ['alt']:
+                alt.setdefault(entry.get('scancode'), char)
+
+        rows = []
+        for row_scancodes in LAYOUT_ROW_SCANCODES:
+            row = []
+            for scancode in row_scancodes:
+                cell = primary.get(scancode, '')
+                if scancode in alt:
+                    cell = f"{cell or ' '}/{alt[scancode]}"
+                row.append(cell)
+            rows.append(row)
+
+        # Хвостовые пустые клавиши последнего ряда не влияют на разбор
+        while rows and rows[-1] and rows[-1][-1] == '':
+            rows[-1].pop()
+
+        return rows
+
+    def save_layout(self, name: str, language: str, folder_path: str = 'ready_made_layouts') -> str:
+        """Сохраняет найденную раскладку в JSON и возвращает путь к файлу"""
+        os.makedirs(folder_path, exist_ok=True)
+
+        file_name = re.sub(r'\W+', '_', name).strip('_').lower() or 'optimized'
+        file_path = os.path.join(folder_path, f"{file_name}.json")
+
+        layout_data = {
+            'name': name,
+            'language': language,
+            'layout': self.layout_rows(),
+        }
+
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(layout_data, f, ensure_ascii=False, indent=4)
+
+        return file_path
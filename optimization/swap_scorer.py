@@ -0,0 +1,298 @@
+"""
+Инкрементальная оценка раскладки при перестановке двух символов
+"""
+
+import math
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+from analysis.evaluation_engine import CorpusTables
+from analysis.finger_penalty_calculator import FingerPenaltyCalculator
+from layouts.key_tables import (
+    FINGER_ORDER, KEY_FINGER_INDEX, KEY_HAND_INDEX, KEY_PAIR_CATEGORY, COMFORT_CATEGORY_INDEX,
+    MODIFIER_SHIFT, SCANCODES, UNKNOWN_KEY
+)
+from layouts.compiled_layout import CompiledLayout, compile_layout
+
+
+# Веса критериев в целевой функции (как в README: 40/30/20/10)
+OBJECTIVE_WEIGHTS = {
+    'comfort': 0.4,
+    'penalty': 0.3,
+    'uniformity': 0.2,
+    'balance': 0.1,
+}
+
+
+def uniformity_score(finger_values: List[float]) -> float:
+    """Равномерность нагрузки на пальцы: 100 * (1 - std / max), как в сравнении раскладок"""
+    max_value = max(finger_values)
+    if max_value <= 0:
+        max_value = 1
+
+    mean = sum(finger_values) / len(finger_values)
+    std_dev = math.sqrt(sum((value - mean) ** 2 for value in finger_values) / len(finger_values))
+
+    return 100 * (1 - (std_dev / max_value))
+
+
+def balance_score(left_count: float, right_count: float) -> float:
+    """Балл баланса рук: 100 - |% левой руки - 50| * 2"""
+    total = left_count + right_count
+    if total <= 0:
+        return 100
+
+    return 100 - abs(left_count / total * 100 - 50) * 2
+
+
+def penalty_score(finger_penalty: float, presses: float) -> float:
+    """Штраф на одно нажатие, переведенный в балл 0..100 (меньше штраф - выше балл)"""
+    if presses <= 0:
+        return 100
+
+    return 100 / (1 + finger_penalty / presses)
+
+
+class SwapScorer:
+    """
+    Оценка раскладки по таблицам корпуса с инкрементальным пересчетом перестановок
+
+    Строчные буквы без модификаторов (вместе с их заглавными вариантами на Shift)
+    можно переставлять между клавишами; остальные символы раскладки неподвижны.
+    Перестановка двух букв пересчитывает только биграммы и униграммы этих букв.
+    """
+
+    def __init__(self, tables: CorpusTables, layout_map: Dict[str, Any],
+                 penalty_calculator: FingerPenaltyCalculator = None, weights: Dict[str, float] = None):
+        self.layout_map = compile_layout(layout_map)
+        self.penalty_calculator = penalty_calculator or FingerPenaltyCalculator()
+        self.weights = weights or OBJECTIVE_WEIGHTS
+
+        char_keys = self.layout_map.char_keys
+
+        # Переставляемые буквы и неподвижные символы, встречающиеся в биграммах
+        self.movable_chars = sorted(
+            char for char in char_keys if char_keys[char] != UNKNOWN_KEY and self._is_movable(char)
+        )
+        movable_set = set(self.movable_chars)
+        fixed_chars = sorted({
+            char for combo in tables.bigram_counts for char in combo
+            if char in char_keys and char not in movable_set
+        })
+
+        self.chars = self.movable_chars + fixed_chars
+        self.char_index = {char: idx for idx, char in enumerate(self.chars)}
+        self.movable_indices = list(range(len(self.movable_chars)))
+        size = len(self.chars)
+
+        # Текущая клавиша каждого символа
+        self.positions = np.array([char_keys[char] for char in self.chars], dtype=np.intp)
+
+        # Матрица биграмм по символам и признак удобной пары клавиш
+        self.bigrams = np.zeros((size, size), dtype=np.float64)
+        for combo, count in tables.bigram_counts.items():
+            if len(combo) == 2 and combo[0] in self.char_index and combo[1] in self.char_index:
+                self.bigrams[self.char_index[combo[0]], self.char_index[combo[1]]] += count
+        self.bigrams_t = np.ascontiguousarray(self.bigrams.T)
+        self.comfortable = (KEY_PAIR_CATEGORY == COMFORT_CATEGORY_INDEX['comfortable']).astype(np.float64)
+        self.total_bigrams = float(self.bigrams.sum())
+
+        # Штраф клавиши для символа без модификаторов и с Shift
+        key_penalty = self.penalty_calculator.key_penalty_table()
+        self.key_plain_penalty = key_penalty[:, 0].tolist()
+        self.key_shift_penalty = key_penalty[:, MODIFIER_SHIFT].tolist()
+
+        self._build_unigram_tables(tables, char_keys)
+        self._recalculate()
+
+    def _is_movable(self, char: str) -> bool:
+        """Строчная буква без модификаторов, заглавная которой стоит на той же клавише с Shift"""
+        entry = self.layout_map.get(char)
+        if not (char.isalpha() and char.islower() and isinstance(entry, dict)):
+            return False
+        if entry.get('modifiers'):
+            return False
+
+        upper_entry = self.layout_map.get(char.upper())
+        if upper_entry is None:
+            return True
+        return (isinstance(upper_entry, dict)
+                and upper_entry.get('scancode') == entry.get('scancode')
+                and upper_entry.get('modifiers') == ['shift'])
+
+    def _build_unigram_tables(self, tables: CorpusTables, char_keys: Dict[str, int]) -> None:
+        """Униграммы переставляемых букв и постоянный вклад неподвижных символов"""
+        movable_count = len(self.movable_chars)
+        self.plain_counts = [0.0] * movable_count
+        self.shift_counts = [0.0] * movable_count
+        self.word_counts = [0.0] * movable_count
+
+        self.fixed_penalty = 0.0
+        penalty_table = self.penalty_calculator.compile_penalty_table(self.layout_map)
+        self.fixed_load = [0.0] * len(FINGER_ORDER)
+        self.fixed_hands = [0.0, 0.0]
+
+        for char, count in tables.char_counts.items():
+            if not char.strip() or char not in char_keys:
+                continue
+
+            idx = self.char_index.get(char.lower())
+            if idx is not None and idx < movable_count:
+                if char.islower():
+                    self.plain_counts[idx] += count
+                else:
+                    self.shift_counts[idx] += count
+                continue
+
+            self.fixed_penalty += penalty_table.get(char, 0.0) * count
+            finger = KEY_FINGER_INDEX[char_keys[char]]
+            if finger >= 0:
+                self.fixed_load[finger] += count
+
+        for char, count in tables.word_char_counts.items():
+            if char not in char_keys:
+                continue
+
+            idx = self.char_index.get(char.lower())
+            if idx is not None and idx < movable_count:
+                self.word_counts[idx] += count
+                continue
+
+            hand = KEY_HAND_INDEX[char_keys[char]]
+            if hand >= 0:
+                self.fixed_hands[hand] += count
+
+    def _recalculate(self) -> None:
+        """Полный пересчет всех составляющих для текущих позиций"""
+        positions = self.positions
+
+        # Матрица удобства пар символов при текущих позициях
+        self.comfort_matrix = self.comfortable[np.ix_(positions, positions)]
+        self.comfort_matrix_t = np.ascontiguousarray(self.comfort_matrix.T)
+        self.comfort = float((self.bigrams * self.comfort_matrix).sum())
+
+        self.penalty = self.fixed_penalty
+        self.finger_load = list(self.fixed_load)
+        self.hands = list(self.fixed_hands)
+
+        for idx in self.movable_indices:
+            key = positions[idx]
+            self.penalty += (self.plain_counts[idx] * self.key_plain_penalty[key]
+                             + self.shift_counts[idx] * self.key_shift_penalty[key])
+
+            finger = KEY_FINGER_INDEX[key]
+            if finger >= 0:
+                self.finger_load[finger] += self.plain_counts[idx] + self.shift_counts[idx]
+
+            hand = KEY_HAND_INDEX[key]
+            if hand >= 0:
+                self.hands[hand] += self.word_counts[idx]
+
+        self.objective = self._objective(self.comfort, self.penalty, self.finger_load, self.hands)
+
+    def _objective(self, comfort: float, penalty: float, finger_load: List[float], hands: List[float]) -> float:
+        """Взвешенная сумма баллов критериев (больше = лучше)"""
+        comfort_percent = comfort / self.total_bigrams * 100 if self.total_bigrams else 0
+
+        return (self.weights['comfort'] * comfort_percent
+                + self.weights['penalty'] * penalty_score(penalty, sum(finger_load))
+                + self.weights['uniformity'] * uniformity_score(finger_load)
+                + self.weights['balance'] * balance_score(hands[0], hands[1]))
+
+    def _comfort_delta(self, i: int, j: int) -> float:
+        """
+        Изменение числа удобных биграмм при перестановке символов i и j
+        Перестановка меняет местами строки и столбцы i, j матрицы удобства пар,
+        поэтому затрагиваются только биграммы с участием этих символов
+        """
+        bigrams, bigrams_t, matrix, matrix_t = self.bigrams, self.bigrams_t, self.comfort_matrix, self.comfort_matrix_t
+
+        # Строки i и j (b - любой символ), затем поправка для b из {i, j}
+        delta = float((bigrams[i] - bigrams[j]) @ (matrix[j] - matrix[i]))
+        delta += float((bigrams_t[i] - bigrams_t[j]) @ (matrix_t[j] - matrix_t[i]))
+
+        b_ii, b_ij, b_ji, b_jj = bigrams[i, i], bigrams[i, j], bigrams[j, i], bigrams[j, j]
+        m_ii, m_ij, m_ji, m_jj = matrix[i, i], matrix[i, j], matrix[j, i], matrix[j, j]
+
+        # Вклад пар внутри {i, j}, посчитанный в строках и столбцах
+        delta -= (b_ii - b_ji) * (m_ji - m_ii) + (b_ij - b_jj) * (m_jj - m_ij)
+        delta -= (b_ii - b_ij) * (m_ij - m_ii) + (b_ji - b_jj) * (m_jj - m_ji)
+
+        # Точное изменение для пар внутри {i, j}
+        delta += b_ii * (m_jj - m_ii) + b_ij * (m_ji - m_ij) + b_ji * (m_ij - m_ji) + b_jj * (m_ii - m_jj)
+
+        return delta
+
+    def swap_delta(self, i: int, j: int) -> Tuple[float, Tuple]:
+        """
+        Изменение целевой функции при перестановке символов i и j
+        Возвращает (дельта, новое состояние) - состояние передается в apply_swap
+        """
+        positions = self.positions
+        key_i, key_j = positions[i], positions[j]
+
+        comfort = self.comfort + self._comfort_delta(i, j)
+
+        plain, shift = self.plain_counts, self.shift_counts
+        plain_penalty, shift_penalty = self.key_plain_penalty, self.key_shift_penalty
+        penalty = (self.penalty
+                   + (plain[i] - plain[j]) * (plain_penalty[key_j] - plain_penalty[key_i])
+                   + (shift[i] - shift[j]) * (shift_penalty[key_j] - shift_penalty[key_i]))
+
+        finger_load = list(self.finger_load)
+        hands = list(self.hands)
+        for idx, old_key, new_key in ((i, key_i, key_j), (j, key_j, key_i)):
+            load = plain[idx] + shift[idx]
+            if KEY_FINGER_INDEX[old_key] >= 0:
+                finger_load[KEY_FINGER_INDEX[old_key]] -= load
+            if KEY_FINGER_INDEX[new_key] >= 0:
+                finger_load[KEY_FINGER_INDEX[new_key]] += load
+            if KEY_HAND_INDEX[old_key] >= 0:
+                hands[KEY_HAND_INDEX[old_key]] -= self.word_counts[idx]
+            if KEY_HAND_INDEX[new_key] >= 0:
+                hands[KEY_HAND_INDEX[new_key]] += self.word_counts[idx]
+
+        objective = self._objective(comfort, penalty, finger_load, hands)
+        return objective - self.objective, (comfort, penalty, finger_load, hands, objective)
+
+    def apply_swap(self, i: int, j: int, state: Tuple = None) -> None:
+        """Применяет перестановку символов i и j (state - результат swap_delta)"""
+        if state is None:
+            _, state = self.swap_delta(i, j)
+
+        self.comfort, self.penalty, self.finger_load, self.hands, self.objective = state
+
+        self.positions[[i, j]] = self.positions[[j, i]]
+        for matrix in (self.comfort_matrix, self.comfort_matrix_t):
+            matrix[[i, j]] = matrix[[j, i]]
+            matrix[:, [i, j]] = matrix[:, [j, i]]
+
+    def set_positions(self, positions: np.ndarray) -> None:
+        """Задает клавиши всех символов (в порядке chars) и пересчитывает все составляющие"""
+        self.positions = np.array(positions, dtype=np.intp)
+        self._recalculate()
+
+    def metrics(self) -> Dict[str, float]:
+        """Критерии сравнения раскладок для текущих позиций"""
+        return {
+            'comfort_percent': self.comfort / self.total_bigrams * 100 if self.total_bigrams else 0,
+            'finger_penalty': self.penalty,
+            'uniformity_score': uniformity_score(self.finger_load),
+            'balance_score': balance_score(self.hands[0], self.hands[1]),
+            'objective': self.objective,
+        }
+
+    def to_layout_map(self) -> CompiledLayout:
+        """Карта раскладки с текущими позициями переставляемых букв"""
+        layout_map = {char: dict(entry) if isinstance(entry, dict) else entry
+                      for char, entry in self.layout_map.items()}
+
+        for idx in self.movable_indices:
+            char = self.movable_chars[idx]
+            scancode = SCANCODES[self.positions[idx]]
+            layout_map[char] = {'scancode': scancode, 'modifiers': []}
+            if char.upper() in layout_map:
+                layout_map[char.upper()] = {'scancode': scancode, 'modifiers': ['shift']}
+
+        return CompiledLayout(layout_map)
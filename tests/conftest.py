@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+
+@pytest.fixture
+def corpus_file():
+    '''Небольшой тестовый корпус из репозитория'''
+    return os.path.join(PROJECT_ROOT, 'test_text.txt')
@@ -0,0 +1,72 @@
+import csv
+import json
+
+import pytest
+
+from analysis.batch import METRIC_GROUPS, main
+from layouts.layout_maps import BUILTIN_LAYOUTS
+
+
+LAYOUT_FILE = {
+    'name': 'Тестовая',
+    'language': 'russian',
+    'layout': [
+        ["1", "2", "3"],
+        ["я", "в", "е", "р", "т", "ы", "у", "и", "о", "п"],
+        ["а", "с", "д", "ф", "г", "х", "й", "к", "л"],
+        ["з", "ь", "ц", "ж", "б", "н", "м", "ш", "щ", "ч"],
+    ],
+}
+
+
+def test_json_to_stdout(tmp_path, corpus_file, capsys):
+    assert main([corpus_file, '--no-cache', '--layouts', str(tmp_path), '--metrics', 'penalty,rating']) == 0
+    captured = capsys.readouterr()
+
+    result = json.loads(captured.out)
+    assert result['corpus'] == corpus_file
+    assert result['metrics'] == ['penalty', 'rating']
+    assert {row['layout'] for row in result['layouts']} == set(BUILTIN_LAYOUTS)
+    assert [row['rank'] for row in result['layouts']] == list(range(1, len(BUILTIN_LAYOUTS) + 1))
+    for row in result['layouts']:
+        assert list(row) == ['layout', 'language'] + METRIC_GROUPS['penalty'] + METRIC_GROUPS['rating']
+    # Диагностика не смешивается с результатом
+    assert 'загружен' not in captured.out
+
+
+def test_csv_file_by_extension(tmp_path, corpus_file, capsys):
+    output = tmp_path / 'results.csv'
+
+    assert main([corpus_file, '--no-cache', '--metrics', 'comfort', '-o', str(output)]) == 0
+    assert capsys.readouterr().out == ''
+
+    with open(output, encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert rows
+    assert list(rows[0]) == ['layout', 'language'] + METRIC_GROUPS['comfort']
+    for row in rows:
+        percents = [float(row[column]) for column in METRIC_GROUPS['comfort'][:3]]
+        assert sum(percents) == pytest.approx(100)
+
+
+def test_layout_folder_without_builtin(tmp_path, corpus_file, capsys):
+    layout_dir = tmp_path / 'layouts'
+    layout_dir.mkdir()
+    (layout_dir / 'test.json').write_text(json.dumps(LAYOUT_FILE, ensure_ascii=False), encoding='utf-8')
+
+    assert main([corpus_file, '--no-cache', '--no-builtin', '--layouts', str(layout_dir),
+                 '--metrics', 'penalty', '--format', 'json']) == 0
+
+    result = json.loads(capsys.readouterr().out)
+    assert [(row['layout'], row['language']) for row in result['layouts']] == [('Тестовая', 'russian')]
+
+
+def test_missing_corpus(tmp_path, capsys):
+    assert main([str(tmp_path / 'missing.txt'), '--no-cache']) == 1
+    assert capsys.readouterr().out == ''
+
+
+def test_unknown_metric(corpus_file):
+    with pytest.raises(SystemExit) as error:
+        main([corpus_file, '--metrics', 'penalty,unknown'])
+    assert error.value.code == 2
@@ -0,0 +1,87 @@
+import copy
+import pickle
+from collections import OrderedDict
+
+import numpy as np
+
+from layouts import compiled_layout
+from layouts.compiled_layout import CompiledLayout, compile_layout
+from layouts.key_tables import KEY_FINGER_INDEX, UNKNOWN_KEY, key_index
+
+
+LAYOUT_MAP = {
+    'а': {'scancode': '33', 'modifiers': []},
+    'А': {'scancode': '33', 'modifiers': ['shift']},
+    'б': ['34'],
+    'в': '35',
+    ' ': {'scancode': '57', 'modifiers': []},
+}
+
+
+def test_dict_methods_are_not_shadowed():
+    layout_map = CompiledLayout(LAYOUT_MAP)
+
+    assert list(layout_map.keys()) == list(LAYOUT_MAP)
+    assert OrderedDict(layout_map) == LAYOUT_MAP
+    assert dict(layout_map) == LAYOUT_MAP
+
+
+def test_arrays_follow_map():
+    layout_map = CompiledLayout(LAYOUT_MAP)
+
+    assert layout_map.chars == list(LAYOUT_MAP)
+    assert layout_map.key_indices.tolist() == [key_index(layout_map.scancode(char)) for char in LAYOUT_MAP]
+    assert layout_map.fingers.tolist() == [KEY_FINGER_INDEX[idx] for idx in layout_map.key_indices]
+    assert layout_map.penalized.tolist() == [True, True, False, False, True]
+    assert layout_map.modifiers_for('А') == ['shift']
+
+
+def test_text_keys(monkeypatch):
+    layout_map = CompiledLayout(LAYOUT_MAP)
+    text = 'ба Ав, я\U0001F600а'
+
+    # Несколько кусков текста склеиваются в один поток
+    monkeypatch.setattr(compiled_layout, 'TEXT_CHUNK_CHARS', 4)
+    keys = layout_map.text_keys(text)
+
+    assert keys.dtype == np.uint8
+    assert keys.tolist() == [layout_map.char_keys.get(char, UNKNOWN_KEY) for char in text]
+    assert keys[text.index(',')] == keys[text.index('я')] == UNKNOWN_KEY
+    assert layout_map.text_keys('').tolist() == []
+
+    layout_map['я'] = '36'
+    assert layout_map.text_keys('я').tolist() == [key_index('36')]
+
+
+def test_copy_and_pickle():
+    layout_map = CompiledLayout(LAYOUT_MAP)
+
+    for restored in (layout_map.copy(), copy.deepcopy(layout_map), pickle.loads(pickle.dumps(layout_map))):
+        assert isinstance(restored, CompiledLayout)
+        assert restored == layout_map
+        assert restored.chars == layout_map.chars
+        assert np.array_equal(restored.base_penalty, layout_map.base_penalty)
+
+    assert compile_layout(layout_map) is layout_map
+
+
+def test_mutations_recompile_on_read():
+    layout_map = CompiledLayout()
+    for char, scancode_info in LAYOUT_MAP.items():
+        layout_map[char] = scancode_info
+    assert layout_map.chars == list(LAYOUT_MAP)
+
+    layout_map['г'] = {'scancode': '36', 'modifiers': []}
+    assert layout_map.scancode('г') == '36'
+    assert layout_map.code_table()[ord('г')] == layout_map.char_index['г']
+
+    del layout_map['а']
+    assert layout_map.scancode('а') is None
+    assert 'а' not in layout_map.char_keys
+
+    layout_map.update({'д': '37'})
+    layout_map.pop('б')
+    assert layout_map.chars == ['А', 'в', ' ', 'г', 'д']
+
+    layout_map.clear()
+    assert layout_map.chars == [] and len(layout_map.key_indices) == 0
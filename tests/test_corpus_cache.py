@@ -0,0 +1,65 @@
+import os
+
+from analysis import corpus_cache
+from analysis.corpus_cache import CorpusCache, DEFAULT_CACHE_DIR, PROJECT_ROOT
+
+
+def test_default_cache_dir_is_in_project():
+    assert DEFAULT_CACHE_DIR == os.path.join(PROJECT_ROOT, '.corpus_cache')
+    assert os.path.isfile(os.path.join(PROJECT_ROOT, 'cli.py'))
+
+
+def test_round_trip(tmp_path, corpus_file):
+    cache = CorpusCache(str(tmp_path / 'cache'))
+
+    corpus_stats, tables = cache.load_corpus(corpus_file)
+    key = cache.cache_key(corpus_file, 2, 4)
+    cached_stats, cached_tables = cache.load(key, 2)
+
+    assert cached_stats.words == corpus_stats.words
+    assert cached_stats.char_counts == corpus_stats.char_counts
+    assert cached_stats.word_char_counts == corpus_stats.word_char_counts
+    assert cached_stats.stream_pairs == corpus_stats.stream_pairs
+    assert cached_stats.space_pairs == corpus_stats.space_pairs
+    assert {length: dict(combos) for length, combos in cached_tables.combos.items()} == \
+        {length: dict(combos) for length, combos in tables.combos.items()}
+    assert cached_tables.fingerprint() == tables.fingerprint() == key
+
+
+def test_second_load_does_not_read_corpus(tmp_path, corpus_file, monkeypatch):
+    cache = CorpusCache(str(tmp_path / 'cache'))
+    corpus_stats, _ = cache.load_corpus(corpus_file)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('корпус разобран повторно')
+
+    monkeypatch.setattr(corpus_cache, 'build_corpus_tables', fail)
+    assert cache.load_corpus(corpus_file)[0].words == corpus_stats.words
+
+
+def test_key_follows_content_and_settings(tmp_path):
+    cache = CorpusCache(str(tmp_path / 'cache'))
+    corpus = tmp_path / 'corpus.txt'
+    corpus.write_text('кот пёс', encoding='utf-8')
+    key = cache.cache_key(str(corpus), 2, 4)
+
+    assert cache.cache_key(str(corpus), 2, 4) == key
+    assert cache.cache_key(str(corpus), 3, 4) != key
+    assert cache.cache_key(str(corpus), 2, 3) != key
+
+    corpus.write_text('кот ёж', encoding='utf-8')
+    assert cache.cache_key(str(corpus), 2, 4) != key
+
+
+def test_eviction_keeps_newest_entry(tmp_path):
+    cache_dir = tmp_path / 'cache'
+    cache = CorpusCache(str(cache_dir), max_bytes=1)
+    corpora = []
+    for idx, text in enumerate(['кот пёс', 'ёж уж', 'рак сом']):
+        corpus = tmp_path / f'corpus{idx}.txt'
+        corpus.write_text(text, encoding='utf-8')
+        corpora.append(str(corpus))
+        cache.load_corpus(str(corpus))
+
+    entries = [name for name in os.listdir(cache_dir) if name.endswith('.npz')]
+    assert entries == [cache.cache_key(corpora[-1], 2, 4) + '.npz']
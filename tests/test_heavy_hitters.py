@@ -0,0 +1,75 @@
+import random
+from collections import Counter
+
+import pytest
+
+from analysis.combo_analyzer import combos_counter
+from analysis.heavy_hitters import HeavyNgrams, SpaceSaving
+
+
+def zipf_stream(size, items, seed):
+    '''Поток с частотами по закону Ципфа: несколько частых элементов и длинный хвост'''
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, items + 1)]
+    return rng.choices(range(items), weights, k=size)
+
+
+def test_exact_under_capacity():
+    counter = SpaceSaving(10)
+    counter.update_counts({'а': 3, 'б': 5})
+    counter.update('а')
+    counter.update('в', 2)
+
+    assert counter.top(3) == [('б', 5, 0), ('а', 4, 0), ('в', 2, 0)]
+    assert counter.error_bound() == 0
+    assert counter.total == 11
+    assert len(counter) == 3
+
+
+def test_estimates_within_error_bound():
+    stream = zipf_stream(20000, 2000, seed=4)
+    true_counts = Counter(stream)
+    counter = SpaceSaving(100)
+    for item in stream:
+        counter.update(item)
+
+    assert len(counter) == 100
+    assert counter.total == len(stream)
+    bound = counter.error_bound()
+    assert 0 < bound <= counter.total / counter.capacity
+
+    for item, count, error in counter.top(100):
+        assert count - error <= true_counts[item] <= count
+        assert error <= bound
+
+
+def test_heavy_items_in_top():
+    stream = zipf_stream(20000, 2000, seed=5)
+    true_counts = Counter(stream)
+    counter = SpaceSaving(100)
+    for item in stream:
+        counter.update(item)
+
+    # Любой элемент чаще total / capacity гарантированно хранится
+    heavy = {item for item, count in true_counts.items() if count > counter.total / counter.capacity}
+    assert heavy
+    assert heavy <= set(counter.counts)
+    assert [item for item, _, _ in counter.top(3)] == [item for item, _ in true_counts.most_common(3)]
+
+
+def test_capacity_must_be_positive():
+    with pytest.raises(ValueError):
+        SpaceSaving(0)
+
+
+def test_heavy_ngrams_exact_for_small_input():
+    words = {'привет': 3, 'приветик': 1, 'ветер': 2, 'тест': 4}
+    heavy = HeavyNgrams((3, 4), capacity=1000)
+    heavy.add_words(words)
+    heavy.add_words({'тест': 1})
+
+    combos = combos_counter({**words, 'тест': 5}, 4)
+    for length in (3, 4):
+        assert heavy.error_bound(length) == 0
+        assert {combo: count for combo, count, _ in heavy.top(length, 1000)} == dict(combos[length])
+    assert heavy.top(3, 1) == [('вет', 6, 0)]
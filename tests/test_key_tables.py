@@ -0,0 +1,69 @@
+import pytest
+
+from layouts.key_tables import (
+    KEY_TRIPLE_CATEGORY, KEY_TRIPLE_SKIPGRAM, TRIGRAM_CATEGORIES, SPACE_SCANCODE, UNKNOWN_KEY, key_index
+)
+from layouts.layout_data import LayoutData
+
+
+# Сканкоды клавиш QWERTY: a s d f - левая рука от мизинца к указательному,
+# j k l ; - правая рука от указательного к мизинцу, e r - верхний ряд левой руки
+QWERTY = {'a': '1E', 's': '1F', 'd': '20', 'f': '21', 'e': '12', 'r': '13',
+          'j': '24', 'k': '25', 'l': '26', ';': '27'}
+
+
+def triple(chars):
+    return tuple(key_index(QWERTY[char]) for char in chars)
+
+
+@pytest.mark.parametrize('chars, category', [
+    ('ajs', 'alternation'),
+    ('asd', 'inward_roll'),
+    (';lk', 'inward_roll'),
+    ('asj', 'inward_roll'),
+    ('jsd', 'inward_roll'),
+    ('dsa', 'outward_roll'),
+    ('kl;', 'outward_roll'),
+    ('saj', 'outward_roll'),
+    ('sda', 'redirect'),
+    ('lkl', 'redirect'),
+    ('frj', 'same_finger'),
+    ('jaa', 'same_finger'),
+])
+def test_triple_category(chars, category):
+    assert TRIGRAM_CATEGORIES[KEY_TRIPLE_CATEGORY[triple(chars)]] == category
+
+
+@pytest.mark.parametrize('chars, skipgram', [
+    ('dse', True),
+    ('fjr', True),
+    ('sds', False),
+    ('asd', False),
+])
+def test_same_finger_skipgram(chars, skipgram):
+    assert bool(KEY_TRIPLE_SKIPGRAM[triple(chars)]) == skipgram
+
+
+@pytest.mark.parametrize('unknown', [UNKNOWN_KEY, key_index(SPACE_SCANCODE)])
+def test_key_without_finger_is_other(unknown):
+    # Клавиша без пальца (пробел или неизвестная) - комбинация не классифицируется
+    keys = (key_index(QWERTY['a']), unknown, key_index(QWERTY['s']))
+    assert TRIGRAM_CATEGORIES[KEY_TRIPLE_CATEGORY[keys]] == 'other'
+    assert not KEY_TRIPLE_SKIPGRAM[keys]
+
+
+def test_trigram_metrics_on_layout():
+    data = LayoutData()
+    metrics = data.calculate_trigram_metrics({'asd': 3, 'dsa': 2, 'sda': 1, 'ajs': 4, 'dse': 5, 'aяs': 9},
+                                             data.layout_maps['QWERTY'])
+
+    assert metrics == {
+        'total': 15,
+        'alternation': 4,
+        'inward_roll': 3,
+        'outward_roll': 2,
+        'redirect': 1 + 5,
+        'same_finger': 0,
+        'other': 0,
+        'same_finger_skipgram': 5,
+    }
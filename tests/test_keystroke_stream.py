@@ -0,0 +1,72 @@
+from analysis.evaluation_engine import CorpusTables
+from analysis.keystroke_stream import across_space_metrics, keystroke_bigram_metrics, pair_char_arrays
+from analysis.text_processor import CorpusStats, stream_pair_counts
+from layouts.layout_data import LayoutData
+
+
+# В QWERTY нет кириллицы и запятой: пары с ними - вне раскладки
+TEXT = 'as sa Da, жd'
+
+
+def test_stream_pair_counts():
+    pairs, space_pairs = stream_pair_counts('Кот, пёс.  Ёж\nab')
+
+    assert pairs[' п'] == pairs[', '] == pairs['  '] == pairs['ж\n'] == 1
+    assert sum(pairs.values()) == len('Кот, пёс.  Ёж\nab') - 1
+    # Через два пробела и перевод строки переходы между словами не считаются
+    assert space_pairs == {',п': 1}
+
+
+def test_stream_pairs_across_blocks():
+    text = 'Кот, пёс.  Ёж ab cd'
+    whole = CorpusStats()
+    whole.add_text(text)
+
+    for split in range(1, len(text)):
+        blocks = CorpusStats()
+        blocks.add_text(text[:split])
+        blocks.add_text(text[split:])
+        assert blocks.stream_pairs == whole.stream_pairs, split
+        assert blocks.space_pairs == whole.space_pairs, split
+
+
+def test_stream_and_word_internal_metrics():
+    pairs, _ = stream_pair_counts(TEXT)
+    metrics = keystroke_bigram_metrics(pair_char_arrays(pairs), LayoutData().layout_maps['QWERTY'])
+
+    # as - ролл вовнутрь, sa и Da - наружу; пары с пробелом без пальца
+    assert metrics['stream'] == {
+        'total': 7, 'comfortable': 1, 'partially_comfortable': 2, 'uncomfortable': 0,
+        'same_finger': 0, 'same_key': 0, 'hand_alternation': 0,
+        'space': 4, 'modifier_changes': 2, 'unmapped': 4,
+    }
+    assert metrics['word_internal'] == {
+        'total': 3, 'comfortable': 1, 'partially_comfortable': 2, 'uncomfortable': 0,
+        'same_finger': 0, 'same_key': 0, 'hand_alternation': 0,
+        'space': 0, 'modifier_changes': 1, 'unmapped': 1,
+    }
+
+
+def test_across_space_metrics():
+    _, space_pairs = stream_pair_counts(TEXT)
+    assert space_pairs == {'ss': 1, 'aD': 1, ',ж': 1}
+
+    metrics = across_space_metrics(pair_char_arrays(space_pairs), LayoutData().layout_maps['QWERTY'])
+
+    assert metrics['total'] == 2
+    assert metrics['same_key'] == 1
+    assert metrics['modifier_changes'] == 1
+    assert metrics['space'] == 0
+    assert metrics['unmapped'] == 1
+
+
+def test_tables_keystroke_analysis():
+    stats = CorpusStats()
+    stats.add_text(TEXT)
+    tables = CorpusTables.from_corpus_stats(stats)
+    layout_map = LayoutData().layout_maps['QWERTY']
+
+    analysis = tables.keystroke_analysis(layout_map)
+
+    assert analysis['stream'] == keystroke_bigram_metrics(pair_char_arrays(stats.stream_pairs), layout_map)['stream']
+    assert analysis['across_space'] == across_space_metrics(pair_char_arrays(stats.space_pairs), layout_map)
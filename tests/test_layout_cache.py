@@ -0,0 +1,83 @@
+from collections import defaultdict
+
+from analysis import layout_cache
+from analysis.evaluation_engine import CorpusTables, EvaluationEngine
+from analysis.finger_penalty_calculator import FingerPenaltyCalculator
+from analysis.layout_cache import LayoutResultCache, layout_fingerprint
+from analysis.text_processor import stream_corpus_stats
+from layouts.layout_data import LayoutData
+
+
+LAYOUT_MAP = {
+    'а': {'scancode': '33', 'modifiers': []},
+    'б': {'scancode': '34', 'modifiers': []},
+}
+
+
+def test_fingerprint_ignores_char_order():
+    reordered = dict(reversed(list(LAYOUT_MAP.items())))
+
+    assert layout_fingerprint(reordered) == layout_fingerprint(LAYOUT_MAP)
+    assert layout_fingerprint({**LAYOUT_MAP, 'б': {'scancode': '35', 'modifiers': []}}) != \
+        layout_fingerprint(LAYOUT_MAP)
+
+
+def test_key_changes_with_layout_corpus_settings_and_version(monkeypatch):
+    cache = LayoutResultCache()
+    key = cache.key(LAYOUT_MAP, 'corpus')
+
+    assert cache.key(dict(LAYOUT_MAP), 'corpus') == key
+    assert cache.key({**LAYOUT_MAP, 'в': '35'}, 'corpus') != key
+    assert cache.key(LAYOUT_MAP, 'other corpus') != key
+    assert cache.key(LAYOUT_MAP, 'corpus', {'max_combos_length': 3}) != key
+
+    monkeypatch.setattr(layout_cache, 'SCORING_VERSION', layout_cache.SCORING_VERSION + 1)
+    assert cache.key(LAYOUT_MAP, 'corpus') != key
+
+
+def test_disk_round_trip(tmp_path, corpus_file):
+    tables = CorpusTables.from_corpus_stats(stream_corpus_stats(corpus_file))
+    data = LayoutData()
+    layout_map = data.layout_maps['ЙЦУКЕН']
+    stats = EvaluationEngine(tables, data, FingerPenaltyCalculator()).score_layout(layout_map)
+
+    cache = LayoutResultCache(str(tmp_path))
+    key = cache.key(layout_map, tables.fingerprint())
+    cache.put(key, stats)
+
+    restored = LayoutResultCache(str(tmp_path)).get(key)
+    assert restored['finger_penalty'] == stats['finger_penalty']
+    assert restored['total_comfort'] == stats['total_comfort']
+    assert restored['comfort_combos'] == dict(stats['comfort_combos'])
+    assert isinstance(restored['finger_load'], defaultdict)
+    assert restored['finger_load']['нет такого пальца'] == 0
+
+    assert LayoutResultCache(str(tmp_path)).get(cache.key(layout_map, 'other corpus')) is None
+    assert LayoutResultCache().get(key) is None
+
+
+def test_evaluator_rescores_only_changed_layouts(corpus_file, capsys, monkeypatch):
+    from analysis.layout_evaluator import LayoutEvaluator
+
+    evaluator = LayoutEvaluator()
+    evaluator.corpus_cache = None
+    evaluator.analyze_combinations_all_layouts(corpus_file, visualize=False)
+    first = dict(evaluator.all_layouts_stats)
+
+    scored = []
+    score_layout = EvaluationEngine.score_layout
+
+    def counting_score_layout(engine, layout_map):
+        scored.append(layout_map)
+        return score_layout(engine, layout_map)
+
+    monkeypatch.setattr(EvaluationEngine, 'score_layout', counting_score_layout)
+    layout_map = evaluator.data.layout_maps['ЙЦУКЕН']
+    evaluator.data.layout_maps['ЙЦУКЕН'] = evaluator.data.swap_scancodes(layout_map, '16', '17')
+    evaluator.analyze_combinations_all_layouts(corpus_file, visualize=False)
+    capsys.readouterr()
+
+    assert len(scored) == 1
+    for layout_name, stats in evaluator.all_layouts_stats.items():
+        if layout_name != 'ЙЦУКЕН':
+            assert stats is first[layout_name]
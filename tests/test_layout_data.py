@@ -0,0 +1,86 @@
+import random
+
+import pytest
+
+from analysis.evaluation_engine import CorpusTables, EvaluationEngine
+from analysis.finger_penalty_calculator import FingerPenaltyCalculator
+from analysis.text_processor import stream_corpus_stats
+from layouts.key_tables import JSON_LAYOUT_SCANCODES
+from layouts.layout_data import LayoutData
+
+
+@pytest.fixture
+def tables(corpus_file):
+    return CorpusTables.from_corpus_stats(stream_corpus_stats(corpus_file))
+
+
+def rounded(stats):
+    '''Статистика раскладки с округленными числами (порядок суммирования при пересчете другой)'''
+    result = {}
+    for name, value in stats.items():
+        if isinstance(value, dict):
+            result[name] = {key: round(item, 6) if isinstance(item, float) else item
+                            for key, item in value.items() if item != 0 or name in ('hand_balance', 'two_char_analysis')}
+        elif isinstance(value, float):
+            result[name] = round(value, 6)
+        else:
+            result[name] = value
+    return result
+
+
+@pytest.mark.parametrize('layout_name', ['ЙЦУКЕН', 'Скоропись', 'QWERTY', 'Dvorak'])
+def test_comfort_totals_match_classified_combos(tables, layout_name):
+    data = LayoutData()
+    layout_map = data.layout_maps[layout_name]
+
+    comfort_combos, partial_combos, uncomfortable_combos, _ = \
+        data.calculate_dynamic_penalties_from_bigrams(tables.bigram_counts, layout_map)
+    totals = data.calculate_comfort_totals(tables.bigram_counts, layout_map)
+
+    assert totals == {
+        'comfortable': sum(comfort_combos.values()),
+        'partially_comfortable': sum(partial_combos.values()),
+        'uncomfortable': sum(uncomfortable_combos.values()),
+    }
+    assert data.bigram_count_matrix(tables.bigram_counts, layout_map).sum() == sum(totals.values())
+
+
+def test_engine_totals_come_from_count_matrix(tables):
+    data = LayoutData()
+    layout_map = data.layout_maps['ЙЦУКЕН']
+
+    stats = EvaluationEngine(tables, data, FingerPenaltyCalculator()).score_layout(layout_map)
+    totals = data.calculate_comfort_totals(tables.bigram_counts, layout_map)
+
+    assert (stats['total_comfort'], stats['total_partial'], stats['total_uncomfortable']) == \
+        (totals['comfortable'], totals['partially_comfortable'], totals['uncomfortable'])
+    assert stats['total_comfort'] == sum(stats['comfort_combos'].values())
+
+
+def test_score_swap_matches_full_scoring(tables):
+    data = LayoutData()
+    penalty_calculator = FingerPenaltyCalculator()
+    engine = EvaluationEngine(tables, data, penalty_calculator)
+    rng = random.Random(0)
+
+    for layout_name in ('ЙЦУКЕН', 'QWERTY'):
+        layout_map = data.layout_maps[layout_name]
+        stats = engine.score_layout(layout_map)
+        for _ in range(10):
+            scancode1, scancode2 = rng.sample(JSON_LAYOUT_SCANCODES, 2)
+            stats = data.score_swap(tables, stats, layout_map, scancode1, scancode2, penalty_calculator)
+            layout_map = data.swap_scancodes(layout_map, scancode1, scancode2)
+            assert rounded(stats) == rounded(engine.score_layout(layout_map)), (layout_name, scancode1, scancode2)
+
+
+def test_swap_scancodes_moves_every_layer():
+    data = LayoutData()
+    layout_map = data.layout_maps['ЙЦУКЕН']
+    scancode1, scancode2 = layout_map['й']['scancode'], layout_map['ф']['scancode']
+
+    swapped = data.swap_scancodes(layout_map, scancode1, scancode2)
+
+    assert swapped['й']['scancode'] == swapped['Й']['scancode'] == scancode2
+    assert swapped['ф']['scancode'] == swapped['Ф']['scancode'] == scancode1
+    assert swapped['Й']['modifiers'] == ['shift']
+    assert data.swap_scancodes(swapped, scancode1, scancode2) == layout_map
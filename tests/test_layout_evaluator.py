@@ -0,0 +1,20 @@
+from analysis.layout_evaluator import LayoutEvaluator
+from utils.stage_profiler import StageProfiler
+
+
+def test_profiled_stages(corpus_file, capsys):
+    evaluator = LayoutEvaluator()
+    evaluator.corpus_cache = None
+    evaluator.profiler = StageProfiler(enabled=True)
+
+    evaluator.analyze_combinations_all_layouts(corpus_file, visualize=False)
+    capsys.readouterr()
+
+    names = [record['name'] for record in evaluator.profiler.records]
+    assert names[-1] == 'analyze_all_layouts'
+    for stage in ('load_corpus', 'score_layouts', 'print_summaries', 'print_comparison'):
+        assert names.count(stage) == 1, stage
+    assert 'print_report' not in names
+
+    layouts = {record['layout'] for record in evaluator.profiler.records if record['name'] == 'score_layout'}
+    assert layouts == set(evaluator.all_layouts_stats)
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from layouts.layout_loader import LayoutFileCache, load_layout_files, read_layout_file
+
+
+VALID_LAYOUT = {
+    'name': 'Тест',
+    'language': 'russian',
+    'layout': [
+        ["1", "2", "3"],
+        ["й", "ц", "у"],
+        ["ф", "ы", "в"],
+        ["я", "ч", "с"],
+    ],
+}
+
+
+def write_json(path, data):
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.parametrize('content', ['[1, 2]', '{}', '{"layout": "йцу"}', '"text"', '{"layout": [["a"]'])
+def test_bad_layout_file_is_skipped(tmp_path, content):
+    bad_file = tmp_path / 'bad.json'
+    bad_file.write_text(content, encoding='utf-8')
+    good_file = write_json(tmp_path / 'good.json', VALID_LAYOUT)
+
+    loaded = load_layout_files([str(bad_file), good_file], LayoutFileCache(), workers=2)
+
+    assert [layout_file for layout_file, _, _ in loaded] == [good_file]
+    assert read_layout_file(str(bad_file)) is None
+
+
+def test_unreadable_layout_file_is_skipped(tmp_path):
+    directory = tmp_path / 'dir.json'
+    directory.mkdir()
+
+    assert load_layout_files([str(directory), str(tmp_path / 'missing.json')], workers=1) == []
+    assert read_layout_file(str(directory)) is None
+
+
+def test_valid_layout_file(tmp_path):
+    layout_file = write_json(tmp_path / 'good.json', VALID_LAYOUT)
+
+    (loaded_file, layout_data, layout_map), = load_layout_files([layout_file], workers=1)
+
+    assert loaded_file == layout_file
+    assert layout_data['name'] == 'Тест'
+    assert layout_map['й']['modifiers'] == []
+    assert layout_map['Й']['modifiers'] == ['shift']
+    assert read_layout_file(layout_file)['layout'] == VALID_LAYOUT['layout']
+
+
+def test_layout_cache_is_reused(tmp_path):
+    layout_file = write_json(tmp_path / 'good.json', VALID_LAYOUT)
+    cache = LayoutFileCache()
+
+    first = load_layout_files([layout_file], cache, workers=1)
+    assert cache.get(layout_file) is not None
+    assert load_layout_files([layout_file], cache, workers=1) == first
@@ -0,0 +1,49 @@
+from layouts.compiled_layout import CompiledLayout
+from layouts.key_tables import LAYOUT_ROW_SCANCODES, SPACE_SCANCODE
+from layouts.layout_data import LayoutData
+from layouts.layout_maps import BUILTIN_LAYOUTS, builtin_layout_data, builtin_layout_map
+
+
+def test_builtin_layout_maps():
+    data = LayoutData()
+
+    for layout_name, layout in BUILTIN_LAYOUTS.items():
+        layout_map = data.layout_maps[layout_name]
+        assert isinstance(layout_map, CompiledLayout)
+        assert layout_map == builtin_layout_map(layout_name)
+
+        digits_row, *letter_rows = layout['layout']
+        for row, scancodes in zip(letter_rows, LAYOUT_ROW_SCANCODES[1:]):
+            for char, scancode in zip(row, scancodes):
+                if char and char not in layout.get('extra_keys', {}):
+                    assert layout_map[char] == {'scancode': scancode, 'modifiers': []}
+                    assert layout_map[char.upper()] == {'scancode': scancode, 'modifiers': ['shift']}
+        for char, scancode in layout.get('extra_keys', {}).items():
+            assert layout_map[char]['scancode'] == scancode
+        for char in digits_row:
+            assert char in layout_map
+        assert layout_map[' '] == {'scancode': SPACE_SCANCODE, 'modifiers': []}
+
+
+def test_maps_are_built_on_first_access():
+    data = LayoutData()
+
+    assert set(data.layout_maps) >= set(BUILTIN_LAYOUTS)
+    assert not any(data.layout_maps.is_built(layout_name) for layout_name in BUILTIN_LAYOUTS)
+
+    layout_map = data.layout_maps['ЙЦУКЕН']
+    assert data.layout_maps.is_built('ЙЦУКЕН')
+    assert data.layout_maps['ЙЦУКЕН'] is layout_map
+    assert not data.layout_maps.is_built('QWERTY')
+
+
+def test_layout_data_matches_rows():
+    for layout_name, layout in BUILTIN_LAYOUTS.items():
+        layout_data = builtin_layout_data(layout_name)
+
+        assert layout_data['name'] == layout_name
+        assert layout_data['language'] == layout['language']
+        assert layout_data['layout'] == [list(row) for row in layout['layout']]
+        # Ряды копируются: изменение данных не меняет встроенную раскладку
+        layout_data['layout'][1][0] = 'X'
+        assert BUILTIN_LAYOUTS[layout_name]['layout'][1][0] != 'X'
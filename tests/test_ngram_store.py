@@ -0,0 +1,44 @@
+import random
+
+from analysis.combo_analyzer import combos_counter
+from analysis.ngram_store import NgramStore
+
+
+WORDS = {'привет': 5, 'мир': 3, 'ёжик': 2, 'Hello': 4, 'world': 1, 'ЁЛКА': 7, 'тест': 2, 'тесто': 1}
+
+
+def test_store_matches_combos_counter():
+    rng = random.Random(3)
+    words = {''.join(rng.choice('абвгдеёжabc') for _ in range(rng.randint(1, 9))): rng.randint(1, 50)
+             for _ in range(500)}
+    combos = combos_counter(words, 4)
+    store = NgramStore.from_words(words, 4)
+
+    assert set(store) == set(combos)
+    for length, counts in combos.items():
+        table = store[length]
+        assert dict(table.items()) == dict(counts)
+        assert list(table.values()) == [count for _, count in table.items()]
+        assert table.total() == sum(counts.values())
+        assert [count for _, count in table.top(5)] == sorted(counts.values(), reverse=True)[:5]
+
+
+def test_table_lookups():
+    table = NgramStore.from_words(WORDS, 3)[2]
+
+    assert table['ст'] == 2 + 1
+    assert table.get('ЁЛ') == 7
+    assert 'ри' in table
+    assert 'zz' not in table
+    assert 'при' not in table
+    assert 5 not in table
+    assert table.get('при', 0) == 0
+
+
+def test_top_orders_by_count():
+    table = NgramStore.from_words(WORDS, 2)[2]
+
+    assert sorted(table.top(3)) == [('ЁЛ', 7), ('КА', 7), ('ЛК', 7)]
+    assert [count for _, count in table.top(5)] == sorted(table.values(), reverse=True)[:5]
+    assert len(table.top(len(table) + 10)) == len(table)
+    assert table.top(0) == []
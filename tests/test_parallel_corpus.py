@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from analysis import parallel_corpus
+from analysis.combo_analyzer import combos_counter
+from analysis.text_processor import stream_corpus_stats
+
+
+WORDS = ['привет', 'мир', 'ёжик', 'Hello', 'world', 'ЁЛКА', 'тест']
+SEPARATORS = [' ', '\r\n', '\r', '\t', '  ', ', ', '\n\n', '-']
+
+
+@pytest.fixture
+def tricky_file(tmp_path):
+    '''Корпус с CRLF, одиночными CR и многобайтными символами на границах кусков'''
+    rng = random.Random(1)
+    path = tmp_path / 'tricky.txt'
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for _ in range(3000):
+            f.write(rng.choice(WORDS) + rng.choice(SEPARATORS))
+    return str(path)
+
+
+@pytest.fixture
+def frequency_file(tmp_path):
+    rng = random.Random(2)
+    path = tmp_path / 'frequency.txt'
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for i in range(2000):
+            f.write(f"{rng.choice(WORDS)}{i % 7}\t{i}\r\n")
+    return str(path)
+
+
+def test_byte_ranges_cover_file_on_delimiters(tricky_file):
+    ranges = parallel_corpus.split_byte_ranges(tricky_file, 5)
+
+    with open(tricky_file, 'rb') as f:
+        data = f.read()
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+        assert data[start - 1] in parallel_corpus.TEXT_DELIMITERS
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+@pytest.mark.parametrize('source', ['tricky_file', 'frequency_file', 'corpus_file'])
+def test_parallel_matches_serial(request, monkeypatch, source, workers):
+    monkeypatch.setattr(parallel_corpus, 'PARALLEL_MIN_BYTES', 0)
+    filename = request.getfixturevalue(source)
+
+    serial = stream_corpus_stats(filename)
+    parallel = parallel_corpus.parallel_corpus_stats(filename, 2, workers, chunk_size=4096)
+
+    assert parallel.words == serial.words
+    assert parallel.char_counts == serial.char_counts
+    assert parallel.word_char_counts == serial.word_char_counts
+
+    expected = {length: dict(combos) for length, combos in combos_counter(serial.words).items()}
+    combos = parallel_corpus.parallel_combos_counter(parallel.words, 4, workers)
+    assert {length: dict(counts) for length, counts in combos.items()} == expected
@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from analysis.evaluation_engine import CorpusTables
+from analysis.text_processor import stream_corpus_stats
+from layouts.layout_data import LayoutData
+from optimization.layout_optimizer import LayoutOptimizer
+from optimization.swap_scorer import SwapScorer
+
+
+@pytest.fixture
+def tables(corpus_file):
+    return CorpusTables.from_corpus_stats(stream_corpus_stats(corpus_file))
+
+
+def test_swap_delta_matches_recalculation(tables):
+    scorer = SwapScorer(tables, LayoutData().layout_maps['ЙЦУКЕН'])
+    rng = random.Random(0)
+    movable = range(len(scorer.movable_chars))
+
+    for _ in range(20):
+        i, j = rng.sample(movable, 2)
+        delta, state = scorer.swap_delta(i, j)
+        objective = scorer.objective
+        scorer.apply_swap(i, j, state)
+
+        incremental = scorer.metrics()
+        scorer.set_positions(scorer.positions)
+        assert scorer.objective == pytest.approx(objective + delta)
+        assert scorer.metrics() == pytest.approx(incremental)
+
+
+def test_set_positions_restores_metrics(tables):
+    scorer = SwapScorer(tables, LayoutData().layout_maps['ЙЦУКЕН'])
+    start_positions = scorer.positions.copy()
+    start_metrics = scorer.metrics()
+
+    scorer.apply_swap(0, 1)
+    scorer.set_positions(start_positions)
+
+    assert scorer.metrics() == pytest.approx(start_metrics)
+    assert scorer.positions is not start_positions
+
+
+def test_annealing_keeps_best_layout(tables):
+    optimizer = LayoutOptimizer(tables, LayoutData().layout_maps['ЙЦУКЕН'])
+    initial_objective = optimizer.scorer.objective
+
+    metrics = optimizer.simulated_annealing(iterations=300, seed=1)
+
+    assert optimizer.scorer.objective >= initial_objective
+    rescored = SwapScorer(tables, optimizer.best_layout_map())
+    assert rescored.metrics() == pytest.approx(metrics)
+    assert set(optimizer.best_layout_map()) == set(LayoutData().layout_maps['ЙЦУКЕН'])
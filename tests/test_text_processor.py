@@ -0,0 +1,87 @@
+from collections import Counter
+
+import pytest
+
+from analysis import text_processor
+from analysis.text_processor import (
+    file_to_words_counter, file_to_words_set, is_frequency_bytes, is_frequency_file, iter_text_chunks,
+    mmap_words_counter, parse_frequency_line, stream_corpus_stats
+)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64])
+def test_chunked_stream_matches_single_chunk(corpus_file, chunk_size):
+    whole = stream_corpus_stats(corpus_file, chunk_size=1 << 20)
+    chunked = stream_corpus_stats(corpus_file, chunk_size=chunk_size)
+
+    assert chunked.words == whole.words
+    assert chunked.char_counts == whole.char_counts
+    assert chunked.word_char_counts == whole.word_char_counts
+    assert chunked.stream_pairs == whole.stream_pairs
+    assert chunked.space_pairs == whole.space_pairs
+
+
+def test_chunks_do_not_split_words(tmp_path):
+    corpus = tmp_path / 'corpus.txt'
+    corpus.write_text('длинноеслово короткое ёж', encoding='utf-8')
+
+    chunks = list(iter_text_chunks(str(corpus), chunk_size=5))
+
+    assert ''.join(chunks) == 'длинноеслово короткое ёж'
+    assert 'длинноеслово' in chunks[0]
+    assert file_to_words_set(str(corpus)) == {'длинноеслово', 'короткое', 'ёж'}
+
+
+@pytest.mark.parametrize('line, expected', [
+    ('кот\t5\n', ('кот', 5)),
+    ('7\tпёс\r\n', ('пёс', 7)),
+    ('кот\t²\n', None),
+    ('²\tкот\n', None),
+    ('кот 5\n', None),
+    ('кот\t\n', None),
+])
+def test_parse_frequency_line(line, expected):
+    assert parse_frequency_line(line) == expected
+
+
+def test_superscript_count_is_text(tmp_path):
+    corpus = tmp_path / 'corpus.txt'
+    corpus.write_text('кот\t5\nпёс\t²\n', encoding='utf-8')
+
+    assert not is_frequency_file(str(corpus))
+    assert file_to_words_counter(str(corpus)) == Counter({'кот': 1, 'пёс': 1})
+    assert mmap_words_counter(str(corpus)) == file_to_words_counter(str(corpus))
+
+
+def test_file_without_newlines_is_sniffed_by_prefix(tmp_path, monkeypatch):
+    monkeypatch.setattr(text_processor, 'FREQUENCY_SNIFF_SIZE', 64)
+    corpus = tmp_path / 'corpus.txt'
+    corpus.write_text('слово ' * 1000, encoding='utf-8')
+
+    assert not is_frequency_file(str(corpus))
+    assert mmap_words_counter(str(corpus)) == Counter({'слово': 1000})
+
+
+def test_frequency_file_longer_than_prefix(tmp_path, monkeypatch):
+    monkeypatch.setattr(text_processor, 'FREQUENCY_SNIFF_SIZE', 64)
+    corpus = tmp_path / 'frequency.txt'
+    corpus.write_text(''.join(f'слово{chr(0x430 + i % 32)}\t{i}\n' for i in range(200)), encoding='utf-8')
+
+    assert is_frequency_file(str(corpus))
+    words = file_to_words_counter(str(corpus))
+    assert sum(words.values()) == sum(range(200))
+    assert mmap_words_counter(str(corpus)) == words
+
+
+def test_is_frequency_bytes_drops_cut_line():
+    sample = 'кот\t5\nпёс\t7\nёж'.encode('utf-8')[:-1]
+
+    assert is_frequency_bytes(sample, False)
+    assert not is_frequency_bytes(sample, True)
+    assert not is_frequency_bytes(b'\xff\xfe\t5\n', True)
+    assert not is_frequency_bytes('кот\t5'.encode('utf-8'), False)
+
+
+def test_mmap_counter_matches_stream_counter(corpus_file):
+    assert mmap_words_counter(corpus_file) == file_to_words_counter(corpus_file)
+    assert mmap_words_counter(corpus_file, window_size=16) == file_to_words_counter(corpus_file)
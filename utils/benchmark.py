@@ -0,0 +1,436 @@
+"""
+Набор замеров скорости пути анализа
+
+Замеряется каждый этап отдельно: токенизация (file_to_words_set), подсчет
+комбинаций (combos_counter), динамические штрафы, штраф и нагрузка на пальцы,
+баланс рук и весь анализ analyze_combinations_all_layouts целиком.
+Корпуса (1MB/100MB/1GB) и раскладки (8/100/1000) генерируются синтетически
+и воспроизводимо (фиксированный seed), поэтому результаты разных коммитов
+можно сравнивать между собой.
+
+Запуск: python -m utils.benchmark [--sizes 1MB,100MB] [--layouts 8,100] [-o bench.json]
+Сравнение: python -m utils.benchmark --compare old.json [-o new.json]
+Код завершения 1 - при сравнении найдено замедление больше порога.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from typing import Dict, Any, List, Callable, Optional, Tuple
+
+import numpy as np
+
+
+# Размеры синтетических корпусов
+CORPUS_SIZES = {
+    '1MB': 1 << 20,
+    '100MB': 100 << 20,
+    '1GB': 1 << 30,
+}
+
+# Количество раскладок в замерах
+LAYOUT_COUNTS = [8, 100, 1000]
+
+# Этапы: имя -> описание
+STAGES = {
+    'tokenize': 'file_to_words_set',
+    'combos_counter': 'combos_counter',
+    'dynamic_penalties': 'LayoutData.calculate_dynamic_penalties',
+    'finger_penalty': 'FingerPenaltyCalculator.calculate_finger_penalty',
+    'finger_load': 'FingerPenaltyCalculator.calculate_finger_load',
+    'hand_balance': 'LayoutData.calculate_hand_balance',
+    'end_to_end': 'LayoutEvaluator.analyze_combinations_all_layouts',
+}
+
+# Этапы, которые выполняются для каждой раскладки
+PER_LAYOUT_STAGES = ['dynamic_penalties', 'finger_penalty', 'finger_load', 'hand_balance']
+
+# Посимвольные этапы получают текст не длиннее этого (в байтах файла)
+DEFAULT_MAX_TEXT_BYTES = 16 << 20
+
+# Сколько раскладок замерять в поэтапных замерах (остальное - экстраполяция)
+DEFAULT_SAMPLE_LAYOUTS = 8
+
+# Замедление, начиная с которого сравнение считается регрессией
+DEFAULT_REGRESSION_THRESHOLD = 0.10
+
+# Синтетические корпуса лежат в каталоге проекта, а не в текущем каталоге запуска
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATA_DIR = os.path.join(PROJECT_ROOT, '.bench_data')
+DEFAULT_SEED = 12345
+
+# Синтетический словарь: размер, доля русских слов, показатель закона Ципфа
+VOCABULARY_SIZE = 50000
+RUSSIAN_SHARE = 0.7
+ZIPF_EXPONENT = 1.07
+RUSSIAN_ALPHABET = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+ENGLISH_ALPHABET = 'abcdefghijklmnopqrstuvwxyz'
+
+# Сколько слов генерировать за один блок записи корпуса
+WORDS_PER_BLOCK = 200000
+
+
+def parse_size(size: str) -> int:
+    '''Размер корпуса: имя из CORPUS_SIZES или число байт'''
+    if size in CORPUS_SIZES:
+        return CORPUS_SIZES[size]
+    return int(size)
+
+
+def _synthetic_vocabulary(rng: np.random.Generator) -> Tuple[List[str], np.ndarray]:
+    '''Словарь синтетических слов и их вероятности (закон Ципфа)'''
+    vocabulary = []
+    seen = set()
+
+    while len(vocabulary) < VOCABULARY_SIZE:
+        alphabet = RUSSIAN_ALPHABET if rng.random() < RUSSIAN_SHARE else ENGLISH_ALPHABET
+        length = int(rng.integers(2, 13))
+        word = ''.join(alphabet[idx] for idx in rng.integers(0, len(alphabet), length))
+        if word not in seen:
+            seen.add(word)
+            vocabulary.append(word)
+
+    weights = 1.0 / np.arange(1, VOCABULARY_SIZE + 1) ** ZIPF_EXPONENT
+    return vocabulary, weights / weights.sum()
+
+
+def generate_corpus(path: str, size_bytes: int, seed: int = DEFAULT_SEED) -> None:
+    '''
+    Записывает синтетический корпус размером около size_bytes байт:
+    слова с частотами по закону Ципфа, знаки препинания, заглавные буквы и переводы строк
+    '''
+    rng = np.random.default_rng(seed)
+    vocabulary, probabilities = _synthetic_vocabulary(rng)
+    vocabulary = np.array(vocabulary, dtype=object)
+    separators = np.array([' ', ' ', ' ', ' ', ' ', ' ', ', ', '. ', '\n'], dtype=object)
+
+    written = 0
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        while written < size_bytes:
+            words = vocabulary[rng.choice(VOCABULARY_SIZE, WORDS_PER_BLOCK, p=probabilities)]
+            capitalized = rng.random(WORDS_PER_BLOCK) < 0.05
+            words[capitalized] = [word.capitalize() for word in words[capitalized]]
+            gaps = separators[rng.integers(0, len(separators), WORDS_PER_BLOCK)]
+
+            block = ''.join((words + gaps).tolist()).encode('utf-8')
+            if len(block) > size_bytes - written:
+                # Последний блок обрезается, не разрывая UTF-8 символ
+                block = block[:size_bytes - written].decode('utf-8', errors='ignore').encode('utf-8')
+                if not block:
+                    break
+            f.write(block)
+            written += len(block)
+    os.replace(tmp_path, path)
+
+
+def corpus_path(data_dir: str, size_name: str, seed: int = DEFAULT_SEED) -> str:
+    '''Путь к синтетическому корпусу; корпус создается при первом обращении'''
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f'corpus_{size_name}_{seed}.txt')
+    size_bytes = parse_size(size_name)
+
+    if not os.path.isfile(path) or abs(os.path.getsize(path) - size_bytes) > 16:
+        print(f"Генерация корпуса {size_name} в {path}...", file=sys.stderr)
+        generate_corpus(path, size_bytes, seed)
+
+    return path
+
+
+def generate_layouts(count: int, seed: int = DEFAULT_SEED) -> Dict[str, Dict[str, Any]]:
+    '''
+    Раскладки для замеров: встроенные, затем их варианты со случайными
+    перестановками клавиш букв
+    Возвращает: имя -> {'language': язык, 'layout_map': карта раскладки}
+    '''
+    from layouts.key_tables import LAYOUT_ROW_SCANCODES
+    from layouts.layout_data import LayoutData, BUILTIN_LAYOUT_LANGUAGES
+
+    data = LayoutData()
+    base_names = list(data.layout_maps)
+    letter_scancodes = [scancode for row in LAYOUT_ROW_SCANCODES[1:] for scancode in row]
+    rng = random.Random(seed)
+
+    layouts = {}
+    for number in range(count):
+        base_name = base_names[number % len(base_names)]
+        layout_map = data.layout_maps[base_name]
+
+        if number < len(base_names):
+            layout_name = base_name
+        else:
+            layout_name = f'{base_name} #{number // len(base_names)}'
+            for _ in range(10):
+                scancode1, scancode2 = rng.sample(letter_scancodes, 2)
+                layout_map = data.swap_scancodes(layout_map, scancode1, scancode2)
+
+        layouts[layout_name] = {
+            'language': BUILTIN_LAYOUT_LANGUAGES.get(base_name, 'unknown'),
+            'layout_map': layout_map,
+        }
+
+    return layouts
+
+
+def read_text_prefix(path: str, max_bytes: int) -> str:
+    '''Первые max_bytes байт файла как текст (без оборванного UTF-8 символа)'''
+    with open(path, 'rb') as f:
+        return f.read(max_bytes).decode('utf-8', errors='ignore')
+
+
+def time_call(func: Callable[[], Any], repeat: int) -> Tuple[List[float], Any]:
+    '''
+    Получает: функцию без аргументов и число повторов
+    Возвращает: время каждого запуска (с) и результат последнего запуска
+    '''
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+
+def _stage_result(stage: str, size_name: str, layout_count: int, timings: List[float],
+                  items: int, scale: float = 1.0) -> Dict[str, Any]:
+    '''Запись результата этапа: лучшее время (с экстраполяцией на все раскладки) и все замеры'''
+    return {
+        'stage': stage,
+        'function': STAGES[stage],
+        'corpus': size_name,
+        'layouts': layout_count,
+        'seconds': min(timings) * scale,
+        'runs': timings,
+        'scale': scale,
+        'items': items,
+    }
+
+
+def run_end_to_end(path: str, layouts: Dict[str, Dict[str, Any]]) -> None:
+    '''Полный анализ всех раскладок без графиков, кэшей и вывода на экран'''
+    from analysis.layout_cache import LayoutResultCache
+    from analysis.layout_evaluator import LayoutEvaluator
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        evaluator = LayoutEvaluator()
+        evaluator.corpus_cache = None
+        evaluator.result_cache = LayoutResultCache()
+        evaluator.layouts = {name: {'name': name, 'language': layout['language']} for name, layout in layouts.items()}
+        evaluator.layout_languages = {name: layout['language'] for name, layout in layouts.items()}
+        evaluator.data.layout_maps = {name: layout['layout_map'] for name, layout in layouts.items()}
+        evaluator.analyze_combinations_all_layouts(path, visualize=False)
+
+
+def run_benchmarks(sizes: List[str], layout_counts: List[int], stages: List[str] = None,
+                   repeat: int = 3, data_dir: str = DEFAULT_DATA_DIR,
+                   max_text_bytes: int = DEFAULT_MAX_TEXT_BYTES,
+                   sample_layouts: int = DEFAULT_SAMPLE_LAYOUTS,
+                   seed: int = DEFAULT_SEED) -> List[Dict[str, Any]]:
+    '''
+    Замеряет этапы на каждом корпусе и каждом числе раскладок
+    Поэтапные замеры по раскладкам выполняются на sample_layouts раскладках
+    и пересчитываются на все (поле scale); end_to_end - всегда на всех
+    '''
+    from analysis.combo_analyzer import combos_counter
+    from analysis.finger_penalty_calculator import FingerPenaltyCalculator
+    from analysis.text_processor import file_to_words_set
+    from layouts.layout_data import LayoutData
+
+    stages = stages or list(STAGES)
+    data = LayoutData()
+    penalty_calculator = FingerPenaltyCalculator()
+    results = []
+
+    for size_name in sizes:
+        path = corpus_path(data_dir, size_name, seed)
+        corpus_bytes = os.path.getsize(path)
+        print(f"Корпус {size_name} ({corpus_bytes} байт)", file=sys.stderr)
+
+        words = None
+        if 'tokenize' in stages or 'combos_counter' in stages or 'dynamic_penalties' in stages:
+            timings, words = time_call(lambda: file_to_words_set(path), repeat)
+            if 'tokenize' in stages:
+                results.append(_stage_result('tokenize', size_name, 0, timings, corpus_bytes))
+
+        if 'combos_counter' in stages:
+            timings, _ = time_call(lambda: combos_counter(words), repeat)
+            results.append(_stage_result('combos_counter', size_name, 0, timings, len(words)))
+
+        text = None
+        if any(stage in stages for stage in PER_LAYOUT_STAGES if stage != 'dynamic_penalties'):
+            text = read_text_prefix(path, max_text_bytes)
+
+        for layout_count in layout_counts:
+            layouts = generate_layouts(layout_count, seed)
+            sample = [layout['layout_map'] for layout in list(layouts.values())[:sample_layouts]]
+            scale = layout_count / len(sample)
+
+            per_layout = {
+                'dynamic_penalties': (lambda: [data.calculate_dynamic_penalties(words, layout_map)
+                                               for layout_map in sample], len(words or ())),
+                'finger_penalty': (lambda: [penalty_calculator.calculate_finger_penalty(text, layout_map)
+                                            for layout_map in sample], len(text or '')),
+                'finger_load': (lambda: [penalty_calculator.calculate_finger_load(text, layout_map)
+                                         for layout_map in sample], len(text or '')),
+                'hand_balance': (lambda: [data.calculate_hand_balance(text, layout_map)
+                                          for layout_map in sample], len(text or '')),
+            }
+            for stage in PER_LAYOUT_STAGES:
+                if stage in stages:
+                    func, items = per_layout[stage]
+                    timings, _ = time_call(func, repeat)
+                    results.append(_stage_result(stage, size_name, layout_count, timings, items, scale))
+
+            if 'end_to_end' in stages:
+                timings, _ = time_call(lambda: run_end_to_end(path, layouts), repeat)
+                results.append(_stage_result('end_to_end', size_name, layout_count, timings, layout_count))
+
+            print(f"  {layout_count} раскладок: готово", file=sys.stderr)
+
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    '''Текущий коммит репозитория или None'''
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark_report(results: List[Dict[str, Any]], settings: Dict[str, Any]) -> Dict[str, Any]:
+    '''Результаты замеров вместе с описанием окружения (формат файла результатов)'''
+    return {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'settings': settings,
+        'results': results,
+    }
+
+
+def _result_key(result: Dict[str, Any]) -> Tuple[str, str, int]:
+    return result['stage'], result['corpus'], result['layouts']
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any],
+                    threshold: float = DEFAULT_REGRESSION_THRESHOLD) -> List[Dict[str, Any]]:
+    '''
+    Получает: результаты прежнего и текущего запуска
+    Возвращает: строки сравнения по общим замерам (отношение времени новое / старое
+    и признак регрессии - замедление больше threshold)
+    '''
+    baseline_results = {_result_key(result): result for result in baseline['results']}
+    rows = []
+
+    for result in current['results']:
+        old = baseline_results.get(_result_key(result))
+        if old is None:
+            continue
+        ratio = result['seconds'] / old['seconds'] if old['seconds'] > 0 else float('inf')
+        rows.append({
+            'stage': result['stage'],
+            'corpus': result['corpus'],
+            'layouts': result['layouts'],
+            'old_seconds': old['seconds'],
+            'new_seconds': result['seconds'],
+            'ratio': ratio,
+            'regression': ratio > 1 + threshold,
+        })
+
+    return rows
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    '''Таблица результатов замеров'''
+    print(f"{'Этап':<20} {'Корпус':<8} {'Раскладок':>9} {'Время, с':>12} {'Объем':>12}")
+    print("-" * 65)
+    for result in results:
+        layouts = result['layouts'] or '-'
+        print(f"{result['stage']:<20} {result['corpus']:<8} {layouts:>9} {result['seconds']:>12.4f} {result['items']:>12}")
+
+
+def print_comparison(rows: List[Dict[str, Any]]) -> None:
+    '''Таблица сравнения с прежним запуском'''
+    print(f"{'Этап':<20} {'Корпус':<8} {'Раскладок':>9} {'Было, с':>10} {'Стало, с':>10} {'Отношение':>10}")
+    print("-" * 72)
+    for row in rows:
+        layouts = row['layouts'] or '-'
+        mark = '  РЕГРЕССИЯ' if row['regression'] else ''
+        print(f"{row['stage']:<20} {row['corpus']:<8} {layouts:>9} {row['old_seconds']:>10.4f} "
+              f"{row['new_seconds']:>10.4f} {row['ratio']:>9.2f}x{mark}")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Замеры скорости этапов анализа раскладок')
+    parser.add_argument('--sizes', default=','.join(CORPUS_SIZES),
+                        help=f'размеры корпусов через запятую: {", ".join(CORPUS_SIZES)} или число байт')
+    parser.add_argument('--layouts', default=','.join(str(count) for count in LAYOUT_COUNTS),
+                        help='количество раскладок через запятую')
+    parser.add_argument('--stages', default=','.join(STAGES),
+                        help=f'этапы через запятую: {", ".join(STAGES)}')
+    parser.add_argument('--repeat', type=int, default=3, help='повторов каждого замера (берется лучший)')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='папка синтетических корпусов')
+    parser.add_argument('--max-text-bytes', type=int, default=DEFAULT_MAX_TEXT_BYTES,
+                        help='сколько байт корпуса получают посимвольные этапы')
+    parser.add_argument('--sample-layouts', type=int, default=DEFAULT_SAMPLE_LAYOUTS,
+                        help='сколько раскладок замерять в поэтапных замерах')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='seed генерации корпусов и раскладок')
+    parser.add_argument('-o', '--output', help='файл результатов (JSON)')
+    parser.add_argument('--compare', metavar='BASELINE', help='сравнить с результатами прежнего запуска')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help='допустимое замедление при сравнении (доля, по умолчанию 0.10)')
+    args = parser.parse_args(argv)
+
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    layout_counts = [int(count) for count in args.layouts.split(',') if count.strip()]
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"неизвестные этапы: {', '.join(unknown)}")
+
+    settings = {
+        'sizes': sizes,
+        'layouts': layout_counts,
+        'stages': stages,
+        'repeat': args.repeat,
+        'max_text_bytes': args.max_text_bytes,
+        'sample_layouts': args.sample_layouts,
+        'seed': args.seed,
+    }
+    results = run_benchmarks(sizes, layout_counts, stages, args.repeat, args.data_dir,
+                             args.max_text_bytes, args.sample_layouts, args.seed)
+    report = benchmark_report(results, settings)
+
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare_reports(baseline, report, args.threshold)
+        print()
+        print_comparison(rows)
+        if any(row['regression'] for row in rows):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
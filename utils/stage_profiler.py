@@ -0,0 +1,258 @@
+"""
+Замер этапов анализа: время, процессорное время, пик памяти и объем работы
+
+Этап оборачивается в контекст profiler.stage('имя'); вложенные этапы
+наследуют раскладку внешнего этапа. Библиотечный код размечает свои этапы
+функцией profile_stage: она записывает этап в активный профилировщик
+(см. StageProfiler.activate) и ничего не делает, если профилировщика нет.
+
+Включение: StageProfiler(enabled=True) или переменная окружения
+LAYOUT_PROFILE=1; LAYOUT_PROFILE_TRACE=файл.json дополнительно сохраняет
+трассу в формате Chrome trace events (chrome://tracing, Perfetto).
+Замер памяти (tracemalloc) заметно замедляет код с большим числом мелких
+объектов; LAYOUT_PROFILE=time замеряет только время.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Dict, Any, List, Optional
+
+
+PROFILE_ENV = 'LAYOUT_PROFILE'
+PROFILE_TRACE_ENV = 'LAYOUT_PROFILE_TRACE'
+
+# Активные профилировщики (последний - текущий)
+_active_profilers = []
+
+
+class _NullStage:
+    """Контекст этапа при выключенном профилировании"""
+
+    def __enter__(self) -> Dict[str, Any]:
+        return {}
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class StageProfiler:
+    """
+    Записывает этапы анализа: стеночное и процессорное время, пик памяти
+    (tracemalloc, прирост относительно начала этапа) и число обработанных элементов
+    """
+
+    def __init__(self, enabled: bool = False, trace_file: str = None, track_memory: bool = True):
+        self.enabled = enabled or bool(trace_file)
+        self.trace_file = trace_file
+        self.track_memory = track_memory
+        self.records = []
+        self._stack = []
+        self._origin = time.perf_counter()
+
+    @classmethod
+    def from_env(cls) -> 'StageProfiler':
+        """Профилировщик, включенный переменными окружения LAYOUT_PROFILE / LAYOUT_PROFILE_TRACE"""
+        mode = os.environ.get(PROFILE_ENV, '').strip().lower()
+        return cls(
+            enabled=mode in ('1', 'true', 'yes', 'on', 'time'),
+            trace_file=os.environ.get(PROFILE_TRACE_ENV) or None,
+            track_memory=mode != 'time'
+        )
+
+    def reset(self) -> None:
+        """Забывает записанные этапы"""
+        self.records = []
+        self._stack = []
+        self._origin = time.perf_counter()
+
+    @contextlib.contextmanager
+    def activate(self):
+        """Делает профилировщик текущим для profile_stage на время блока"""
+        if not self.enabled:
+            yield self
+            return
+
+        started_tracing = self.track_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+
+        _active_profilers.append(self)
+        try:
+            yield self
+        finally:
+            _active_profilers.remove(self)
+            if started_tracing:
+                tracemalloc.stop()
+
+    def stage(self, name: str, items: int = None, layout: str = None):
+        """
+        Контекст этапа; возвращает запись этапа (словарь), в которую
+        можно дописать items, если объем работы известен только в конце
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._record_stage(name, items, layout)
+
+    @contextlib.contextmanager
+    def _record_stage(self, name: str, items: Optional[int], layout: Optional[str]):
+        parent = self._stack[-1] if self._stack else None
+        record = {
+            'name': name,
+            'layout': layout if layout is not None else (parent['layout'] if parent else None),
+            'items': items,
+            'depth': len(self._stack),
+            'thread': threading.get_ident(),
+        }
+
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            # Пик до начала этапа относится к внешнему этапу
+            if parent is not None:
+                parent['_peak'] = max(parent['_peak'], peak)
+            tracemalloc.reset_peak()
+            record['_start_memory'] = current
+            record['_peak'] = current
+
+        self._stack.append(record)
+        start_cpu = time.process_time()
+        start_wall = time.perf_counter()
+        try:
+            yield record
+        finally:
+            wall = time.perf_counter() - start_wall
+            cpu = time.process_time() - start_cpu
+            self._stack.pop()
+
+            record['start'] = start_wall - self._origin
+            record['wall'] = wall
+            record['cpu'] = cpu
+            if tracing:
+                peak = max(record.pop('_peak'), tracemalloc.get_traced_memory()[1])
+                record['peak_memory'] = peak - record.pop('_start_memory')
+                if parent is not None:
+                    parent['_peak'] = max(parent['_peak'], peak)
+            else:
+                record['peak_memory'] = None
+
+            self.records.append(record)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """
+        Итоги по этапам (в порядке первого появления): число вызовов,
+        суммарное время, процессорное время, наибольший пик памяти,
+        число элементов и скорость обработки
+        """
+        stages = {}
+        for record in sorted(self.records, key=lambda record: record['start']):
+            stage = stages.setdefault(record['name'], {
+                'name': record['name'],
+                'depth': record['depth'],
+                'calls': 0,
+                'wall': 0.0,
+                'cpu': 0.0,
+                'peak_memory': None,
+                'items': None,
+            })
+            stage['calls'] += 1
+            stage['wall'] += record['wall']
+            stage['cpu'] += record['cpu']
+            if record['peak_memory'] is not None:
+                stage['peak_memory'] = max(stage['peak_memory'] or 0, record['peak_memory'])
+            if record['items'] is not None:
+                stage['items'] = (stage['items'] or 0) + record['items']
+
+        for stage in stages.values():
+            if stage['items'] is not None and stage['wall'] > 0:
+                stage['items_per_second'] = stage['items'] / stage['wall']
+            else:
+                stage['items_per_second'] = None
+
+        return list(stages.values())
+
+    def layout_summary(self) -> Dict[str, Dict[str, float]]:
+        """Время этапов по раскладкам: раскладка -> этап -> суммарное время (с)"""
+        layouts = defaultdict(lambda: defaultdict(float))
+        for record in self.records:
+            if record['layout'] is not None:
+                layouts[record['layout']][record['name']] += record['wall']
+        return {layout: dict(stages) for layout, stages in layouts.items()}
+
+    def print_summary(self) -> None:
+        """Выводит таблицу этапов и самые медленные раскладки"""
+        stages = self.summary()
+        if not stages:
+            return
+
+        print("\n" + "="*100)
+        print("ПРОФИЛЬ ЭТАПОВ АНАЛИЗА")
+        print("="*100)
+        print(f"{'Этап':<30} {'Вызовов':>8} {'Время, с':>10} {'CPU, с':>10} {'Пик памяти':>12} {'Элементов':>12} {'Элем./с':>12}")
+        print("-" * 100)
+
+        for stage in stages:
+            name = '  ' * stage['depth'] + stage['name']
+            peak = f"{stage['peak_memory'] / (1 << 20):.1f} МБ" if stage['peak_memory'] is not None else '-'
+            items = str(stage['items']) if stage['items'] is not None else '-'
+            rate = f"{stage['items_per_second']:.0f}" if stage['items_per_second'] is not None else '-'
+            print(f"{name:<30} {stage['calls']:>8} {stage['wall']:>10.3f} {stage['cpu']:>10.3f} {peak:>12} {items:>12} {rate:>12}")
+
+        layouts = self.layout_summary()
+        if layouts:
+            print(f"\n{'Раскладка':<30} {'Время, с':>10}  Самый долгий этап")
+            print("-" * 100)
+            totals = {layout: stages.get('score_layout', sum(stages.values())) for layout, stages in layouts.items()}
+            for layout, total in sorted(totals.items(), key=lambda item: item[1], reverse=True)[:10]:
+                slowest = max(
+                    ((name, wall) for name, wall in layouts[layout].items() if name != 'score_layout'),
+                    key=lambda item: item[1], default=(None, 0)
+                )
+                slowest_str = f"{slowest[0]} ({slowest[1]:.3f} с)" if slowest[0] else '-'
+                print(f"{layout:<30} {total:>10.3f}  {slowest_str}")
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Этапы в формате Chrome trace events (полные события, время в микросекундах)"""
+        pid = os.getpid()
+        events = []
+
+        for record in sorted(self.records, key=lambda record: record['start']):
+            args = {'cpu_ms': record['cpu'] * 1000}
+            for field in ('items', 'peak_memory', 'layout'):
+                if record[field] is not None:
+                    args[field] = record[field]
+            events.append({
+                'name': record['name'],
+                'cat': 'stage',
+                'ph': 'X',
+                'ts': record['start'] * 1e6,
+                'dur': record['wall'] * 1e6,
+                'pid': pid,
+                'tid': record['thread'],
+                'args': args,
+            })
+
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, filename: str) -> None:
+        """Сохраняет трассу этапов в JSON для chrome://tracing или Perfetto"""
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f, ensure_ascii=False)
+
+
+def profile_stage(name: str, items: int = None, layout: str = None):
+    '''
+    Получает: имя этапа, число элементов, раскладку
+    Возвращает: контекст этапа активного профилировщика
+    (или пустой контекст, если профилирование не включено)
+    '''
+    if not _active_profilers:
+        return _NULL_STAGE
+    return _active_profilers[-1].stage(name, items, layout)
@@ -0,0 +1,81 @@
+"""
+Замер холодного старта пути анализа без графиков
+
+Каждый модуль импортируется в отдельном свежем процессе интерпретатора;
+время импорта сравнивается с бюджетом. Дополнительно проверяется, что
+matplotlib при этом не загружается.
+
+Запуск: python -m utils.startup_budget [--runs N]
+Код завершения 1 - бюджет превышен или загружен matplotlib.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, Any, List
+
+
+# Бюджет холодного старта для модулей пути анализа (мс, медиана по запускам)
+STARTUP_BUDGET_MS = {
+    'analysis.batch': 250,
+    'analysis.layout_evaluator': 250,
+}
+
+# Модули визуализации, которые не должны загружаться без запроса графика
+VISUALIZATION_MODULES = ['matplotlib', 'visualization.charts']
+
+_PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({{'ms': elapsed, 'loaded': [m for m in {visualization!r} if m in sys.modules]}}))
+'''
+
+
+def measure_import(module: str, runs: int = 5) -> Dict[str, Any]:
+    '''
+    Получает: имя модуля и число запусков
+    Возвращает: медиану времени импорта (мс) и загруженные модули визуализации
+    '''
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    probe = _PROBE.format(module=module, visualization=VISUALIZATION_MODULES)
+
+    timings = []
+    loaded = set()
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', probe], cwd=project_root,
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result['ms'])
+        loaded.update(result['loaded'])
+
+    return {'ms': statistics.median(timings), 'loaded': sorted(loaded)}
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Замер холодного старта анализа без графиков')
+    parser.add_argument('--runs', type=int, default=5, help='число запусков на модуль')
+    args = parser.parse_args(argv)
+
+    ok = True
+    for module, budget in STARTUP_BUDGET_MS.items():
+        result = measure_import(module, args.runs)
+        within_budget = result['ms'] <= budget and not result['loaded']
+        ok = ok and within_budget
+
+        status = 'OK' if within_budget else 'ПРЕВЫШЕН'
+        print(f"{module:<30} {result['ms']:>7.0f} мс (бюджет {budget} мс) {status}")
+        if result['loaded']:
+            print(f"  загружены модули визуализации: {', '.join(result['loaded'])}")
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
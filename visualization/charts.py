@@ -5,7 +5,7 @@ import matplotlib
 from visualization.stats_formatter import format_number
 
 # Устанавливаем шрифт Nerd Font
-matplotlib.rcParams['font.family'] = 'DejaVu Sans Mono'
+matplotlib.rcParams['font.family'] = ['DejaVu Sans Mono', 'monospace']
 matplotlib.rcParams['axes.unicode_minus'] = False
 
 